@@ -21,6 +21,12 @@ setuptools.setup(
                         'AsyncTransport': 'Transport',
                         'AsyncWindow': 'Window',
                         'AsyncDaemonProcessTransport': 'DaemonProcessTransport',
+                        'AsyncDaemonPoolTransport': 'DaemonPoolTransport',
+                        'AsyncIOThreadTransport': 'IOThreadTransport',
+                        'AsyncDaemonSocketTransport': 'DaemonSocketTransport',
+                        'AsyncBrokerTransport': 'BrokerTransport',
+                        'AsyncRingBufferTransport': 'RingBufferTransport',
+                        'AsyncSharedDaemonTransport': 'SharedDaemonTransport',
                         '_AIOP': '_SIOP',
                         'async_create_process': 'sync_create_process',
                         'adrain_stdin': 'drain_stdin',
@@ -1,35 +1,45 @@
 from __future__ import annotations
 
 import asyncio
+import base64
 import os
 import sys
 import tempfile
 import time
 import warnings
+from contextlib import contextmanager
 from functools import partial
 from typing import Any
 from typing import Awaitable
 from typing import Callable
 from typing import Coroutine
 from typing import Generic
+from typing import Iterator
 from typing import List
 from typing import Literal
+from typing import Mapping
 from typing import NoReturn
 from typing import Optional
 from typing import overload
+from typing import Sequence
 from typing import Tuple
 from typing import Type
 from typing import TypeVar
 from typing import Union
 
+from .transport import _call_deadline
+from .transport import _call_priority
+from .transport import _PRIORITY_LEVELS
 from .transport import AsyncDaemonProcessTransport
 from .transport import AsyncFutureResult
 from .transport import AsyncTransport
 from .window import AsyncControl
 from .window import AsyncWindow
+from ahk._cache import ReadCache
 from ahk._hotkey import Hotkey
 from ahk._hotkey import Hotstring
 from ahk._types import _BUTTONS
+from ahk._types import CallPriority
 from ahk._types import Coordinates
 from ahk._types import CoordModeRelativeTo
 from ahk._types import CoordModeTargets
@@ -57,6 +67,11 @@ if sys.version_info < (3, 10):
 else:
     from typing import TypeAlias
 
+if sys.version_info < (3, 11):
+    from typing_extensions import Self
+else:
+    from typing import Self
+
 async_sleep = asyncio.sleep  # unasync: remove
 sleep = time.sleep
 
@@ -95,17 +110,79 @@ def _resolve_button(button: Union[str, int]) -> str:
 
 T_AHKVersion = TypeVar('T_AHKVersion', bound=Optional[Literal['v1', 'v2']])
 
+_NO_RESULT = object()
+
+
+class BatchResult:
+    """
+    Placeholder for the result of a call queued on a batch. The result is available once the batch has executed.
+    """
+
+    def __init__(self, function_name: str):
+        self.function_name = function_name
+        self._value: Any = _NO_RESULT
+
+    def done(self) -> bool:
+        return self._value is not _NO_RESULT
+
+    def result(self) -> Any:
+        if self._value is _NO_RESULT:
+            raise RuntimeError(f'The batch containing this call ({self.function_name}) has not been executed yet')
+        if isinstance(self._value, Exception):
+            raise self._value
+        return self._value
+
+
+class AsyncBatch:
+    """
+    Collects function calls to execute in a single round trip to the daemon. Normally obtained from
+    :py:meth:`AsyncAHK.batch` and used as a context manager; the batch is executed when the context exits.
+    """
+
+    def __init__(self, engine: AsyncAHK[Any]):
+        self._engine = engine
+        self._calls: List[Tuple[str, Optional[List[str]]]] = []
+        self._results: List[BatchResult] = []
+
+    def function_call(self, function_name: str, args: Optional[List[str]] = None) -> BatchResult:
+        """
+        Queue a call to an AHK function defined in the daemon script.
+        """
+        res = BatchResult(function_name)
+        self._calls.append((function_name, args or []))
+        self._results.append(res)
+        return res
+
+    async def execute(self) -> List[Any]:
+        """
+        Execute all queued calls. Returns the results (or exceptions) of each call, in order.
+        """
+        calls, self._calls = self._calls, []
+        results, self._results = self._results, []
+        values = await self._engine.function_call_many(calls, return_exceptions=True)
+        for res, value in zip(results, values):
+            res._value = value
+        return values
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if exc_type is None:
+            await self.execute()
+        return None
+
 
 class AsyncAHK(Generic[T_AHKVersion]):
     # fmt: off
     @overload
-    def __init__(self: AsyncAHK[None], *, TransportClass: Optional[Type[AsyncTransport]] = None, directives: Optional[list[Directive | Type[Directive]]] = None, executable_path: str = '', extensions: list[Extension] | None | Literal['auto'] = None): ...
+    def __init__(self: AsyncAHK[None], *, TransportClass: Optional[Type[AsyncTransport]] = None, directives: Optional[list[Directive | Type[Directive]]] = None, executable_path: str = '', extensions: list[Extension] | None | Literal['auto'] = None, transport_options: Optional[dict[str, Any]] = None, lazy_lists: bool = False, read_cache: Union[bool, Mapping[str, float]] = False): ...
     @overload
-    def __init__(self: AsyncAHK[None], *, TransportClass: Optional[Type[AsyncTransport]] = None, directives: Optional[list[Directive | Type[Directive]]] = None, executable_path: str = '', extensions: list[Extension] | None | Literal['auto'] = None, version: None): ...
+    def __init__(self: AsyncAHK[None], *, TransportClass: Optional[Type[AsyncTransport]] = None, directives: Optional[list[Directive | Type[Directive]]] = None, executable_path: str = '', extensions: list[Extension] | None | Literal['auto'] = None, version: None, transport_options: Optional[dict[str, Any]] = None, lazy_lists: bool = False, read_cache: Union[bool, Mapping[str, float]] = False): ...
     @overload
-    def __init__(self: AsyncAHK[Literal['v2']], *, TransportClass: Optional[Type[AsyncTransport]] = None, directives: Optional[list[Directive | Type[Directive]]] = None, executable_path: str = '', extensions: list[Extension] | None | Literal['auto'] = None, version: Literal['v2']): ...
+    def __init__(self: AsyncAHK[Literal['v2']], *, TransportClass: Optional[Type[AsyncTransport]] = None, directives: Optional[list[Directive | Type[Directive]]] = None, executable_path: str = '', extensions: list[Extension] | None | Literal['auto'] = None, version: Literal['v2'], transport_options: Optional[dict[str, Any]] = None, lazy_lists: bool = False, read_cache: Union[bool, Mapping[str, float]] = False): ...
     @overload
-    def __init__(self: AsyncAHK[Literal['v1']], *, TransportClass: Optional[Type[AsyncTransport]] = None, directives: Optional[list[Directive | Type[Directive]]] = None, executable_path: str = '', extensions: list[Extension] | None | Literal['auto'] = None, version: Literal['v1']): ...
+    def __init__(self: AsyncAHK[Literal['v1']], *, TransportClass: Optional[Type[AsyncTransport]] = None, directives: Optional[list[Directive | Type[Directive]]] = None, executable_path: str = '', extensions: list[Extension] | None | Literal['auto'] = None, version: Literal['v1'], transport_options: Optional[dict[str, Any]] = None, lazy_lists: bool = False, read_cache: Union[bool, Mapping[str, float]] = False): ...
     # fmt: on
     def __init__(
         self: AsyncAHK[Optional[Literal['v1', 'v2']]],
@@ -115,6 +192,9 @@ class AsyncAHK(Generic[T_AHKVersion]):
         executable_path: str = '',
         extensions: list[Extension] | None | Literal['auto'] = None,
         version: Optional[Literal['v1', 'v2']] = None,
+        transport_options: Optional[dict[str, Any]] = None,
+        lazy_lists: bool = False,
+        read_cache: Union[bool, Mapping[str, float]] = False,
     ):
         if version not in (None, 'v1', 'v2'):
             raise ValueError(f'Invalid version ({version!r}). Must be one of None, "v1", or "v2"')
@@ -137,6 +217,8 @@ class AsyncAHK(Generic[T_AHKVersion]):
                     f'AutoHotkey {version} was requested but AutoHotkey {detected_version} was detected for executable {executable_path}'
                 )
         self._version: Literal['v1', 'v2'] = version
+        # return large list responses (window and control lists) as lazy sequences rather than lists
+        self._lazy_lists: bool = lazy_lists
         self._extension_registry: _ExtensionMethodRegistry
         self._extensions: list[Extension]
         if extensions == 'auto':
@@ -153,11 +235,20 @@ class AsyncAHK(Generic[T_AHKVersion]):
         )
         for ext in self._extensions:
             self._method_registry.merge(ext._extension_method_registry)
+        # cache of read-only calls, e.g. window titles; see the read_cache property
+        self._read_cache: Optional[ReadCache] = None
+        if read_cache is not False:
+            self._read_cache = ReadCache(ttls=None if read_cache is True else read_cache)
+            transport_options = {'read_cache': self._read_cache, **(transport_options or {})}
         if TransportClass is None:
             TransportClass = AsyncDaemonProcessTransport
         assert TransportClass is not None
         transport = TransportClass(
-            executable_path=executable_path, directives=directives, extensions=self._extensions, version=version
+            executable_path=executable_path,
+            directives=directives,
+            extensions=self._extensions,
+            version=version,
+            **(transport_options or {}),
         )
         self._transport: AsyncTransport = transport
 
@@ -217,14 +308,116 @@ class AsyncAHK(Generic[T_AHKVersion]):
                 warnings.warn(warning.message, warning.category, stacklevel=2)
         return None
 
-    async def function_call(self, function_name: str, args: list[str] | None = None, blocking: bool = True) -> Any:
+    async def function_call(
+        self,
+        function_name: str,
+        args: list[str] | None = None,
+        blocking: bool = True,
+        *,
+        timeout: Optional[float] = None,
+    ) -> Any:
         """
         Call an AHK function defined in the daemon script. This method is intended for use by extension authors.
+
+        :param timeout: seconds to wait for the daemon. If the call has not completed by then,
+          :py:class:`~ahk.exceptions.AHKCallTimeoutError` is raised and the daemon is replaced.
         """
         if args is None:
             args = []
+        if timeout is not None:
+            return await self._transport.function_call(function_name, args, blocking=blocking, engine=self, timeout=timeout)  # type: ignore[call-overload]
         return await self._transport.function_call(function_name, args, blocking=blocking, engine=self)  # type: ignore[call-overload]
 
+    async def function_call_many(
+        self,
+        calls: Sequence[Tuple[str, Optional[List[str]]]],
+        *,
+        return_exceptions: bool = False,
+        timeout: Optional[float] = None,
+    ) -> List[Any]:
+        """
+        Call several AHK functions defined in the daemon script in a single round trip. This method is intended for
+        use by extension authors.
+
+        :param calls: a sequence of ``(function_name, args)`` pairs
+        :param return_exceptions: if True, exceptions raised by individual calls are returned in place of their
+          results. Otherwise, the first such exception is raised.
+        :param timeout: seconds to wait for the daemon to complete all calls
+        :return: the result of each call, in order
+        """
+        results = await self._transport.function_call_many(calls, engine=self, timeout=timeout)
+        if not return_exceptions:
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+        return results
+
+    @contextmanager
+    def deadline(self, seconds: float) -> Iterator[None]:
+        """
+        Limit how long the daemon calls made in the block (on any engine) may take altogether, including time spent
+        waiting for other callers. A call still running when the deadline passes raises
+        :py:class:`~ahk.exceptions.AHKCallTimeoutError`, and the stuck daemon is replaced so later calls are not
+        held up by it. Nested deadlines never extend an enclosing one.
+
+        Example::
+
+            with ahk.deadline(5):
+                win = await ahk.win_wait(title='Untitled - Notepad')
+
+        """
+        deadline = time.monotonic() + seconds
+        current = _call_deadline.get()
+        token = _call_deadline.set(deadline if current is None else min(current, deadline))
+        try:
+            yield
+        finally:
+            _call_deadline.reset(token)
+
+    @contextmanager
+    def priority(self, priority: CallPriority) -> Iterator[None]:
+        """
+        Set the priority of the daemon calls made in the block (on any engine). When calls queue up for the daemon,
+        ``'interactive'`` calls go ahead of ``'normal'`` ones, which go ahead of ``'background'`` ones. Calls that
+        have waited long enough go ahead regardless, so background calls are never starved. The default is the
+        ``priority`` transport option, which is ``'normal'`` unless set otherwise.
+
+        Example::
+
+            with ahk.priority('interactive'):
+                await ahk.click()
+
+        """
+        if priority not in _PRIORITY_LEVELS:
+            raise ValueError(f'Invalid priority {priority!r} - must be one of "interactive", "normal" or "background"')
+        token = _call_priority.set(priority)
+        try:
+            yield
+        finally:
+            _call_priority.reset(token)
+
+    @property
+    def read_cache(self) -> Optional[ReadCache]:
+        """
+        The cache of read-only calls enabled with the ``read_cache`` option, or ``None`` if it is not enabled.
+        Use ``read_cache.stats`` to see how well it is doing, ``read_cache.ttls`` to adjust how long results of each
+        function are kept, and ``read_cache.clear()`` to drop what is cached.
+        """
+        return self._read_cache
+
+    def batch(self) -> AsyncBatch:
+        """
+        Create a batch to collect several function calls and execute them in a single round trip to the daemon.
+
+        Example::
+
+            async with ahk.batch() as batch:
+                titles = [batch.function_call('AHKWinGetTitle', [f'ahk_id {win.id}']) for win in windows]
+            print([title.result() for title in titles])
+
+        """
+        return AsyncBatch(self)
+
     def add_hotstring(
         self,
         trigger: str,
@@ -3645,11 +3838,17 @@ class AsyncAHK(Generic[T_AHKVersion]):
         """
         Set the full binary contents of the clipboard. Expects bytes object as returned by :py:meth:`get_clipboard_all`
         """
-        # TODO: figure out how to do this without a tempfile
         if not isinstance(contents, bytes):
             raise ValueError('Malformed data. Can only set bytes as returned by get_clipboard_all')
         if not contents:
             raise ValueError('bytes must be nonempty. If you want to clear the clipboard, use `set_clipboard`')
+        if not self._transport._started:
+            await self._transport.init()  # the handshake tells whether the daemon takes uploads
+        if self._transport._supports_uploads():
+            # large contents are uploaded to the daemon in chunks (see RequestMessage.format_chunked)
+            args = [str(base64.b64encode(contents), 'ascii')]
+            return await self._transport.function_call('AHKSetClipboardAll', args, blocking=blocking)
+        # daemons from older or custom templates read the data from a file
         with tempfile.NamedTemporaryFile(prefix='ahk-python', suffix='.clip', mode='wb', delete=False) as f:
             f.write(contents)
 
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Mapping
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+# Read functions that may be cached, with their default time to live (seconds).
+# Only functions whose results are plain values (not tied to an engine) belong here
+DEFAULT_READ_CACHE_TTLS: Mapping[str, float] = {
+    'AHKWinGetTitle': 1.0,
+    'AHKWinGetClass': 10.0,
+    # these never change for a given window
+    'AHKWinGetPID': 60.0,
+    'AHKWinGetProcessName': 60.0,
+    'AHKWinGetProcessPath': 60.0,
+    # these only change when set through the engine, which invalidates them
+    'AHKGetCoordMode': 60.0,
+    'AHKGetSendLevel': 60.0,
+    'AHKGetSendMode': 60.0,
+    'AHKGetTitleMatchMode': 60.0,
+    'AHKGetTitleMatchSpeed': 60.0,
+}
+
+_CACHEABLE_FUNCTIONS = frozenset(
+    [
+        'AHKGetCoordMode',
+        'AHKGetSendLevel',
+        'AHKGetSendMode',
+        'AHKGetTitleMatchMode',
+        'AHKGetTitleMatchSpeed',
+        'AHKWinGetClass',
+        'AHKWinGetExStyle',
+        'AHKWinGetMinMax',
+        'AHKWinGetPID',
+        'AHKWinGetPos',
+        'AHKWinGetProcessName',
+        'AHKWinGetProcessPath',
+        'AHKWinGetStyle',
+        'AHKWinGetText',
+        'AHKWinGetTitle',
+        'AHKWinGetTransColor',
+        'AHKWinGetTransparent',
+        'AHKWinIsAlwaysOnTop',
+    ]
+)
+
+# Results that stay the same for as long as the window exists. Changes to other properties of the window leave them be
+_WINDOW_IDENTITY_FUNCTIONS = frozenset(['AHKWinGetPID', 'AHKWinGetProcessName', 'AHKWinGetProcessPath'])
+
+# Window calls that take a value (e.g., the new title) before the arguments that identify the window
+_LEADING_VALUE_FUNCTIONS = frozenset(
+    [
+        'AHKWinSetAlwaysOnTop',
+        'AHKWinSetExStyle',
+        'AHKWinSetRegion',
+        'AHKWinSetStyle',
+        'AHKWinSetTitle',
+        'AHKWinSetTransColor',
+        'AHKWinSetTransparent',
+    ]
+)
+
+# Calls after which the window (and so its handle) may no longer exist
+_WINDOW_DESTROYING_FUNCTIONS = frozenset(['AHKWinClose', 'AHKWinKill'])
+
+# Calls that change a setting, and the cached reads of that setting
+_SETTING_READS = {
+    'AHKSetCoordMode': ('AHKGetCoordMode',),
+    'AHKSetSendLevel': ('AHKGetSendLevel',),
+    'AHKSetSendMode': ('AHKGetSendMode',),
+    'AHKSetTitleMatchMode': ('AHKGetTitleMatchMode', 'AHKGetTitleMatchSpeed'),
+    'AHKSetDetectHiddenWindows': (),
+}
+
+# Settings that change which windows a title matches
+_WINDOW_MATCHING_SETTINGS = frozenset(['AHKSetTitleMatchMode', 'AHKSetDetectHiddenWindows'])
+
+
+def _window_id(args: List[str]) -> Optional[int]:
+    """
+    The window handle a call with the given window arguments targets, if it names exactly one window by ``ahk_id``
+    """
+    if len(args) < 4 or any(args[1:4]):
+        return None
+    criteria = args[0].split()
+    if len(criteria) != 2 or criteria[0].lower() != 'ahk_id':
+        return None
+    try:
+        return int(criteria[1], 0)
+    except ValueError:
+        return None
+
+
+class ReadCacheStats(NamedTuple):
+    hits: int
+    misses: int
+    invalidations: int  # cached entries dropped because of a call that changed what they read
+    size: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ReadCache:
+    """
+    Cache of the results of read-only daemon calls, such as window titles or the current coord mode.
+
+    Each function has its own time to live. Calls that change state invalidate the cached results they may affect:
+    setting a setting drops the cached reads of that setting, and a call that changes a window drops what is cached
+    about that window. Windows are told apart by ``ahk_id``; a call that targets windows by title drops what is
+    cached about all windows.
+    """
+
+    def __init__(self, ttls: Optional[Mapping[str, float]] = None):
+        ttls = DEFAULT_READ_CACHE_TTLS if ttls is None else ttls
+        unsupported = sorted(set(ttls) - _CACHEABLE_FUNCTIONS)
+        if unsupported:
+            raise ValueError(f'Results of these functions cannot be cached: {", ".join(unsupported)}')
+        self.ttls: Dict[str, float] = dict(ttls)
+        # (function name, args) -> (expires at, value)
+        self._entries: Dict[Tuple[str, Tuple[str, ...]], Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        # incremented on every invalidation, so that a read that was in flight at the time is not cached
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def caches(self, function_name: str) -> bool:
+        return function_name in self.ttls
+
+    def lookup(self, function_name: str, args: List[str]) -> Tuple[bool, Any, int]:
+        """
+        Returns whether a result is cached, the cached result, and the generation to pass to :py:meth:`store` to
+        cache the result of the call otherwise
+        """
+        key = (function_name, tuple(args))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._hits += 1
+                    return True, value, self._generation
+                del self._entries[key]
+            self._misses += 1
+            return False, None, self._generation
+
+    def store(self, function_name: str, args: List[str], value: Any, generation: int) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return None  # something was invalidated while the call was in flight; its result may be stale
+            self._entries[(function_name, tuple(args))] = (time.monotonic() + self.ttls[function_name], value)
+        return None
+
+    def invalidate(self, function_name: str, args: List[str]) -> None:
+        """
+        Drop the cached results that a call to ``function_name`` with ``args`` may change
+        """
+        if function_name in _CACHEABLE_FUNCTIONS:
+            return None  # reads do not change anything
+        if function_name in _SETTING_READS:
+            reads = _SETTING_READS[function_name]
+            matching = function_name in _WINDOW_MATCHING_SETTINGS
+
+            def affected_by_setting(name: str, cached_args: Tuple[str, ...]) -> bool:
+                if name in reads:
+                    return True
+                # results for windows found by title may now be for a different window
+                return matching and name.startswith('AHKWin') and _window_id(list(cached_args)) is None
+
+            self._drop(affected_by_setting)
+        elif function_name.startswith('AHKWin') or function_name == 'WinActivateBottom':
+            target = _window_id(args[1:] if function_name in _LEADING_VALUE_FUNCTIONS else args)
+            destroyed = function_name in _WINDOW_DESTROYING_FUNCTIONS
+
+            def affected(name: str, cached_args: Tuple[str, ...]) -> bool:
+                if not name.startswith('AHKWin'):
+                    return False
+                cached_target = _window_id(list(cached_args))
+                if target is not None and cached_target is not None and cached_target != target:
+                    return False  # a different window
+                if name in _WINDOW_IDENTITY_FUNCTIONS and cached_target is not None:
+                    return destroyed
+                return True
+
+            self._drop(affected)
+        return None
+
+    def _drop(self, affected: Callable[[str, Tuple[str, ...]], bool]) -> None:
+        with self._lock:
+            self._generation += 1
+            stale = [key for key in self._entries if affected(*key)]
+            for key in stale:
+                del self._entries[key]
+            self._invalidations += len(stale)
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+        return None
+
+    @property
+    def stats(self) -> ReadCacheStats:
+        with self._lock:
+            return ReadCacheStats(
+                hits=self._hits, misses=self._misses, invalidations=self._invalidations, size=len(self._entries)
+            )
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._hits = self._misses = self._invalidations = 0
+        return None
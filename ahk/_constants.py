@@ -25,11 +25,20 @@ MESSAGE_TYPES := Object({% for tom, msg_class in message_registry.items() %}"{{
 {% endblock message_types %}
 
 NOVALUE_SENTINEL := Chr(57344)
+RESPONSE_FRAMING := "lines"
+UPLOADS := {}  ; arguments being uploaded ahead of their requests, by upload ID
 
 FormatResponse(ByRef MessageType, ByRef payload) {
     global MESSAGE_TYPES
-    newline_count := CountNewlines(payload)
-    response := Format("{}`n{}`n{}`n", MESSAGE_TYPES[MessageType], newline_count, payload)
+    global RESPONSE_FRAMING
+    if (RESPONSE_FRAMING = "length") {
+        ; size of the payload in bytes when written as UTF-8 (StrPut also counts the null terminator)
+        byte_count := StrPut(payload, "UTF-8") - 1
+        response := Format("{}`n={}`n{}`n", MESSAGE_TYPES[MessageType], byte_count, payload)
+    } else {
+        newline_count := CountNewlines(payload)
+        response := Format("{}`n{}`n{}`n", MESSAGE_TYPES[MessageType], newline_count, payload)
+    }
     return response
 }
 
@@ -2585,6 +2594,28 @@ AHKEcho(args*) {
     {% endblock AHKEcho %}
 }
 
+AHKSetResponseFraming(args*) {
+    {% block AHKSetResponseFraming %}
+    global RESPONSE_FRAMING
+    framing := args[1]
+    if (framing != "lines" and framing != "length") {
+        return FormatResponse("ahk.message.ExceptionResponseMessage", "Unsupported response framing: " . framing)
+    }
+    ; the acknowledgement is still framed the old way
+    response := FormatNoValueResponse()
+    RESPONSE_FRAMING := framing
+    return response
+    {% endblock AHKSetResponseFraming %}
+}
+
+AHKProtocolHello(args*) {
+    {% block AHKProtocolHello %}
+    ; announce the protocol version followed by one optional protocol feature per line
+    ; clients that do not recognize a feature ignore it
+    return FormatResponse("ahk.message.StringResponseMessage", "1`nbatch`nlength-framing`nrequest-ids`nchunked-args")
+    {% endblock AHKProtocolHello %}
+}
+
 AHKTraytip(args*) {
     {% block AHKTraytip %}
     title := args[1]
@@ -2632,9 +2663,19 @@ AHKSetClipboard(args*) {
 
 AHKSetClipboardAll(args*) {
     {% block AHKSetClipboardAll %}
-    ; TODO there should be a way for us to accept a base64 string instead
-    filename := args[1]
-    FileRead, Clipboard, %filename%
+    ; the data as returned by AHKGetClipboardAll: uploaded (see UploadChunk), given as base64 or, from clients that
+    ; do not upload it, as ``*c <path>`` of a file to read it from
+    data := args[1]
+    if (!IsObject(data) and RegExMatch(data, "[^A-Za-z0-9+/=]")) {
+        FileRead, Clipboard, %data%
+        return FormatNoValueResponse()
+    }
+    if (!IsObject(data)) {
+        encoded := data
+        data := new DaemonUpload()
+        data.Append(encoded)
+    }
+    SetClipboardAllFromMemory(data.ptr, data.size)
     return FormatNoValueResponse()
     {% endblock AHKSetClipboardAll %}
 }
@@ -2854,6 +2895,143 @@ b64encode(ByRef data) {
 
 ; End of included content
 
+class DaemonUpload {
+    ; bytes of an argument uploaded in chunks, held in memory from the process heap
+    __New() {
+        this.ptr := 0
+        this.size := 0
+        this.capacity := 0
+        this.error := ""
+    }
+
+    __Delete() {
+        if (this.ptr) {
+            DllCall("HeapFree", "Ptr", DllCall("GetProcessHeap", "Ptr"), "UInt", 0, "Ptr", this.ptr)
+        }
+    }
+
+    Append(encoded) {
+        ; decode a chunk of base64 to the end of the upload, growing it as needed
+        chunk_size := 0
+        if (!DllCall("Crypt32\CryptStringToBinary", "Ptr", &encoded, "UInt", StrLen(encoded), "UInt", 0x1, "Ptr", 0, "UIntP", chunk_size, "Ptr", 0, "Ptr", 0)) {
+            throw Exception("Malformed upload chunk", -1)
+        }
+        needed := this.size + chunk_size
+        if (needed > this.capacity) {
+            capacity := (needed > this.capacity * 2) ? needed : this.capacity * 2
+            heap := DllCall("GetProcessHeap", "Ptr")
+            if (this.ptr) {
+                ptr := DllCall("HeapReAlloc", "Ptr", heap, "UInt", 0, "Ptr", this.ptr, "UPtr", capacity, "Ptr")
+            } else {
+                ptr := DllCall("HeapAlloc", "Ptr", heap, "UInt", 0, "UPtr", capacity, "Ptr")
+            }
+            if (!ptr) {
+                throw Exception(Format("Not enough memory for an upload of {} bytes", needed), -1)
+            }
+            this.ptr := ptr
+            this.capacity := capacity
+        }
+        if (!DllCall("Crypt32\CryptStringToBinary", "Ptr", &encoded, "UInt", StrLen(encoded), "UInt", 0x1, "Ptr", this.ptr + this.size, "UIntP", chunk_size, "Ptr", 0, "Ptr", 0)) {
+            throw Exception("Malformed upload chunk", -1)
+        }
+        this.size += chunk_size
+    }
+
+    Text() {
+        if (this.size = 0) {
+            return ""
+        }
+        return StrGet(this.ptr, this.size, "UTF-8")
+    }
+}
+
+UploadChunk(ByRef line) {
+    ; An upload line (<upload id>|<base64 chunk>) appends a chunk to an argument that a later request refers to as
+    ; @<upload id> (text) or &<upload id> (binary data). Upload lines are not answered; errors are reported by the
+    ; request that refers to the upload.
+    global UPLOADS
+    separator := InStr(line, "|")
+    upload_id := SubStr(line, 1, separator - 1)
+    if (!UPLOADS.HasKey(upload_id)) {
+        UPLOADS[upload_id] := new DaemonUpload()
+    }
+    upload := UPLOADS[upload_id]
+    if (upload.error = "") {
+        try {
+            upload.Append(SubStr(line, separator + 1))
+        } catch e {
+            upload.error := e.message
+        }
+    }
+}
+
+TakeUpload(upload_id) {
+    global UPLOADS
+    if (!UPLOADS.HasKey(upload_id)) {
+        upload := new DaemonUpload()
+        upload.error := Format("Unknown upload {}", upload_id)
+        return upload
+    }
+    return UPLOADS.Delete(upload_id)
+}
+
+AHKUploadError(args*) {
+    return FormatResponse("ahk.message.ExceptionResponseMessage", "Upload failed: " . args[1])
+}
+
+IsGlobalMemoryClipboardFormat(clip_format) {
+    ; whether the data of a clipboard format is passed in global memory (HGLOBAL) rather than as a GDI object or
+    ; another kind of handle: CF_BITMAP, CF_METAFILEPICT, CF_PALETTE, CF_ENHMETAFILE, the display formats, private
+    ; formats and GDI object formats are not
+    static other_formats := {2: 1, 3: 1, 9: 1, 14: 1, 0x80: 1, 0x82: 1, 0x83: 1, 0x8E: 1}
+    if (other_formats.HasKey(clip_format)) {
+        return false
+    }
+    return (clip_format < 0x200 or clip_format > 0x3FF)
+}
+
+SetClipboardAllFromMemory(ptr, size) {
+    ; put data in the format of ClipboardAll (<format><size><data> for each format, then a zero format) on the clipboard
+    ; formats that are not passed in global memory are skipped
+    if (!DllCall("OpenClipboard", "Ptr", A_ScriptHwnd)) {
+        throw Exception("Could not open the clipboard", -1)
+    }
+    try {
+        DllCall("EmptyClipboard")
+        offset := 0
+        while (offset + 8 <= size) {
+            clip_format := NumGet(ptr + offset, 0, "UInt")
+            if (clip_format = 0) {
+                break
+            }
+            data_size := NumGet(ptr + offset, 4, "UInt")
+            offset += 8
+            if (offset + data_size > size) {
+                throw Exception("Malformed clipboard data", -1)
+            }
+            if (IsGlobalMemoryClipboardFormat(clip_format)) {
+                hmem := DllCall("GlobalAlloc", "UInt", 0x2, "UPtr", data_size, "Ptr")  ; GMEM_MOVEABLE
+                if (!hmem) {
+                    throw Exception(Format("Not enough memory for {} bytes of clipboard data", data_size), -1)
+                }
+                data := DllCall("GlobalLock", "Ptr", hmem, "Ptr")
+                if (!data) {
+                    DllCall("GlobalFree", "Ptr", hmem)
+                    throw Exception("Could not lock memory for clipboard data", -1)
+                }
+                DllCall("RtlMoveMemory", "Ptr", data, "Ptr", ptr + offset, "UPtr", data_size)
+                DllCall("GlobalUnlock", "Ptr", hmem)
+                if (!DllCall("SetClipboardData", "UInt", clip_format, "Ptr", hmem, "Ptr")) {
+                    DllCall("GlobalFree", "Ptr", hmem)
+                }
+            }
+            offset += data_size
+        }
+    } finally {
+        DllCall("CloseClipboard")
+    }
+}
+
 CommandArrayFromQuery(ByRef text) {
     decoded_commands := []
     encoded_array := StrSplit(text, "|")
@@ -2861,12 +3039,76 @@ CommandArrayFromQuery(ByRef text) {
     encoded_array.RemoveAt(1)
     decoded_commands.push(function_name)
     for index, encoded_value in encoded_array {
+        marker := SubStr(encoded_value, 1, 1)
+        if (marker = "@" or marker = "&") {
+            ; an argument uploaded ahead of the request, as text (@) or binary data (&)
+            upload := TakeUpload(SubStr(encoded_value, 2))
+            if (upload.error != "") {
+                return ["AHKUploadError", upload.error]
+            }
+            decoded_commands.push(marker = "@" ? upload.Text() : upload)
+            continue
+        }
         decoded_value := b64decode(encoded_value)
         decoded_commands.push(decoded_value)
     }
     return decoded_commands
 }
 
+HandleQuery(query) {
+    ; Dispatches a request line and returns the response to send back, or "" for a line that is not answered (an
+    ; upload). Shared by the main loop below and the socket and ring variants of the daemon, which only frame lines.
+    ; Assume-global, so the blocks below see the same variables as in the main loop.
+    global
+    if (SubStr(query, 1, 1) = "+") {
+        UploadChunk(SubStr(query, 2))
+        return ""
+    }
+    ; Requests may carry a correlation header (#<id>|) which is echoed back ahead of the response
+    response_header := ""
+    if (SubStr(query, 1, 1) = "#") {
+        header_end := InStr(query, "|")
+        response_header := SubStr(query, 1, header_end - 1) . "`n"
+        query := SubStr(query, header_end + 1)
+    }
+    ; A batch request (*<call>`t<call>...) dispatches each call in order and answers with a single framed response
+    is_batch := (SubStr(query, 1, 1) = "*")
+    if (is_batch) {
+        queries := StrSplit(SubStr(query, 2), "`t")
+    } else {
+        queries := [query]
+    }
+    batch_responses := ""
+    for query_index, query in queries {
+        pyresp := ""
+        argsArray := CommandArrayFromQuery(query)
+        try {
+            func := argsArray[1]
+            argsArray.RemoveAt(1)
+            {% block before_function %}
+            {% endblock before_function %}
+            pyresp := %func%(argsArray*)
+            {% block after_function %}
+            {% endblock after_function %}
+        } catch e {
+            {% block function_error_handle %}
+            message := Format("Error occurred in {}. The error message was: {}", e.What, e.message)
+            pyresp := FormatResponse("ahk.message.ExceptionResponseMessage", message)
+            {% endblock function_error_handle %}
+        }
+        if (!pyresp) {
+            pyresp := FormatResponse("ahk.message.ExceptionResponseMessage", Format("Unknown Error when calling {}", func))
+        }
+        if (is_batch) {
+            batch_responses .= pyresp
+        }
+    }
+    if (is_batch) {
+        pyresp := FormatResponse("ahk.message.BatchResponseMessage", batch_responses)
+    }
+    return response_header . pyresp
+}
+
 ; BEGIN extension scripts
 {% for ext in extensions %}
 {{ ext.script_text }}
@@ -2892,28 +3134,12 @@ Loop {
         ; Exit to avoid leaving the process hanging around needlessly
         ExitApp
     }
-    argsArray := CommandArrayFromQuery(query)
-    try {
-        func := argsArray[1]
-        argsArray.RemoveAt(1)
-        {% block before_function %}
-        {% endblock before_function %}
-        pyresp := %func%(argsArray*)
-        {% block after_function %}
-        {% endblock after_function %}
-    } catch e {
-        {% block function_error_handle %}
-        message := Format("Error occurred in {}. The error message was: {}", e.What, e.message)
-        pyresp := FormatResponse("ahk.message.ExceptionResponseMessage", message)
-        {% endblock function_error_handle %}
+    pyresp := HandleQuery(query)
+    if (pyresp = "") {
+        continue  ; not answered, e.g., an upload
     }
     {% block send_response %}
-    if (pyresp) {
-        FileAppend, %pyresp%, *, UTF-8
-    } else {
-        msg := FormatResponse("ahk.message.ExceptionResponseMessage", Format("Unknown Error when calling {}", func))
-        FileAppend, %msg%, *, UTF-8
-    }
+    FileAppend, %pyresp%, *, UTF-8
     {% endblock send_response %}
 }
 {% endblock autoexecute %}
@@ -3060,6 +3286,8 @@ MESSAGE_TYPES := Map({% for tom, msg_class in message_registry.items() %}"{{ msg
 {% endblock message_types %}
 
 NOVALUE_SENTINEL := Chr(57344)
+RESPONSE_FRAMING := "lines"
+UPLOADS := Map()  ; arguments being uploaded ahead of their requests, by upload ID
 
 StrCount(haystack, needle) {
     StrReplace(haystack, needle, "",, &count)
@@ -3068,8 +3296,15 @@ StrCount(haystack, needle) {
 
 FormatResponse(MessageType, payload) {
     global MESSAGE_TYPES
-    newline_count := StrCount(payload, "`n")
-    response := Format("{}`n{}`n{}`n", MESSAGE_TYPES[MessageType], newline_count, payload)
+    global RESPONSE_FRAMING
+    if (RESPONSE_FRAMING = "length") {
+        ; size of the payload in bytes when written as UTF-8 (StrPut also counts the null terminator)
+        byte_count := StrPut(payload, "UTF-8") - 1
+        response := Format("{}`n={}`n{}`n", MESSAGE_TYPES[MessageType], byte_count, payload)
+    } else {
+        newline_count := StrCount(payload, "`n")
+        response := Format("{}`n{}`n{}`n", MESSAGE_TYPES[MessageType], newline_count, payload)
+    }
     return response
 }
 
@@ -5721,6 +5956,28 @@ AHKEcho(args*) {
     {% endblock AHKEcho %}
 }
 
+AHKSetResponseFraming(args*) {
+    {% block AHKSetResponseFraming %}
+    global RESPONSE_FRAMING
+    framing := args[1]
+    if (framing != "lines" and framing != "length") {
+        return FormatResponse("ahk.message.ExceptionResponseMessage", "Unsupported response framing: " . framing)
+    }
+    ; the acknowledgement is still framed the old way
+    response := FormatNoValueResponse()
+    RESPONSE_FRAMING := framing
+    return response
+    {% endblock AHKSetResponseFraming %}
+}
+
+AHKProtocolHello(args*) {
+    {% block AHKProtocolHello %}
+    ; announce the protocol version followed by one optional protocol feature per line
+    ; clients that do not recognize a feature ignore it
+    return FormatResponse("ahk.message.StringResponseMessage", "1`nbatch`nlength-framing`nrequest-ids`nchunked-args")
+    {% endblock AHKProtocolHello %}
+}
+
 AHKTraytip(args*) {
     {% block AHKTraytip %}
     title := args[1]
@@ -5774,10 +6031,19 @@ AHKSetClipboard(args*) {
 
 AHKSetClipboardAll(args*) {
     {% block AHKSetClipboardAll %}
-    ; TODO there should be a way for us to accept a base64 string instead
-    filename := args[1]
-    contents := FileRead(filename, "RAW")
-    A_Clipboard := ClipboardAll(contents)
+    ; the data as returned by AHKGetClipboardAll: uploaded (see UploadChunk), given as base64 or, from clients that
+    ; do not upload it, as the path of a file to read it from
+    data := args[1]
+    if (!IsObject(data) && RegExMatch(data, "[^A-Za-z0-9+/=]")) {
+        A_Clipboard := ClipboardAll(FileRead(data, "RAW"))
+        return FormatNoValueResponse()
+    }
+    if (!IsObject(data)) {
+        encoded := data
+        data := DaemonUpload()
+        data.Append(encoded)
+    }
+    A_Clipboard := ClipboardAll(data.data.Ptr, data.size)
     return FormatNoValueResponse()
     {% endblock AHKSetClipboardAll %}
 }
@@ -6002,6 +6268,71 @@ b64encode(&data) {
 }
 
 
+class DaemonUpload {
+    ; bytes of an argument uploaded in chunks
+    __New() {
+        this.data := Buffer(0)
+        this.size := 0
+        this.error := ""
+    }
+
+    Append(encoded) {
+        ; decode a chunk of base64 to the end of the upload, growing it as needed
+        if (!DllCall("Crypt32.dll\CryptStringToBinary", "Ptr", StrPtr(encoded), "UInt", StrLen(encoded), "UInt", 0x1, "Ptr", 0, "UIntP", &chunk_size := 0, "Ptr", 0, "Ptr", 0)) {
+            throw Error("Malformed upload chunk", -1)
+        }
+        needed := this.size + chunk_size
+        if (needed > this.data.Size) {
+            this.data.Size := Max(needed, this.data.Size * 2)
+        }
+        if (!DllCall("Crypt32.dll\CryptStringToBinary", "Ptr", StrPtr(encoded), "UInt", StrLen(encoded), "UInt", 0x1, "Ptr", this.data.Ptr + this.size, "UIntP", &chunk_size, "Ptr", 0, "Ptr", 0)) {
+            throw Error("Malformed upload chunk", -1)
+        }
+        this.size += chunk_size
+    }
+
+    Text() {
+        if (this.size = 0) {
+            return ""
+        }
+        return StrGet(this.data.Ptr, this.size, "UTF-8")
+    }
+}
+
+UploadChunk(line) {
+    ; An upload line (<upload id>|<base64 chunk>) appends a chunk to an argument that a later request refers to as
+    ; @<upload id> (text) or &<upload id> (binary data). Upload lines are not answered; errors are reported by the
+    ; request that refers to the upload.
+    global UPLOADS
+    separator := InStr(line, "|")
+    upload_id := SubStr(line, 1, separator - 1)
+    if (!UPLOADS.Has(upload_id)) {
+        UPLOADS[upload_id] := DaemonUpload()
+    }
+    upload := UPLOADS[upload_id]
+    if (upload.error = "") {
+        try {
+            upload.Append(SubStr(line, separator + 1))
+        } catch Any as e {
+            upload.error := e.Message
+        }
+    }
+}
+
+TakeUpload(upload_id) {
+    global UPLOADS
+    if (!UPLOADS.Has(upload_id)) {
+        upload := DaemonUpload()
+        upload.error := Format("Unknown upload {}", upload_id)
+        return upload
+    }
+    return UPLOADS.Delete(upload_id)
+}
+
+AHKUploadError(args*) {
+    return FormatResponse("ahk.message.ExceptionResponseMessage", "Upload failed: " . args[1])
+}
+
 CommandArrayFromQuery(text) {
     decoded_commands := []
     encoded_array := StrSplit(text, "|")
@@ -6009,12 +6340,77 @@ CommandArrayFromQuery(text) {
     encoded_array.RemoveAt(1)
     decoded_commands.push(function_name)
     for index, encoded_value in encoded_array {
+        marker := SubStr(encoded_value, 1, 1)
+        if (marker = "@" or marker = "&") {
+            ; an argument uploaded ahead of the request, as text (@) or binary data (&)
+            upload := TakeUpload(SubStr(encoded_value, 2))
+            if (upload.error != "") {
+                return ["AHKUploadError", upload.error]
+            }
+            decoded_commands.push(marker = "@" ? upload.Text() : upload)
+            continue
+        }
         decoded_value := b64decode(&encoded_value)
         decoded_commands.push(decoded_value)
     }
     return decoded_commands
 }
 
+HandleQuery(query) {
+    ; Dispatches a request line and returns the response to send back, or "" for a line that is not answered (an
+    ; upload). Shared by the main loop below and the socket and ring variants of the daemon, which only frame lines.
+    ; Assume-global, so the blocks below see the same variables as in the main loop.
+    global
+    if (SubStr(query, 1, 1) = "+") {
+        UploadChunk(SubStr(query, 2))
+        return ""
+    }
+    ; Requests may carry a correlation header (#<id>|) which is echoed back ahead of the response
+    response_header := ""
+    if (SubStr(query, 1, 1) = "#") {
+        header_end := InStr(query, "|")
+        response_header := SubStr(query, 1, header_end - 1) . "`n"
+        query := SubStr(query, header_end + 1)
+    }
+    ; A batch request (*<call>`t<call>...) dispatches each call in order and answers with a single framed response
+    is_batch := (SubStr(query, 1, 1) = "*")
+    if (is_batch) {
+        queries := StrSplit(SubStr(query, 2), "`t")
+    } else {
+        queries := [query]
+    }
+    batch_responses := ""
+    for query_index, query in queries {
+        pyresp := ""
+        func_name := ""
+        argsArray := CommandArrayFromQuery(query)
+        try {
+            func_name := argsArray[1]
+            argsArray.RemoveAt(1)
+            {% block before_function %}
+            {% endblock before_function %}
+            pyresp := %func_name%(argsArray*)
+            {% block after_function %}
+            {% endblock after_function %}
+        } catch Any as e {
+            {% block function_error_handle %}
+            message := Format("Error occurred in {} (line {}). The error message was: {}. Specifically: {}`nStack:`n{}", e.what, e.line, e.message, e.extra, e.stack)
+            pyresp := FormatResponse("ahk.message.ExceptionResponseMessage", message)
+            {% endblock function_error_handle %}
+        }
+        if (!pyresp) {
+            pyresp := FormatResponse("ahk.message.ExceptionResponseMessage", Format("Unknown Error when calling {}", func_name))
+        }
+        if (is_batch) {
+            batch_responses .= pyresp
+        }
+    }
+    if (is_batch) {
+        pyresp := FormatResponse("ahk.message.BatchResponseMessage", batch_responses)
+    }
+    return response_header . pyresp
+}
+
 ; BEGIN extension scripts
 {% for ext in extensions %}
 {{ ext.script_text }}
@@ -6040,30 +6436,13 @@ Loop {
         ; Exit to avoid leaving the process hanging around
         ExitApp
     }
-    argsArray := CommandArrayFromQuery(query)
-    try {
-        func_name := argsArray[1]
-        argsArray.RemoveAt(1)
-        {% block before_function %}
-        {% endblock before_function %}
-        pyresp := %func_name%(argsArray*)
-        {% block after_function %}
-        {% endblock after_function %}
-    } catch Any as e {
-        {% block function_error_handle %}
-        message := Format("Error occurred in {} (line {}). The error message was: {}. Specifically: {}`nStack:`n{}", e.what, e.line, e.message, e.extra, e.stack)
-        pyresp := FormatResponse("ahk.message.ExceptionResponseMessage", message)
-        {% endblock function_error_handle %}
+    pyresp := HandleQuery(query)
+    if (pyresp = "") {
+        continue  ; not answered, e.g., an upload
     }
     {% block send_response %}
-    if (pyresp) {
-        stdout.Write(pyresp)
-        stdout.Read(0)
-    } else {
-        msg := FormatResponse("ahk.message.ExceptionResponseMessage", Format("Unknown Error when calling {}", func_name))
-        stdout.Write(msg)
-        stdout.Read(0)
-    }
+    stdout.Write(pyresp)
+    stdout.Read(0)
     {% endblock send_response %}
 }
 
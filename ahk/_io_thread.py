@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any
+from typing import Optional
+from typing import Tuple
+from typing import Type
+from typing import TYPE_CHECKING
+from typing import Union
+
+from ahk.exceptions import AHKProcessExitedError
+from ahk.message import RequestMessage
+
+if TYPE_CHECKING:
+    from ahk._async.engine import AsyncAHK
+    from ahk._sync.engine import AHK
+    from ahk._sync.transport import DaemonProcessTransport
+
+    # (request, engine, deadline, future)
+    _Submission = Tuple[RequestMessage, Union[AsyncAHK[Any], AHK[Any], None], Optional[float], Future[Any]]
+
+
+class DaemonIOThread:
+    """
+    Runs a daemon, and all I/O with it, on a thread of its own.
+
+    Calls may be submitted from any thread or event loop. Each is answered with a
+    :py:class:`concurrent.futures.Future`, so sync and async engines in any number of threads and event loops can
+    share one daemon without contending for a lock. Use it with ``TransportClass=AsyncIOThreadTransport`` (or
+    ``IOThreadTransport`` for the sync API) and ``transport_options={'io_thread': io_thread}``.
+
+    :param TransportClass: the (sync) daemon transport used on the I/O thread
+    :param transport_options: options for ``TransportClass``
+    """
+
+    def __init__(self, TransportClass: Optional[Type[DaemonProcessTransport]] = None, **transport_options: Any):
+        if TransportClass is None:
+            # imported here because the transport modules import this one
+            from ahk._sync.transport import DaemonProcessTransport
+
+            TransportClass = DaemonProcessTransport
+        self.transport = TransportClass(**transport_options)
+        self._submissions: queue.Queue[Optional[_Submission]] = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def start(self) -> None:
+        """
+        Start the I/O thread and the daemon, if not started yet. Returns once the daemon is ready
+        """
+        with self._lock:
+            if self._stopped:
+                raise AHKProcessExitedError('The transport has been stopped')
+            if self._thread is not None:
+                return None
+            started: Future[None] = Future()
+            thread = threading.Thread(target=self._run, args=(started,), name='ahk-daemon-io', daemon=True)
+            thread.start()
+            started.result()  # raises if the daemon could not be started
+            self._thread = thread
+        return None
+
+    def submit(
+        self,
+        request: RequestMessage,
+        engine: Union[AsyncAHK[Any], AHK[Any], None] = None,
+        deadline: Optional[float] = None,
+    ) -> Future[Any]:
+        """
+        Queue a call to the daemon. Cancelling the returned future before the call is sent withdraws it
+        """
+        self.start()
+        fut: Future[Any] = Future()
+        self._submissions.put((request, engine, deadline, fut))
+        return fut
+
+    def stop(self) -> None:
+        """
+        Stop the daemon once the calls already submitted are done
+        """
+        with self._lock:
+            self._stopped = True
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return None
+        self._submissions.put(None)
+        thread.join()
+        self.transport.stop()
+        return None
+
+    def _run(self, started: Future[None]) -> None:
+        try:
+            self.transport.init()
+        except Exception as e:
+            started.set_exception(e)
+            return None
+        started.set_result(None)
+        while True:
+            submission = self._submissions.get()
+            if submission is None:
+                return None
+            request, engine, deadline, fut = submission
+            if not fut.set_running_or_notify_cancel():
+                continue  # the caller went away before the call was sent
+            try:
+                result = self.transport.send(request, engine=engine, deadline=deadline)  # type: ignore[arg-type]
+            except Exception as e:
+                fut.set_exception(e)
+            else:
+                fut.set_result(result)
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import atexit
+import mmap
+import os
+import struct
+import tempfile
+from typing import Optional
+from typing import Union
+
+from ahk._utils import try_remove
+
+# Layout of a ring file (all integers are unsigned, little-endian 64-bit):
+#
+#   0      file header: magic, capacity of each ring
+#   64     request ring (written by Python, read by the daemon)
+#   64 + RING_HEADER_SIZE + capacity     response ring (written by the daemon, read by Python)
+#
+# Each ring starts with the total number of bytes ever written to it (at 0) and read from it (at 64), so that the
+# two sides do not write to the same cache line. The data follows and wraps around after ``capacity`` bytes.
+# Only the writer of a ring advances its write count, and only after the data is in place; only the reader
+# advances the read count.
+_RING_MAGIC = b'AHKRING1'
+_FILE_HEADER = struct.Struct('<8sQ')
+_COUNTER = struct.Struct('<Q')
+FILE_HEADER_SIZE = 64
+RING_HEADER_SIZE = 128
+_READ_COUNT_OFFSET = 64
+
+DEFAULT_RING_CAPACITY = 1024 * 1024
+
+
+class RingBuffer:
+    """
+    Byte stream from one process to another through shared memory, for one writer and one reader
+    """
+
+    def __init__(self, memory: mmap.mmap, offset: int, capacity: int):
+        self._memory = memory
+        self._written_at = offset
+        self._read_at = offset + _READ_COUNT_OFFSET
+        self._data = offset + RING_HEADER_SIZE
+        self.capacity = capacity
+
+    def _load(self, position: int) -> int:
+        value: int = _COUNTER.unpack_from(self._memory, position)[0]
+        return value
+
+    def _store(self, position: int, value: int) -> None:
+        _COUNTER.pack_into(self._memory, position, value)
+        return None
+
+    def readable(self) -> int:
+        return self._load(self._written_at) - self._load(self._read_at)
+
+    def write(self, data: Union[bytes, bytearray, memoryview]) -> int:
+        """
+        Copy as much of ``data`` into the ring as there is room for. Returns the number of bytes written, which is
+        0 while the ring is full
+        """
+        written = self._load(self._written_at)
+        free = self.capacity - (written - self._load(self._read_at))
+        size = min(free, len(data))
+        if size <= 0:
+            return 0
+        start = written % self.capacity
+        first = min(size, self.capacity - start)
+        memory = self._memory
+        begin = self._data + start
+        end = begin + first
+        memory[begin:end] = data[:first]
+        if first < size:
+            base = self._data
+            wrapped_end = base + size - first
+            memory[base:wrapped_end] = data[first:size]
+        self._store(self._written_at, written + size)  # published only once the data is in place
+        return size
+
+    def read(self, max_size: int) -> bytes:
+        """
+        Take up to ``max_size`` bytes out of the ring. Returns an empty bytes object while the ring is empty
+        """
+        read = self._load(self._read_at)
+        size = min(self._load(self._written_at) - read, max_size)
+        if size <= 0:
+            return b''
+        start = read % self.capacity
+        first = min(size, self.capacity - start)
+        memory = self._memory
+        begin = self._data + start
+        end = begin + first
+        data = memory[begin:end]
+        if first < size:
+            base = self._data
+            wrapped_end = base + size - first
+            data += memory[base:wrapped_end]
+        self._store(self._read_at, read + size)  # frees the space for the writer
+        return data
+
+
+class SharedRings:
+    """
+    The pair of rings shared with a daemon in a memory-mapped file: requests to the daemon and its responses.
+
+    :param path: the ring file, as created with :py:meth:`create`
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'r+b') as f:
+            magic, capacity = _FILE_HEADER.unpack(f.read(_FILE_HEADER.size))
+            if magic != _RING_MAGIC:
+                raise ValueError(f'{path!r} is not a ring file')
+            self._memory = mmap.mmap(f.fileno(), FILE_HEADER_SIZE + 2 * (RING_HEADER_SIZE + capacity))
+        self.capacity: int = capacity
+        self.requests = RingBuffer(self._memory, FILE_HEADER_SIZE, capacity)
+        self.responses = RingBuffer(self._memory, FILE_HEADER_SIZE + RING_HEADER_SIZE + capacity, capacity)
+
+    @classmethod
+    def create(cls, capacity: int = DEFAULT_RING_CAPACITY, directory: Optional[str] = None) -> SharedRings:
+        """
+        Create a ring file (removed when this process exits) and map it
+        """
+        if capacity < 1:
+            raise ValueError(f'ring capacity must be at least 1, got {capacity!r}')
+        fd, path = tempfile.mkstemp(prefix='python-ahk-', suffix='.ring', dir=directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_FILE_HEADER.pack(_RING_MAGIC, capacity))
+            f.truncate(FILE_HEADER_SIZE + 2 * (RING_HEADER_SIZE + capacity))
+        atexit.register(try_remove, path)
+        return cls(path)
+
+    def close(self) -> None:
+        self._memory.close()
+        return None
+
+
+class RingPoller:
+    """
+    How long to wait before looking at a ring again while it has nothing for us: not at all (only yielding) for the
+    first ``spins`` polls, so that a response that is about to arrive is picked up right away, then for increasingly
+    long, up to ``max_interval`` seconds, so that waiting on an idle daemon costs little CPU.
+    """
+
+    def __init__(self, max_interval: float = 0.001, spins: int = 200):
+        self.max_interval = max_interval
+        self.spins = spins
+        self._polls = 0
+        self._interval = 0.0
+
+    def next_interval(self) -> float:
+        self._polls += 1
+        if self._polls <= self.spins:
+            return 0.0
+        self._interval = min(self.max_interval, max(self._interval * 2, 0.00001))
+        return self._interval
+
+    @property
+    def spinning(self) -> bool:
+        return self._polls < self.spins
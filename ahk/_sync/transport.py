@@ -2,27 +2,39 @@ from __future__ import annotations
 
 import asyncio.subprocess
 import atexit
+import hashlib
+import heapq
+import io
+import itertools
+import logging
 import os
+import queue
 import re
+import socket
 import subprocess
 import sys
 import tempfile
 import threading
+import time
 import warnings
 from abc import ABC
 from abc import abstractmethod
 from concurrent.futures import Future
 from concurrent.futures import ThreadPoolExecutor
-from io import BytesIO
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextvars import ContextVar
+from functools import partial
 from typing import Any
 from typing import Callable
 from typing import Generic
+from typing import Iterable
 from typing import List
 from typing import Literal
 from typing import Optional
 from typing import overload
 from typing import Protocol
 from typing import runtime_checkable
+from typing import Sequence
 from typing import Tuple
 from typing import Type
 from typing import TYPE_CHECKING
@@ -31,22 +43,41 @@ from typing import Union
 
 import jinja2
 
+from ahk._cache import ReadCache
 from ahk._constants import DAEMON_SCRIPT_TEMPLATE as _DAEMON_SCRIPT_TEMPLATE
 from ahk._constants import DAEMON_SCRIPT_V2_TEMPLATE as _DAEMON_SCRIPT_V2_TEMPLATE
 from ahk._hotkey import Hotkey
 from ahk._hotkey import Hotstring
 from ahk._hotkey import ThreadedHotkeyTransport
+from ahk._io_thread import DaemonIOThread
+from ahk._ring import DEFAULT_RING_CAPACITY
+from ahk._ring import RingPoller
+from ahk._ring import SharedRings
+from ahk._types import CallPriority
 from ahk._types import Coordinates
 from ahk._types import FunctionName
 from ahk._types import Position
 from ahk._utils import _version_detection_script
 from ahk._utils import try_remove
 from ahk.directives import Directive
+from ahk.exceptions import AHKCallTimeoutError
+from ahk.exceptions import AHKDeferredCallError
+from ahk.exceptions import AHKExecutionException
+from ahk.exceptions import AHKFailoverError
+from ahk.exceptions import AHKProcessExitedError
 from ahk.exceptions import AHKProtocolError
+from ahk.extensions import _resolve_extensions
 from ahk.extensions import _resolve_includes
 from ahk.extensions import Extension
 from ahk.message import _message_registry
+from ahk.message import BatchRequestMessage
+from ahk.message import DaemonProtocol
+from ahk.message import DEFAULT_UPLOAD_CHUNK_SIZE
+from ahk.message import LEGACY_PROTOCOL
+from ahk.message import PROTOCOL_VERSION
 from ahk.message import RequestMessage
+from ahk.message import ResponseBuffer
+from ahk.message import ResponseFrame
 from ahk.message import ResponseMessage
 
 
@@ -117,10 +148,195 @@ class Communicable(Protocol):
     def kill(self) -> None: ...
 
 
+# the port daemons started by the socket transport listen on, unless told otherwise
+DEFAULT_DAEMON_SOCKET_PORT = 47650
+
+# the port the broker (``python -m ahk.broker``) listens on, unless told otherwise
+DEFAULT_BROKER_PORT = 47651
+
+# how much of the daemon's output to read at once into a process's response buffer
+_READ_CHUNK_SIZE = 65536
+
+# deadline (in time.monotonic() seconds) for daemon calls made in the current context; see AsyncAHK.deadline
+_call_deadline: ContextVar[Optional[float]] = ContextVar('_call_deadline', default=None)
+
+
+def _resolve_deadline(timeout: Optional[float]) -> Optional[float]:
+    """
+    The deadline for a call with the given ``timeout``, taking into account any deadline of the current context
+    """
+    deadline = _call_deadline.get()
+    if timeout is not None:
+        call_deadline = time.monotonic() + timeout
+        deadline = call_deadline if deadline is None else min(deadline, call_deadline)
+    return deadline
+
+
+def _time_left(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else max(deadline - time.monotonic(), 0.0)
+
+
+class _WatchdogEntry:
+    def __init__(self, watchdog: _Watchdog, callback: Callable[[], Any]):
+        self._watchdog = watchdog
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        if not self.cancelled:
+            self.cancelled = True
+            self._watchdog._cancelled()
+        return None
+
+
+class _Watchdog:
+    """
+    A single thread that calls functions at their deadlines (e.g., to kill a daemon that did not answer a call in
+    time), so that calls with a deadline do not each start a timer thread. The thread is started on first use.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, int, _WatchdogEntry]] = []
+        self._condition = threading.Condition()
+        self._order = itertools.count()
+        self._cancelled_count = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, deadline: float, callback: Callable[[], Any]) -> _WatchdogEntry:
+        """
+        Call ``callback`` on the watchdog thread at ``deadline`` (in :py:func:`time.monotonic` time), unless the
+        returned entry is cancelled before then
+        """
+        entry = _WatchdogEntry(self, callback)
+        with self._condition:
+            heapq.heappush(self._heap, (deadline, next(self._order), entry))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='ahk-watchdog', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return entry
+
+    def _cancelled(self) -> None:
+        with self._condition:
+            self._cancelled_count += 1
+            # most calls finish well before their deadline; their entries are dropped in bulk
+            if self._cancelled_count > 64 and self._cancelled_count * 2 > len(self._heap):
+                self._heap = [item for item in self._heap if not item[2].cancelled]
+                heapq.heapify(self._heap)
+                self._cancelled_count = 0
+        return None
+
+    def _next_due(self) -> _WatchdogEntry:
+        with self._condition:
+            while True:
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                    self._cancelled_count -= 1
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                deadline, _, entry = self._heap[0]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    heapq.heappop(self._heap)
+                    return entry
+                self._condition.wait(remaining)
+
+    def _run(self) -> None:
+        while True:
+            entry = self._next_due()
+            if entry.cancelled:
+                continue
+            try:
+                entry.callback()
+            except Exception:
+                pass
+
+
+_watchdog = _Watchdog()
+
+
+def _call_at(deadline: float, callback: Callable[[], Any]) -> Any:
+    """
+    Call ``callback`` at ``deadline`` (in :py:func:`time.monotonic` time). Returns a handle with a ``cancel`` method
+    """
+    return _watchdog.schedule(deadline, callback)
+
+
+# priority of daemon calls made in the current context; see AsyncAHK.priority
+_call_priority: ContextVar[Optional[CallPriority]] = ContextVar('_call_priority', default=None)
+
+_PRIORITY_LEVELS = {'interactive': 0, 'normal': 1, 'background': 2}
+
+
+class _PriorityScheduler:
+    """
+    Admits callers to the daemon ``slots`` at a time, by priority rather than in order of arrival. For every
+    ``aging`` seconds a caller waits, it moves up one priority level, so lower priority calls are delayed but
+    never starved.
+    """
+
+    def __init__(self, slots: int, aging: float):
+        self._free = slots
+        self._aging = aging
+        # heap of (rank, arrival, future). The rank of a waiter is its arrival time pushed back by its level
+        self._waiters: List[Tuple[float, int, Any]] = []
+        self._arrivals = itertools.count()
+        self._lock = threading.Lock()
+
+    def _create_waiter(self) -> Any:
+        return Future()
+
+    def _wait(self, waiter: Any, timeout: Optional[float]) -> Any:
+        return waiter.result(timeout)
+
+    def _admit_waiters(self) -> None:
+        # called with the lock held
+        while self._free and self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():  # otherwise the waiter gave up
+                waiter.set_result(None)
+                self._free -= 1
+        return None
+
+    def acquire(self, priority: CallPriority, deadline: Optional[float]) -> bool:
+        waiter = self._create_waiter()
+        rank = time.monotonic() + _PRIORITY_LEVELS[priority] * self._aging
+        with self._lock:
+            heapq.heappush(self._waiters, (rank, next(self._arrivals), waiter))
+            self._admit_waiters()
+        if waiter.done():
+            return True
+        try:
+            self._wait(waiter, _time_left(deadline))
+        except BaseException as e:
+            with self._lock:
+                admitted = not waiter.cancel()
+            if admitted:
+                if isinstance(e, (asyncio.TimeoutError, FutureTimeoutError)):
+                    return True  # admitted just as the deadline passed
+                self.release()
+            if isinstance(e, (asyncio.TimeoutError, FutureTimeoutError)):
+                return False
+            raise
+        return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._free += 1
+            self._admit_waiters()
+        return None
+
+
+
+
 class SyncAHKProcess:
     def __init__(self, runargs: List[str]):
         self.runargs = runargs
         self._proc: Optional[SyncIOProcess] = None
+        self.response_buffer = ResponseBuffer()
+        # responses still to come for requests whose callers went away (e.g., were cancelled) before reading them
+        self.abandoned_responses = 0
 
     @property
     def returncode(self) -> Optional[int]:
@@ -160,6 +376,34 @@ class SyncAHKProcess:
         assert isinstance(b, bytes)
         return b
 
+    def wait(self) -> int:
+        assert self._proc is not None
+        return self._proc.wait()
+
+    def readexactly(self, n: int) -> bytes:
+        """
+        Read exactly n bytes. Raises EOFError if the process output ends first.
+        """
+        assert self._proc is not None
+        assert self._proc.stdout is not None
+        assert isinstance(self._proc, subprocess.Popen)
+        assert self._proc.stdout is not None
+        b = self._proc.stdout.read(n)
+        if len(b) != n:
+            raise EOFError(f'Expected {n} bytes, but only {len(b)} were read')
+        return b
+
+    def read_chunk(self, n: int = _READ_CHUNK_SIZE) -> bytes:
+        """
+        Read whatever output is available, up to n bytes, waiting until there is some.
+        Returns an empty bytes object at EOF.
+        """
+        assert self._proc is not None
+        assert self._proc.stdout is not None
+        assert isinstance(self._proc, subprocess.Popen)
+        assert isinstance(self._proc.stdout, io.BufferedIOBase)
+        return self._proc.stdout.read1(n)
+
     def kill(self) -> None:
         assert self._proc is not None, 'no process to kill'
         self._proc.kill()
@@ -188,6 +432,309 @@ def sync_create_process(runargs: List[str]) -> subprocess.Popen[bytes]:
     return subprocess.Popen(runargs, stdin=subprocess.PIPE, stderr=subprocess.STDOUT, stdout=subprocess.PIPE)
 
 
+def launch_detached(runargs: List[str]) -> None:
+    """
+    Start a process that keeps running after this one exits
+    """
+    if sys.platform == 'win32':
+        flags = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        subprocess.Popen(runargs, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, creationflags=flags)
+    else:
+        subprocess.Popen(runargs, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, start_new_session=True)
+    return None
+
+
+class SyncAHKSocketConnection(SyncAHKProcess):
+    """
+    Connection to a daemon that listens on a TCP socket, used in place of a daemon process of our own.
+    Killing it closes the connection; the daemon keeps running.
+
+    :param address: the (host, port) the daemon listens on
+    :param launch_args: if given and nothing is listening at the address, these are run (detached) to start a daemon
+    :param connect_timeout: seconds to keep trying to connect, e.g., while a launched daemon starts up
+    :param buffer_size: size of the socket's send and receive buffers, if not the system default
+    """
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        launch_args: Optional[List[str]] = None,
+        connect_timeout: float = 10.0,
+        buffer_size: Optional[int] = None,
+    ):
+        super().__init__(runargs=launch_args or [])
+        self.address = address
+        self.connect_timeout = connect_timeout
+        self.buffer_size = buffer_size
+        self._reader: Any = None  # asyncio.StreamReader, or the socket's file in the sync API
+        self._writer: Any = None  # asyncio.StreamWriter, or the socket in the sync API
+        self._send: Callable[[bytes], Any]  # sends all of the given bytes
+        self._closed = False
+
+    @property
+    def returncode(self) -> Optional[int]:
+        return 0 if self._closed else None
+
+    def start(self, atexit_cleanup: bool = True) -> None:
+        give_up_at = time.monotonic() + self.connect_timeout
+        launched = False
+        while True:
+            try:
+                return self._connect()
+            except OSError:
+                if time.monotonic() >= give_up_at:
+                    raise
+                if self.runargs and not launched:
+                    launch_detached(self.runargs)
+                    launched = True
+            self._retry_pause()
+
+    def _retry_pause(self) -> None:
+        return time.sleep(0.05)
+
+    def _open_socket(self) -> Any:
+        """
+        Connect to the daemon, without blocking the event loop in the async API. Returns the connected socket
+        """
+        sock = socket.create_connection(self.address, timeout=self.connect_timeout)
+        sock.settimeout(None)
+        self._reader, self._writer = sock.makefile('rb'), sock
+        self._send = sock.sendall
+        return sock
+
+    def _connect(self) -> None:
+        sock = self._open_socket()
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.buffer_size is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.buffer_size)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.buffer_size)
+        return None
+
+
+    def drain_stdin(self) -> None:
+        return None  # every write is sent in full
+
+    def write(self, content: bytes) -> None:
+        self._send(content)
+
+    def _received(self, data: bytes) -> bytes:
+        if not data:
+            self._closed = True  # the daemon closed the connection
+        return data
+
+    def readline(self) -> bytes:
+        return self._received(self._reader.readline())
+
+    def read(self) -> bytes:
+        return self._received(self._reader.read())
+
+    def readexactly(self, n: int) -> bytes:
+        try:
+            b: bytes = self._reader.read(n)
+        except EOFError:
+            self._closed = True
+            raise
+        if len(b) != n:
+            self._closed = True
+            raise EOFError(f'Expected {n} bytes, but only {len(b)} were read')
+        return b
+
+    def read_chunk(self, n: int = _READ_CHUNK_SIZE) -> bytes:
+        return self._received(self._reader.read1(n))
+
+    def wait(self) -> int:
+        return 0
+
+    def kill(self) -> None:
+        assert self._writer is not None, 'not connected'
+        self._closed = True
+        try:
+            self._writer.shutdown(socket.SHUT_RDWR)  # wakes up a thread blocked reading from the socket
+        except OSError:
+            pass
+        self._reader.close()
+        self._writer.close()
+        return None
+
+
+class SyncAHKRingConnection(SyncAHKProcess):
+    """
+    A daemon process that is sent requests, and answers them, through a pair of ring buffers in shared memory
+    (see :py:class:`ahk._ring.SharedRings`) rather than its stdin and stdout.
+
+    :param runargs: the command that starts the daemon; the path of the ring file and the ID of this process, whose
+        exit the daemon watches for, are appended to it
+    :param rings: the rings shared with the daemon
+    :param max_poll_interval: the longest to wait between looks at the response ring while waiting for a response
+    """
+
+    def __init__(self, runargs: List[str], rings: SharedRings, max_poll_interval: float = 0.001):
+        super().__init__(runargs=[*runargs, rings.path, str(os.getpid())])
+        self.rings = rings
+        self.max_poll_interval = max_poll_interval
+        self._unsent = bytearray()  # written, but not yet copied into the request ring for lack of room
+        self._unsent_lock = threading.Lock()
+        self._killed = False
+
+    def _exited(self) -> bool:
+        assert self._proc is not None
+        if self._killed:
+            return True
+        assert isinstance(self._proc, subprocess.Popen)
+        return self._proc.poll() is not None
+
+    def _pause(self, seconds: float) -> None:
+        return time.sleep(seconds)
+
+    def _send_unsent(self) -> bool:
+        """
+        Copy as much of the unsent requests into the ring as fits. Returns whether everything has been sent
+        """
+        with self._unsent_lock:
+            if self._unsent:
+                del self._unsent[: self.rings.requests.write(self._unsent)]
+            return not self._unsent
+
+    def write(self, content: bytes) -> None:
+        with self._unsent_lock:
+            self._unsent += content
+        self._send_unsent()
+        return None
+
+    def _wait_sent(self) -> None:
+        poller = RingPoller(self.max_poll_interval)
+        while not self._send_unsent():
+            if not poller.spinning and self._exited():
+                raise BrokenPipeError('The daemon exited before reading the request')
+            self._pause(poller.next_interval())
+        return None
+
+
+    def drain_stdin(self) -> None:
+        return self._wait_sent()
+
+    def read_chunk(self, n: int = _READ_CHUNK_SIZE) -> bytes:
+        """
+        Take whatever responses are in the ring, up to n bytes, waiting until there are some.
+        Returns an empty bytes object once the daemon has exited.
+        """
+        poller = RingPoller(self.max_poll_interval)
+        while True:
+            chunk = self.rings.responses.read(n)
+            if chunk:
+                return chunk
+            # the process is only looked at once idle for a while; that takes a system call
+            if not poller.spinning and self._exited():
+                return self.rings.responses.read(n)  # what it wrote before it exited
+            self._pause(poller.next_interval())
+
+    def kill(self) -> None:
+        self._killed = True
+        super().kill()
+        try_remove(self.rings.path)
+        return None
+
+
+# Functions that return nothing. With ``ack='deferred'``, calls to these return as soon as the request is written;
+# their acknowledgements are collected in the background
+_DEFERRABLE_FUNCTIONS = frozenset(
+    [
+        'AHKClick',
+        'AHKControlClick',
+        'AHKControlSend',
+        'AHKMouseClickDrag',
+        'AHKMouseMove',
+        'AHKSend',
+        'AHKSendInput',
+        'AHKSendPlay',
+        'AHKSendRaw',
+        'AHKSetCapsLockState',
+        'AHKSetClipboard',
+        'AHKSetClipboardAll',
+        'AHKSetNumLockState',
+        'AHKSetScrollLockState',
+        'AHKSetVolume',
+        'AHKShowToolTip',
+        'AHKSoundSet',
+        'AHKTrayTip',
+        'AHKWinActivate',
+        'AHKWinHide',
+        'AHKWinMaximize',
+        'AHKWinMinimize',
+        'AHKWinMove',
+        'AHKWinRestore',
+        'AHKWinSetAlwaysOnTop',
+        'AHKWinSetBottom',
+        'AHKWinSetDisable',
+        'AHKWinSetEnable',
+        'AHKWinSetRedraw',
+        'AHKWinSetTitle',
+        'AHKWinSetTop',
+        'AHKWinSetTransColor',
+        'AHKWinSetTransparent',
+        'AHKWinShow',
+        'WinActivateBottom',
+    ]
+)
+
+
+def _deferred_call_error(function_name: str, exc: BaseException) -> AHKDeferredCallError:
+    error = AHKDeferredCallError(f'{function_name} (called with ack="deferred") failed: {exc}')
+    error.__cause__ = exc
+    return error
+
+
+def _unchecked_deferred(deferred: List[Tuple[str, Any]]) -> List[Tuple[str, Any]]:
+    # calls that were acknowledged without error need no checking
+    return [(name, fut) for name, fut in deferred if not fut.done() or fut.exception() is not None]
+
+
+# Functions that only read state. With ``coalesce_reads``, identical calls to these that are in flight at the same
+# time share a single round trip to the daemon
+_COALESCABLE_FUNCTIONS = frozenset(
+    [
+        'AHKControlGetPos',
+        'AHKControlGetText',
+        'AHKGetClipboard',
+        'AHKGetClipboardAll',
+        'AHKGetCoordMode',
+        'AHKGetSendLevel',
+        'AHKGetSendMode',
+        'AHKGetTitleMatchMode',
+        'AHKGetTitleMatchSpeed',
+        'AHKGetVolume',
+        'AHKKeyState',
+        'AHKMouseGetPos',
+        'AHKPixelGetColor',
+        'AHKRegRead',
+        'AHKSoundGet',
+        'AHKWinExist',
+        'AHKWinFromMouse',
+        'AHKWinGetClass',
+        'AHKWinGetControlList',
+        'AHKWinGetControlListHwnd',
+        'AHKWinGetCount',
+        'AHKWinGetExStyle',
+        'AHKWinGetID',
+        'AHKWinGetIDLast',
+        'AHKWinGetList',
+        'AHKWinGetMinMax',
+        'AHKWinGetPID',
+        'AHKWinGetPos',
+        'AHKWinGetProcessName',
+        'AHKWinGetProcessPath',
+        'AHKWinGetStyle',
+        'AHKWinGetText',
+        'AHKWinGetTitle',
+        'AHKWinGetTransColor',
+        'AHKWinGetTransparent',
+        'AHKWinIsActive',
+        'AHKWinIsAlwaysOnTop',
+        'AHKWindowList',
+    ]
+)
+
+
 class Transport(ABC):
     _started: bool = False
 
@@ -197,11 +744,18 @@ class Transport(ABC):
         directives: Optional[list[Union[Directive, Type[Directive]]]] = None,
         version: Optional[Literal['v1', 'v2']] = 'v1',
         hotkey_transport: Optional[ThreadedHotkeyTransport] = None,
+        coalesce_reads: bool = False,
+        read_cache: Optional[ReadCache] = None,
         **kwargs: Any,
     ):
         self._hotkey_transport = hotkey_transport
         self._directives: list[Union[Directive, Type[Directive]]] = directives or []
         self._version: Optional[Literal['v1', 'v2']] = version
+        self._coalesce_reads = coalesce_reads
+        # (function name, args, engine) -> future shared by the identical read-only calls in flight
+        self._in_flight_reads: dict[Tuple[Any, ...], Any] = {}
+        self._in_flight_reads_lock = threading.Lock()
+        self._read_cache = read_cache
 
     def _get_full_version(self) -> str:
         res = self.run_script(_version_detection_script)
@@ -292,8 +846,7 @@ class Transport(ABC):
     @abstractmethod
     def run_script(
         self, script_text_or_path: str, /, *, blocking: bool = True, timeout: Optional[int] = None
-    ) -> Union[str, FutureResult[str]]:
-        ...
+    ) -> Union[str, FutureResult[str]]: ...
 
     # fmt: off
     @overload
@@ -520,6 +1073,7 @@ class Transport(ABC):
         args: Optional[List[str]] = None,
         blocking: bool = True,
         engine: Optional[AHK[Any]] = None,
+        timeout: Optional[float] = None,
     ) -> Any:
         if not self._started and blocking:
             with warnings.catch_warnings(record=True) as caught_warnings:
@@ -528,23 +1082,314 @@ class Transport(ABC):
                 for warning in caught_warnings:
                     warnings.warn(warning.message, warning.category, stacklevel=3)
         request = RequestMessage(function_name=function_name, args=args)
+        cache = self._read_cache
+        if cache is not None and blocking and cache.caches(function_name):
+            cached, result, generation = cache.lookup(function_name, request.args)
+            if not cached:
+                result = self._dispatch_blocking(request, engine=engine, deadline=_resolve_deadline(timeout))
+                cache.store(function_name, request.args, result, generation)
+            return result
+        if cache is None or function_name in _COALESCABLE_FUNCTIONS:
+            return self._dispatch(request, blocking=blocking, engine=engine, timeout=timeout)
+        cache.invalidate(function_name, request.args)
+        try:
+            return self._dispatch(request, blocking=blocking, engine=engine, timeout=timeout)
+        finally:
+            # reads that were sent while this call was in flight may have returned what it changed
+            cache.invalidate(function_name, request.args)
+
+    def _dispatch(
+        self, request: RequestMessage, blocking: bool, engine: Optional[AHK[Any]], timeout: Optional[float]
+    ) -> Any:
         if blocking:
-            return self.send(request, engine=engine)
+            return self._dispatch_blocking(request, engine=engine, deadline=_resolve_deadline(timeout))
         else:
             return self.send_nonblocking(request, engine=engine)
 
+    def _dispatch_blocking(
+        self, request: RequestMessage, engine: Optional[AHK[Any]], deadline: Optional[float]
+    ) -> Any:
+        if self._coalesce_reads:
+            if request.function_name in _COALESCABLE_FUNCTIONS:
+                return self._send_coalesced(request, engine=engine, deadline=deadline)
+            # anything else may change what a read returns, so reads issued after it start a new round trip
+            with self._in_flight_reads_lock:
+                self._in_flight_reads.clear()
+        return self._send_blocking(request, engine=engine, deadline=deadline)
+
+    def _send_blocking(
+        self, request: RequestMessage, engine: Optional[AHK[Any]], deadline: Optional[float]
+    ) -> Any:
+        if deadline is not None:
+            return self.send(request, engine=engine, deadline=deadline)
+        return self.send(request, engine=engine)
+
+    def _send_coalesced(
+        self, request: RequestMessage, engine: Optional[AHK[Any]], deadline: Optional[float]
+    ) -> Any:
+        """
+        Send a read-only request, sharing the round trip (and its result or exception) with an identical request
+        that is already in flight, if any.
+        """
+        key = (request.function_name, tuple(request.args), engine)
+        while True:
+            with self._in_flight_reads_lock:
+                shared = self._in_flight_reads.get(key)
+                if shared is None:
+                    shared = self._in_flight_reads[key] = self._create_future()
+                    leader = True
+                else:
+                    leader = False
+            if not leader:
+                succeeded, outcome = self._wait_future(shared, timeout=_time_left(deadline))
+                if succeeded is None:  # the caller making the request went away before it completed; try again
+                    continue
+                if succeeded:
+                    return outcome
+                raise outcome
+            try:
+                result = self._send_blocking(request, engine=engine, deadline=deadline)
+            except Exception as e:
+                shared.set_result((False, e))
+                raise
+            except BaseException:
+                shared.set_result((None, None))
+                raise
+            else:
+                shared.set_result((True, result))
+                return result
+            finally:
+                with self._in_flight_reads_lock:
+                    if self._in_flight_reads.get(key) is shared:
+                        del self._in_flight_reads[key]
+
+    def _create_future(self) -> Any:
+        return Future()
+
+    def _wait_future(self, fut: Any, timeout: Optional[float] = None) -> Any:
+        try:
+            return fut.result(timeout)
+        except (asyncio.TimeoutError, FutureTimeoutError):
+            raise AHKCallTimeoutError('The call did not complete before its deadline') from None
+
+    def function_call_many(
+        self,
+        calls: Sequence[Tuple[str, Optional[List[str]]]],
+        *,
+        engine: Optional[AHK[Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> List[Any]:
+        """
+        Execute several function calls in a single round trip to the daemon.
+
+        Returns the result of each call, in order. If a call fails, its exception is returned in place of its result.
+        """
+        if not calls:
+            return []
+        if not self._started:
+            with warnings.catch_warnings(record=True) as caught_warnings:
+                self.init()
+            if caught_warnings:
+                for warning in caught_warnings:
+                    warnings.warn(warning.message, warning.category, stacklevel=3)
+        requests = [RequestMessage(function_name=function_name, args=args) for function_name, args in calls]
+        deadline = _resolve_deadline(timeout)
+        send: Callable[[RequestMessage], Any] = partial(self.send, engine=engine)
+        if deadline is not None:
+            send = partial(self.send, engine=engine, deadline=deadline)
+        cache = self._read_cache
+        if cache is None:
+            return self._send_many(requests, send)
+        for request in requests:
+            cache.invalidate(request.function_name, request.args)
+        try:
+            return self._send_many(requests, send)
+        finally:
+            for request in requests:
+                cache.invalidate(request.function_name, request.args)
+
+    def _send_many(self, requests: List[RequestMessage], send: Callable[[RequestMessage], Any]) -> List[Any]:
+        if not self._supports_batching():
+            one_by_one: List[Any] = []
+            for request in requests:
+                try:
+                    one_by_one.append(send(request))
+                except AHKCallTimeoutError:
+                    raise
+                except Exception as e:
+                    one_by_one.append(e)
+            return one_by_one
+        results = send(BatchRequestMessage(requests=requests))
+        assert isinstance(results, list)
+        if len(results) != len(requests):
+            raise AHKProtocolError(f'Expected {len(requests)} results for batch request, got {len(results)}')
+        return results
+
+    def _supports_batching(self) -> bool:
+        """
+        Whether :py:meth:`send` accepts a :py:class:`BatchRequestMessage`. When it does not,
+        :py:meth:`function_call_many` makes the calls one at a time instead.
+        """
+        return True
+
+    def _supports_uploads(self) -> bool:
+        """
+        Whether the daemon announced the ``'chunked-args'`` protocol feature: large arguments can be uploaded in chunks
+        and ``AHKSetClipboardAll`` takes the data itself (as base64) rather than the path of a file
+        """
+        return False
+
     @abstractmethod
     def send(
-        self, request: RequestMessage, engine: Optional[AHK[Any]] = None
-    ) -> Union[None, Tuple[int, int], int, str, bool, Window, List[Window], List[Control]]:
-        ...
+        self, request: RequestMessage, engine: Optional[AHK[Any]] = None, deadline: Optional[float] = None
+    ) -> Union[None, Tuple[int, int], int, str, bool, Window, List[Window], List[Control]]: ...
 
 
     @abstractmethod
     def send_nonblocking(
         self, request: RequestMessage, engine: Optional[AHK[Any]] = None
-    ) -> FutureResult[Union[None, Tuple[int, int], int, str, bool, Window, List[Window], List[Control]]]:
-        ...
+    ) -> FutureResult[
+        Union[None, Tuple[int, int], int, str, bool, Window, List[Window], List[Control]]
+    ]: ...
+
+
+# Functions that change settings local to a daemon process (rather than returning a value)
+# Transports that run more than one daemon apply these to every daemon so all of them behave the same
+_SESSION_SETTING_FUNCTIONS = frozenset(
+    [
+        'AHKSetCoordMode',
+        'AHKSetDetectHiddenWindows',
+        'AHKSetSendLevel',
+        'AHKSetSendMode',
+        'AHKSetTitleMatchMode',
+        'SetKeyDelay',
+        'AHKMenuTrayIcon',
+        'AHKMenuTrayTip',
+        'AHKMenuTrayShow',
+        'AHKMenuTrayHide',
+    ]
+)
+
+
+# Functions that leave state behind in the daemon that runs them. A warm non-blocking daemon that ran one of these
+# is killed rather than reused, so each non-blocking call still behaves as if it ran in a fresh daemon
+_NONBLOCKING_RECYCLE_FUNCTIONS = _SESSION_SETTING_FUNCTIONS | frozenset(
+    [
+        'AHKBlockInput',
+        'AHKGuiNew',
+        'AHKShowToolTip',
+        'AHKTrayTip',
+    ]
+)
+
+
+# Functions that can take a long time (waiting on a person or a window) without doing any work. These are sent to
+# auxiliary daemons ("lanes") so they do not hold up the other calls to the daemon; see AsyncDaemonProcessTransport.
+# Extensions add their own with ``Extension(long_blocking_functions=...)``
+_LONG_BLOCKING_FUNCTIONS = frozenset(
+    [
+        'AHKClipWait',
+        'AHKFileSelectFile',
+        'AHKFileSelectFolder',
+        'AHKInputBox',
+        'AHKKeyWait',
+        'AHKMsgBox',
+        'AHKWinWait',
+        'AHKWinWaitActive',
+        'AHKWinWaitClose',
+        'AHKWinWaitNotActive',
+    ]
+)
+
+
+def _session_setting_key(request: RequestMessage) -> Tuple[str, ...]:
+    """
+    Key identifying which setting a session setting request changes, so that only the latest value of each
+    setting needs to be replayed onto a new daemon.
+    """
+    name = request.function_name
+    if name == 'AHKSetCoordMode':
+        return (name, request.args[0] if request.args else '')
+    if name == 'AHKSetTitleMatchMode':
+        # match mode and match speed can be set independently of one another
+        mode, speed = (request.args + ['', ''])[:2]
+        return (name, 'mode' if mode else '', 'speed' if speed else '')
+    if name in ('AHKMenuTrayShow', 'AHKMenuTrayHide'):
+        return ('AHKMenuTrayVisibility',)
+    return (name,)
+
+
+# Session settings that each engine sharing a daemon keeps for itself (see AsyncSharedDaemonTransport).
+# The tray menu belongs to the daemon process and so is shared by all of them
+_ENGINE_SETTING_FUNCTIONS = frozenset(
+    [
+        'AHKSetCoordMode',
+        'AHKSetDetectHiddenWindows',
+        'AHKSetSendLevel',
+        'AHKSetSendMode',
+        'AHKSetTitleMatchMode',
+        'SetKeyDelay',
+    ]
+)
+
+
+def _split_engine_settings(request: RequestMessage) -> List[Tuple[Tuple[str, ...], List[str]]]:
+    """
+    The settings an engine setting request changes, one at a time: (key, arguments of a request changing just
+    that setting)
+    """
+    name = request.function_name
+    if name == 'AHKSetTitleMatchMode':
+        mode, speed = (request.args + ['', ''])[:2]
+        settings: List[Tuple[Tuple[str, ...], List[str]]] = []
+        if mode:
+            settings.append(((name, 'mode'), [mode, '']))
+        if speed:
+            settings.append(((name, 'speed'), ['', speed]))
+        return settings
+    if name == 'AHKSetCoordMode':
+        return [((name, request.args[0] if request.args else ''), list(request.args))]
+    return [((name,), list(request.args))]
+
+
+def _default_engine_setting(key: Tuple[str, ...], version: Optional[Literal['v1', 'v2']]) -> List[str]:
+    """
+    Arguments of the request that restores an engine setting to what AutoHotkey starts with
+    """
+    name = key[0]
+    if name == 'AHKSetCoordMode':
+        return [key[1], 'Client' if version == 'v2' else 'Window']
+    if name == 'AHKSetTitleMatchMode':
+        if key[1] == 'mode':
+            return ['2' if version == 'v2' else '1', '']
+        return ['', 'Fast']
+    if name == 'AHKSetSendMode':
+        return ['Input' if version == 'v2' else 'Event']
+    if name == 'SetKeyDelay':
+        return ['10', '-1']
+    return ['0']  # AHKSetDetectHiddenWindows, AHKSetSendLevel
+
+
+class _AutoBatch:
+    """
+    Calls waiting to be sent to the daemon together; see the ``auto_batch`` option of the daemon transport
+    """
+
+    def __init__(self, engine: Optional[AHK[Any]], full: Any):
+        self.engine = engine
+        self.calls: List[Tuple[RequestMessage, Any, Optional[float]]] = []  # (request, future, deadline)
+        self.full = full  # resolved when the batch reaches its maximum size
+        self.sender: Any = None
+
+
+class _Lane:
+    """
+    An auxiliary daemon for long-blocking calls, along with the session settings it has been sent
+    """
+
+    def __init__(self, proc: SyncAHKProcess):
+        self.proc = proc
+        self.settings: dict[Tuple[str, ...], RequestMessage] = {}
 
 
 class DaemonProcessTransport(Transport):
@@ -558,10 +1403,95 @@ class DaemonProcessTransport(Transport):
         extensions: list[Extension] | None = None,
         version: Optional[Literal['v1', 'v2']] = None,
         skip_version_check: bool = False,
+        pipelined: bool = False,
+        nonblocking_pool_min_size: int = 0,
+        nonblocking_pool_max_size: int = 0,
+        nonblocking_pool_idle_timeout: float = 60.0,
+        response_framing: Literal['auto', 'lines', 'length'] = 'auto',
+        resync_timeout: float = 2.0,
+        call_timeout: Optional[float] = None,
+        standby: bool = False,
+        ping_interval: Optional[float] = None,
+        ping_timeout: float = 1.0,
+        coalesce_reads: bool = False,
+        read_cache: Optional[ReadCache] = None,
+        ack: Literal['wait', 'deferred'] = 'wait',
+        on_deferred_error: Optional[Callable[[AHKDeferredCallError], Any]] = None,
+        priority: CallPriority = 'normal',
+        priority_aging: float = 0.5,
+        auto_batch: bool = False,
+        auto_batch_delay: float = 0.0005,
+        auto_batch_max_size: int = 32,
+        blocking_lanes: int = 1,
+        long_blocking_functions: Optional[Iterable[str]] = None,
+        upload_chunk_size: Optional[int] = DEFAULT_UPLOAD_CHUNK_SIZE,
     ):
+        if auto_batch_max_size < 1:
+            raise ValueError(f'auto_batch_max_size must be at least 1, got {auto_batch_max_size!r}')
+        if upload_chunk_size is not None and upload_chunk_size < 4:
+            raise ValueError(f'upload_chunk_size must be at least 4, got {upload_chunk_size!r}')
+        if priority not in _PRIORITY_LEVELS:
+            raise ValueError(f'Invalid priority {priority!r} - must be one of "interactive", "normal" or "background"')
+        if ack not in ('wait', 'deferred'):
+            raise ValueError(f'Invalid ack {ack!r} - must be one of "wait" or "deferred"')
+        if response_framing not in ('auto', 'lines', 'length'):
+            raise ValueError(
+                f'Invalid response_framing {response_framing!r} - must be one of "auto", "lines" or "length"'
+            )
+        if not 0 <= nonblocking_pool_min_size <= max(nonblocking_pool_max_size, 0):
+            raise ValueError(
+                f'Invalid non-blocking pool size: min {nonblocking_pool_min_size!r}, max {nonblocking_pool_max_size!r}'
+            )
         self._extensions = extensions or []
         self._proc: Optional[SyncAHKProcess]
         self._proc = None
+        # deferred acknowledgements are collected by the reader of pipelined mode
+        self._pipelined = pipelined or ack == 'deferred'
+        self._ack = ack
+        self._on_deferred_error = on_deferred_error
+        self._deferred: List[Tuple[str, Any]] = []  # (function name, future) of deferred calls not yet checked
+        self._deferred_lock = threading.Lock()
+        self._priority = priority
+        self._priority_aging = priority_aging
+        self._scheduler = _PriorityScheduler(1, priority_aging)
+        self._auto_batch = auto_batch
+        self._auto_batch_delay = auto_batch_delay
+        self._auto_batch_max_size = auto_batch_max_size
+        self._forming_batch: Optional[_AutoBatch] = None  # the batch that calls join until it is sent
+        self._forming_batch_lock = threading.Lock()
+        self._response_framing = response_framing
+        self._protocol: Optional[DaemonProtocol] = None
+        self._resync_timeout = resync_timeout
+        self._call_timeout = call_timeout
+        self._standby_enabled = standby
+        self._standby: Optional[SyncAHKProcess] = None
+        self._standby_lock = threading.Lock()
+        self._standby_starter: Any = None
+        self._ping_interval = ping_interval
+        self._ping_timeout = ping_timeout
+        self._supervisor: Any = None
+        self._stopped = False
+        self._session_settings: dict[Tuple[str, ...], RequestMessage] = {}
+        self._blocking_lanes = blocking_lanes
+        self._lane_scheduler = _PriorityScheduler(blocking_lanes, priority_aging)  # at most blocking_lanes lanes
+        self._long_blocking_functions = _LONG_BLOCKING_FUNCTIONS.union(
+            long_blocking_functions or [],
+            *(ext.long_blocking_functions for ext in _resolve_extensions(extensions or [])),
+        )
+        self._idle_lanes: List[_Lane] = []
+        self._busy_lanes: List[_Lane] = []
+        self._lanes_lock = threading.Lock()
+        self._request_ids = itertools.count(1)
+        self._upload_chunk_size = upload_chunk_size
+        self._upload_ids = itertools.count(1)
+        self._pending: dict[int, Tuple[Any, Optional[AHK[Any]]]] = {}
+        self._pending_lock = threading.Lock()
+        self._reader: Any = None
+        self._nonblocking_pool_min_size = nonblocking_pool_min_size
+        self._nonblocking_pool_max_size = nonblocking_pool_max_size
+        self._nonblocking_pool_idle_timeout = nonblocking_pool_idle_timeout
+        self._nonblocking_idle: List[Tuple[float, SyncAHKProcess]] = []  # (idle since, process); oldest first
+        self._nonblocking_pool_lock = threading.Lock()
         self._temp_script: Optional[str] = None
         self.__template: jinja2.Template
         self._jinja_env: jinja2.Environment
@@ -606,7 +1536,13 @@ class DaemonProcessTransport(Transport):
         hotkey_transport = ThreadedHotkeyTransport(
             executable_path=self._executable_path, directives=directives, version=version
         )
-        super().__init__(directives=directives, version=version, hotkey_transport=hotkey_transport)
+        super().__init__(
+            directives=directives,
+            version=version,
+            hotkey_transport=hotkey_transport,
+            coalesce_reads=coalesce_reads,
+            read_cache=read_cache,
+        )
 
     @property
     def template(self) -> jinja2.Template:
@@ -621,8 +1557,20 @@ class DaemonProcessTransport(Transport):
         assert self._proc is None, 'cannot start a process twice'
         with warnings.catch_warnings(record=True) as caught_warnings:
             with self.lock:
-                self._proc = self._create_process()
+                self._proc = self._create_daemon()
                 self._proc.start()
+                protocol = self._handshake(self._proc)
+                if self._pipelined and 'request-ids' not in protocol.features:
+                    warnings.warn(
+                        'The AHK daemon does not support request IDs. Falling back to lock-step (non-pipelined) mode',
+                        category=UserWarning,
+                    )
+                    self._pipelined = False
+                    self._ack = 'wait'
+                if self._pipelined:
+                    self._reader = self._start_reader()
+            self._start_supervision()
+            self._fill_nonblocking_pool()
         if caught_warnings:
             for warning in caught_warnings:
                 warnings.warn(warning.message, warning.category, stacklevel=2)
@@ -670,34 +1618,175 @@ class DaemonProcessTransport(Transport):
         proc = SyncAHKProcess(runargs=runargs)
         return proc
 
+    def _create_daemon(self) -> SyncAHKProcess:
+        """
+        Create the daemon that serves blocking calls (as opposed to the processes that run non-blocking calls)
+        """
+        return self._create_process()
+
+    def _take_expired_nonblocking_processes(self) -> List[SyncAHKProcess]:
+        # must be called with the non-blocking pool lock held
+        expired: List[SyncAHKProcess] = []
+        cutoff = time.monotonic() - self._nonblocking_pool_idle_timeout
+        while len(self._nonblocking_idle) > self._nonblocking_pool_min_size and self._nonblocking_idle[0][0] < cutoff:
+            _, proc = self._nonblocking_idle.pop(0)
+            expired.append(proc)
+        return expired
+
+    def _fill_nonblocking_pool(self) -> None:
+        """
+        Start idle daemons for non-blocking calls until at least the configured minimum number are waiting
+        """
+        with self._nonblocking_pool_lock:
+            missing = self._nonblocking_pool_min_size - len(self._nonblocking_idle)
+        for _ in range(missing):
+            proc = self._create_process()
+            proc.start()
+            self._handshake(proc)
+            self._checkin_nonblocking_process(proc)
+
+    def _checkout_nonblocking_process(self) -> SyncAHKProcess:
+        """
+        Take the most recently used idle daemon from the non-blocking pool, or start a new one if none are idle
+        """
+        proc: Optional[SyncAHKProcess] = None
+        with self._nonblocking_pool_lock:
+            expired = self._take_expired_nonblocking_processes()
+            while self._nonblocking_idle and proc is None:
+                _, candidate = self._nonblocking_idle.pop()
+                if candidate.returncode is None:
+                    proc = candidate
+        for expired_proc in expired:
+            kill(expired_proc)
+        if proc is None:
+            proc = self._create_process()
+            proc.start()
+            self._handshake(proc)
+        return proc
+
+    def _checkin_nonblocking_process(self, proc: SyncAHKProcess) -> None:
+        """
+        Return a daemon to the non-blocking pool. The daemon is killed if the pool is already full.
+        """
+        with self._nonblocking_pool_lock:
+            expired = self._take_expired_nonblocking_processes()
+            if len(self._nonblocking_idle) < self._nonblocking_pool_max_size:
+                self._nonblocking_idle.append((time.monotonic(), proc))
+            else:
+                expired.append(proc)
+        for expired_proc in expired:
+            kill(expired_proc)
+
+    def _checkout_lane(self) -> _Lane:
+        """
+        Take an idle lane, or start a new one if none are idle. The caller holds a slot of the lane scheduler, so
+        there are never more than ``blocking_lanes`` lanes
+        """
+        lane: Optional[_Lane] = None
+        with self._lanes_lock:
+            while self._idle_lanes and lane is None:
+                candidate = self._idle_lanes.pop()
+                if candidate.proc.returncode is None:
+                    lane = candidate
+        if lane is None:
+            proc = self._create_process()
+            try:
+                proc.start()
+                self._handshake(proc)
+            except BaseException:
+                kill(proc)
+                raise
+            lane = _Lane(proc)
+        with self._lanes_lock:
+            self._busy_lanes.append(lane)
+        return lane
+
+    def _checkin_lane(self, lane: _Lane, reusable: bool) -> None:
+        """
+        Return a lane after a call. It is killed if it cannot be reused.
+        """
+        with self._lanes_lock:
+            if lane in self._busy_lanes:
+                self._busy_lanes.remove(lane)
+            else:
+                reusable = False  # the transport was stopped in the meantime
+            if reusable:
+                self._idle_lanes.append(lane)
+                return None
+        kill(lane.proc)
+        return None
+
+    def _take_lanes(self) -> List[SyncAHKProcess]:
+        with self._lanes_lock:
+            lanes, self._idle_lanes, self._busy_lanes = self._idle_lanes + self._busy_lanes, [], []
+        return [lane.proc for lane in lanes]
+
+    def _goes_to_lane(self, request: RequestMessage) -> bool:
+        return self._blocking_lanes > 0 and request.function_name in self._long_blocking_functions
+
+    def _lane_session_settings(self) -> List[Tuple[Tuple[str, ...], RequestMessage]]:
+        return list(self._session_settings.items())
+
+    def _send_to_lane(
+        self, request: RequestMessage, engine: Optional[AHK[Any]] = None, deadline: Optional[float] = None
+    ) -> Any:
+        """
+        Send a long-blocking call to a lane: an auxiliary daemon running the same script as the main one, with the
+        same session settings, so that the call does not keep other calls waiting for the main daemon. While every
+        lane is busy, the call waits for one to be free.
+        """
+        if self._stopped:
+            raise AHKProcessExitedError('The transport has been stopped')
+        if not self._lane_scheduler.acquire(_call_priority.get() or self._priority, deadline):
+            raise AHKCallTimeoutError('Timed out waiting for a free lane')
+        try:
+            lane = self._checkout_lane()
+        except BaseException:
+            self._lane_scheduler.release()
+            raise
+        reusable = False
+        try:
+            for key, setting in self._lane_session_settings():
+                if lane.settings.get(key) is not setting:
+                    self._request(lane.proc, setting, deadline=deadline)
+                    lane.settings[key] = setting
+            if isinstance(request, BatchRequestMessage):
+                lane.settings.clear()  # the batch may change settings, which are sent again before the next call
+            result = self._request(lane.proc, request, engine=engine, deadline=deadline)
+            reusable = True
+            return result
+        except (AHKProtocolError, AHKCallTimeoutError):
+            raise  # the lane is out of step or was killed
+        except Exception:
+            reusable = lane.proc.returncode is None  # the call failed, the lane is fine
+            raise
+        finally:
+            self._checkin_lane(lane, reusable)
+            self._lane_scheduler.release()
+
     def _send_nonblocking(
         self, request: RequestMessage, engine: Optional[AHK[Any]] = None
     ) -> Union[None, Tuple[int, int], int, str, bool, Window, List[Window], List[Control]]:
-        msg = request.format()
-        with self._create_process() as proc:
-            proc.write(msg)
-            proc.drain_stdin()
-            tom = proc.readline()
-            num_lines = proc.readline()
-            content_buffer = BytesIO()
-            content_buffer.write(tom)
-            content_buffer.write(num_lines)
+        if not self._nonblocking_pool_max_size:
+            # a single response is read from this daemon, so it is not worth a handshake
+            with self._create_process() as proc:
+                self._write_request(proc, request)
+                frame = self._read_response(proc)
+        else:
+            proc = self._checkout_nonblocking_process()
+            reusable = False
             try:
-                lines_to_read = int(num_lines) + 1
-            except ValueError as e:
-                try:
-                    stdout = tom + num_lines + proc.read()
-                except Exception:
-                    stdout = b''
-                raise AHKProtocolError(
-                    'Unexpected data received. This is usually the result of an unhandled error in the AHK process'
-                    + (f': {stdout!r}' if stdout else '')
-                ) from e
-            for _ in range(lines_to_read):
-                part = proc.readline()
-                content_buffer.write(part)
-            content = content_buffer.getvalue()[:-1]
-        response = ResponseMessage.from_bytes(content, engine=engine)
+                self._write_request(proc, request)
+                # start the replacement for this daemon while it is busy with the request
+                self._fill_nonblocking_pool()
+                frame = self._read_response(proc)
+                reusable = request.function_name not in _NONBLOCKING_RECYCLE_FUNCTIONS
+            finally:
+                if reusable:
+                    self._checkin_nonblocking_process(proc)
+                else:
+                    kill(proc)
+        response = ResponseMessage.from_frame(frame, engine=engine)
         return response.unpack()  # type: ignore
 
 
@@ -713,36 +1802,616 @@ class DaemonProcessTransport(Transport):
         )  # workaround to get mypy correctness in sync and async implementation
         return FutureResult(fut)
 
-    def send(
-        self, request: RequestMessage, engine: Optional[AHK[Any]] = None
-    ) -> Union[None, Tuple[int, int], int, str, bool, Window, List[Window], List[Control]]:
-        msg = request.format()
-        assert self._proc is not None
-        with self.lock:
-            self._proc.write(msg)
-            self._proc.drain_stdin()
-            tom = self._proc.readline()
-            num_lines = self._proc.readline()
-            content_buffer = BytesIO()
-            content_buffer.write(tom)
-            content_buffer.write(num_lines)
+    def _supports_batching(self) -> bool:
+        return self._protocol is None or 'batch' in self._protocol.features
+
+    def _supports_request_ids(self) -> bool:
+        return self._protocol is not None and 'request-ids' in self._protocol.features
+
+    def _supports_uploads(self) -> bool:
+        return self._protocol is not None and 'chunked-args' in self._protocol.features
+
+    def _write_request(self, proc: SyncAHKProcess, request: RequestMessage) -> None:
+        """
+        Write a request to a daemon. If the daemon supports it, arguments longer than ``upload_chunk_size`` are
+        uploaded ahead of the request in chunks, each written once the daemon has taken the previous one, so that
+        large arguments (e.g., clipboard contents) never have to be held in a single line on either side.
+        """
+        if self._upload_chunk_size is None or not self._supports_uploads():
+            proc.write(request.format())
+            return proc.drain_stdin()
+        for line in request.format_chunked(self._upload_chunk_size, self._upload_ids):
+            proc.write(line)
+            proc.drain_stdin()
+        return None
+
+    def _request(
+        self,
+        proc: SyncAHKProcess,
+        request: RequestMessage,
+        engine: Optional[AHK[Any]] = None,
+        deadline: Optional[float] = None,
+    ) -> Any:
+        """
+        Send a request to a daemon and wait for its response.
+
+        When the daemon supports request IDs, each request is numbered so that a response that does not belong to
+        it is detected right away. Responses to earlier requests whose callers went away (e.g., were cancelled
+        after sending) are skipped.
+
+        If the response has not arrived by the ``deadline``, the daemon is killed and
+        :py:class:`~ahk.exceptions.AHKCallTimeoutError` is raised. The caller is responsible for replacing the daemon.
+        """
+        request.request_id = next(self._request_ids) if self._supports_request_ids() else None
+        expired = threading.Event()
+        watchdog: Any = None
+        if deadline is not None:
+
+            def expire() -> None:
+                expired.set()
+                kill(proc)
+
+            watchdog = _call_at(deadline, expire)
+        answered = False
+        try:
             try:
-                lines_to_read = int(num_lines) + 1
-            except ValueError as e:
+                self._write_request(proc, request)
+            except OSError as e:  # e.g., broken pipe
+                raise AHKProcessExitedError('The AHK process exited before the request could be sent') from e
+            while True:
+                frame = self._read_response(proc)
+                if request.request_id is None:
+                    if proc.abandoned_responses:
+                        proc.abandoned_responses -= 1
+                        continue
+                    break
+                if frame.request_id == request.request_id:
+                    break
+                if frame.request_id is None or frame.request_id > request.request_id:
+                    raise AHKProtocolError(
+                        f'Response out of sequence: expected response to request {request.request_id}, '
+                        f'got {frame.request_id!r}'
+                    )
+            answered = True
+        except Exception as e:
+            if expired.is_set():
+                raise AHKCallTimeoutError(f'{request.function_name} did not complete before its deadline') from e
+            raise
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+            if not answered and request.request_id is None:
+                # the response is still to come and must not be taken for the response to the next request
+                proc.abandoned_responses += 1
+        if expired.is_set():  # the response arrived just as the daemon was killed
+            raise AHKCallTimeoutError(f'{request.function_name} did not complete before its deadline')
+        return self._unpack_response(frame, engine)
+
+    def _unpack_response(self, frame: ResponseFrame, engine: Optional[AHK[Any]] = None) -> Any:
+        """
+        Turn a response from the daemon into the result of the call (or raise the error it reports)
+        """
+        return ResponseMessage.from_frame(frame, engine=engine).unpack()
+
+    def _remember_session_setting(self, request: RequestMessage) -> None:
+        key = _session_setting_key(request)
+        self._session_settings.pop(key, None)
+        self._session_settings[key] = request
+
+    def _drain(self, proc: SyncAHKProcess) -> bool:
+        """
+        Skip past whatever a daemon sent since its last good response: a marker request is sent and output is
+        discarded up to its response. The daemon is killed if the marker is not answered within ``resync_timeout``
+        seconds.
+
+        Returns ``False`` if the daemon could not be brought back in step this way.
+        """
+        if proc.returncode is not None or not self._supports_request_ids():
+            return False
+        marker_id = next(self._request_ids)
+        watchdog = _call_at(time.monotonic() + self._resync_timeout, partial(kill, proc))
+        try:
+            proc.write(RequestMessage(function_name='AHKEcho', args=['resync'], request_id=marker_id).format())
+            proc.drain_stdin()
+            buffer = proc.response_buffer
+            while not buffer.discard_until(b'#%d\n' % marker_id):
+                chunk = proc.read_chunk()
+                if not chunk:
+                    return False
+                buffer.feed(chunk)
+            frame = self._read_response(proc)
+        except Exception:
+            return False
+        finally:
+            watchdog.cancel()
+        return frame.request_id == marker_id and proc.returncode is None
+
+    def _restart_process(self, proc: SyncAHKProcess) -> SyncAHKProcess:
+        """
+        Kill a daemon and start a fresh one in its place, with the current session settings applied.
+        The standby daemon takes over, if there is one ready.
+        """
+        kill(proc)
+        if self._stopped:
+            raise AHKProcessExitedError('The transport has been stopped')
+        with self._standby_lock:
+            new_proc, self._standby = self._standby, None
+        if new_proc is not None and new_proc.returncode is not None:
+            new_proc = None
+        fresh = new_proc is None
+        if new_proc is None:
+            new_proc = self._create_daemon()
+        try:
+            if fresh:
+                new_proc.start()
+                self._handshake(new_proc)
+            for setting in list(self._session_settings.values()):
+                self._request(new_proc, setting)
+        except BaseException:
+            # e.g., the transport was stopped while the replacement was starting
+            kill(new_proc)
+            raise
+        if self._standby_enabled and not self._stopped:
+            self._standby_starter = self._start_standby()
+        return new_proc
+
+    def _prepare_standby(self) -> None:
+        """
+        Start a daemon that is kept ready to take over from one that dies or gets stuck
+        """
+        proc = self._create_daemon()
+        try:
+            proc.start()
+            self._handshake(proc)
+        except Exception:
+            kill(proc)
+            return None
+        except BaseException:  # the transport was stopped while the standby was starting
+            kill(proc)
+            raise
+        with self._standby_lock:
+            if self._standby is None and not self._stopped:
+                self._standby = proc
+                return None
+        kill(proc)
+        return None
+
+    def _start_standby(self) -> Any:
+        starter = threading.Thread(target=self._prepare_standby, daemon=True)
+        starter.start()
+        return starter
+
+    def _sleep(self, seconds: float) -> None:
+        return time.sleep(seconds)
+
+    def _supervise(self) -> None:
+        """
+        Supervisor loop, used when ``ping_interval`` is set. Replaces the daemon when it has exited or does not
+        answer a ping within ``ping_timeout`` seconds, so that a dead daemon is noticed before the next call needs it.
+        A daemon that is busy with a call is not pinged.
+        """
+        assert self._ping_interval is not None
+        while not self._stopped:
+            self._sleep(self._ping_interval)
+            if self._stopped:
+                return None
+            try:
+                self._check_daemons()
+            except Exception:
+                pass  # e.g., a replacement failed to start; tried again on the next round
+
+    def _check_daemons(self) -> None:
+        proc = self._proc
+        assert proc is not None
+        if proc.returncode is not None and not self._pipelined:
+            if self._acquire_lock(time.monotonic() + self._ping_timeout):
                 try:
-                    stdout = tom + num_lines + self._proc.read()
-                except Exception:
-                    stdout = b''
+                    if self._proc is proc:
+                        self._proc = self._restart_process(proc)
+                finally:
+                    self.lock.release()
+            return None
+        ping = RequestMessage(function_name='AHKEcho', args=['ping'])
+        deadline = time.monotonic() + self._ping_timeout
+        try:
+            if self._pipelined:
+                # errors of deferred calls are left for the next call of the user to raise
+                self._send_pipelined(ping, deadline=deadline, check_deferred=False)
+            else:
+                self.send(ping, deadline=deadline)
+        except AHKProtocolError:
+            pass  # the daemon has been replaced by now
+        except AHKCallTimeoutError:
+            pass  # the daemon has been replaced by now, unless it was just busy with a call
+        return None
+
+    def _start_supervision(self) -> None:
+        if self._standby_enabled:
+            self._standby_starter = self._start_standby()
+        if self._ping_interval is not None:
+            self._supervisor = self._start_supervisor()
+        return None
+
+    def _start_supervisor(self) -> Any:
+        supervisor = threading.Thread(target=self._supervise, daemon=True)
+        supervisor.start()
+        return supervisor
+
+    def _processes(self) -> List[SyncAHKProcess]:
+        return [self._proc] if self._proc is not None else []
+
+    def stop(self) -> None:
+        """
+        Stop the daemon, along with the standby daemon, the supervisor, the lanes and any idle non-blocking daemons
+        """
+        self._stopped = True
+        if self._supervisor is not None:
+            self._supervisor = None
+        with self._standby_lock:
+            standby, self._standby = self._standby, None
+        with self._nonblocking_pool_lock:
+            idle, self._nonblocking_idle = self._nonblocking_idle, []
+        if self._standby_starter is not None:
+            self._standby_starter = None
+        processes = self._processes() + [proc for _, proc in idle] + ([standby] if standby is not None else [])
+        processes += self._take_lanes()
+        for proc in processes:
+            kill(proc)
+        for proc in processes:
+            proc.wait()
+        return None
+
+    def _resync(self, proc: SyncAHKProcess) -> SyncAHKProcess:
+        """
+        Recover a daemon after a protocol error, so that later calls are not affected by it.
+
+        The daemon is drained to a known point in its output if possible, otherwise it is restarted.
+        Returns the daemon to use from now on.
+        """
+        if self._drain(proc):
+            return proc
+        return self._restart_process(proc)
+
+    def _handshake(self, proc: SyncAHKProcess) -> DaemonProtocol:
+        """
+        Find out which protocol features a newly started daemon supports and switch it to the fastest response
+        framing supported by both sides (unless ``response_framing`` says otherwise).
+
+        The daemon announces its protocol version and features in answer to ``AHKProtocolHello``. Daemons that
+        predate the handshake (e.g., from a custom template or an outdated constant fallback) answer with an error
+        and are spoken to with the legacy protocol. All daemons of a transport run the same script, so only the
+        first daemon is asked.
+        """
+        if self._protocol is None:
+            hello = RequestMessage(function_name='AHKProtocolHello', args=[str(PROTOCOL_VERSION)])
+            try:
+                self._protocol = DaemonProtocol.from_hello(self._request(proc, hello))
+            except AHKExecutionException:
+                self._protocol = LEGACY_PROTOCOL
+        protocol = self._protocol
+        framing = self._response_framing
+        if framing == 'auto':
+            framing = 'length' if 'length-framing' in protocol.features else 'lines'
+        if framing == 'length':
+            try:
+                self._request(proc, RequestMessage(function_name='AHKSetResponseFraming', args=[framing]))
+            except AHKExecutionException:
+                pass  # the daemon keeps framing responses by newline count, which is always understood
+        return protocol
+
+    def _read_response(self, proc: SyncAHKProcess) -> ResponseFrame:
+        """
+        Read one framed response from the daemon's stdout.
+
+        Output is read in chunks into the process's response buffer and the response is parsed there in place.
+        The payload of the returned frame is a view into that buffer, for :py:meth:`ResponseMessage.from_frame`
+        """
+        buffer = proc.response_buffer
+        while True:
+            try:
+                frame = buffer.next_frame()
+            except ValueError as e:
+                stdout = buffer.unconsumed()
                 raise AHKProtocolError(
                     'Unexpected data received. This is usually the result of an unhandled error in the AHK process'
                     + (f': {stdout!r}' if stdout else '')
                 ) from e
-            for _ in range(lines_to_read):
-                part = self._proc.readline()
-                content_buffer.write(part)
-            content = content_buffer.getvalue()[:-1]
-            response = ResponseMessage.from_bytes(content, engine=engine)
-            return response.unpack()  # type: ignore
+            if frame is not None:
+                return frame
+            chunk = proc.read_chunk()
+            if not chunk:
+                stdout = buffer.unconsumed()
+                raise AHKProcessExitedError(
+                    'The AHK process exited before sending the complete response' + (f': {stdout!r}' if stdout else '')
+                )
+            buffer.feed(chunk)
+
+    def _start_reader(self) -> Any:
+        assert self._proc is not None
+        reader = threading.Thread(target=self._read_responses, args=(self._proc,), daemon=True)
+        reader.start()
+        return reader
+
+    def _fail_pending(self, exc: BaseException) -> None:
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for fut, _ in pending.values():
+            if not fut.done():
+                fut.set_exception(exc)
+        return None
+
+    def _read_responses(self, proc: SyncAHKProcess) -> None:
+        """
+        Reader loop used in pipelined mode. Demultiplexes responses from the daemon to the futures of the
+        requests that are in flight, keyed by the request ID echoed back by the daemon.
+        """
+        while True:
+            try:
+                frame = self._read_response(proc)
+            except AHKProcessExitedError as e:
+                if proc is not self._proc:
+                    return None
+                if self._stopped or not (self._standby_enabled or self._ping_interval is not None):
+                    self._fail_pending(e)
+                    return None
+                # fail over to a new daemon; the requests in flight may be retried
+                try:
+                    proc = self._proc = self._restart_process(proc)
+                except Exception:
+                    self._fail_pending(e)
+                    raise
+                self._fail_pending(AHKFailoverError(str(e)))
+                continue
+            except Exception as e:
+                if proc is not self._proc:  # the daemon was replaced while this was being read
+                    return None
+                # responses to the requests in flight are lost, but later requests go to a fresh daemon
+                try:
+                    proc = self._proc = self._restart_process(proc)
+                except Exception:
+                    self._fail_pending(e)
+                    raise
+                self._fail_pending(e)
+                continue
+            request_id = frame.request_id
+            if request_id is None:
+                # not a response to any request, e.g., output of an unhandled error
+                self._fail_pending(AHKProtocolError(f'Received response without request ID: {bytes(frame.payload)!r}'))
+                continue
+            with self._pending_lock:
+                entry = self._pending.pop(request_id, None)
+            if entry is None:
+                # a late response to a request that was given up on
+                logging.debug(f'Discarding response to abandoned request {request_id!r}')
+                continue
+            fut, engine = entry
+            if fut.done():  # the caller went away (e.g., cancelled)
+                continue
+            try:
+                result = self._unpack_response(frame, engine)
+            except Exception as e:
+                fut.set_exception(e)
+            else:
+                fut.set_result(result)
+
+    def _quarantine_pipelined(self, proc: SyncAHKProcess) -> None:
+        """
+        Replace a pipelined daemon that did not answer a request before its deadline. The requests still in flight
+        on it fail, later requests go to the replacement.
+        """
+        with self.lock:
+            if self._proc is not proc:  # already replaced
+                return None
+            kill(proc)
+            self._fail_pending(AHKCallTimeoutError('The daemon was replaced after a call missed its deadline'))
+            self._proc = self._restart_process(proc)
+            self._reader = self._start_reader()
+        return None
+
+    def _send_pipelined(
+        self,
+        request: RequestMessage,
+        engine: Optional[AHK[Any]] = None,
+        deadline: Optional[float] = None,
+        check_deferred: bool = True,
+    ) -> Union[None, Tuple[int, int], int, str, bool, Window, List[Window], List[Control]]:
+        deferred = self._ack == 'deferred' and request.function_name in _DEFERRABLE_FUNCTIONS
+        if not deferred and check_deferred:
+            self._check_deferred(deadline)
+        proc = self._proc
+        assert proc is not None
+        request.request_id = next(self._request_ids)
+        fut = self._create_future()
+        with self._pending_lock:
+            self._pending[request.request_id] = (fut, engine)
+        if deferred:
+            self._track_deferred(request.function_name, fut)
+        sent = False
+        try:
+            self._write_request(proc, request)
+            sent = True
+            if deferred:
+                return None
+            return self._wait_future(fut, timeout=_time_left(deadline))  # type: ignore[no-any-return]
+        except BaseException as e:
+            # e.g., the daemon was restarted while the request was written, or the caller went away
+            if not sent:
+                with self._pending_lock:
+                    self._pending.pop(request.request_id, None)
+            # once sent, the request stays pending: the reader drops its response, as the future is done
+            if not fut.done():
+                if deferred:
+                    fut.set_result(None)  # the error is raised to the caller right here; there is nothing to report
+                else:
+                    fut.cancel()
+            if isinstance(e, AHKCallTimeoutError):
+                self._quarantine_pipelined(proc)
+            raise
+
+    def _track_deferred(self, function_name: str, fut: Any) -> None:
+        if self._on_deferred_error is not None:
+            fut.add_done_callback(partial(self._report_deferred_error, function_name))
+            return None
+        with self._deferred_lock:
+            self._deferred = _unchecked_deferred(self._deferred) + [(function_name, fut)]
+        return None
+
+    def _report_deferred_error(self, function_name: str, fut: Any) -> None:
+        exc = fut.exception()
+        if exc is not None:
+            assert self._on_deferred_error is not None
+            self._on_deferred_error(_deferred_call_error(function_name, exc))
+        return None
+
+    def _check_deferred(self, deadline: Optional[float]) -> None:
+        """
+        Wait for the acknowledgements of the deferred calls made so far and raise the first error among them,
+        if any, as :py:class:`~ahk.exceptions.AHKDeferredCallError`
+        """
+        with self._deferred_lock:
+            deferred, self._deferred = self._deferred, []
+        errors: List[AHKDeferredCallError] = []
+        try:
+            for function_name, fut in deferred:
+                try:
+                    self._wait_future(fut, timeout=_time_left(deadline))
+                except AHKCallTimeoutError:
+                    raise
+                except Exception as e:
+                    errors.append(_deferred_call_error(function_name, e))
+        except BaseException:
+            with self._deferred_lock:
+                self._deferred[:0] = _unchecked_deferred(deferred)  # left for the next call to check
+            raise
+        if len(errors) > 1:
+            raise AHKDeferredCallError(
+                f'{len(errors)} calls made with ack="deferred" failed. The first: {errors[0]}'
+            ) from errors[0].__cause__
+        if errors:
+            raise errors[0]
+        return None
+
+    def _acquire_lock(self, deadline: Optional[float]) -> bool:
+        timeout = _time_left(deadline)
+        return self._execution_lock.acquire(timeout=-1 if timeout is None else timeout)
+
+    def send(
+        self, request: RequestMessage, engine: Optional[AHK[Any]] = None, deadline: Optional[float] = None
+    ) -> Union[None, Tuple[int, int], int, str, bool, Window, List[Window], List[Control]]:
+        if deadline is None and self._call_timeout is not None:
+            deadline = time.monotonic() + self._call_timeout
+        if self._goes_to_lane(request):
+            return self._send_to_lane(request, engine=engine, deadline=deadline)  # type: ignore[no-any-return]
+        if (
+            self._auto_batch
+            and request.function_name in _COALESCABLE_FUNCTIONS
+            and not isinstance(request, BatchRequestMessage)
+        ):
+            return self._send_auto_batched(request, engine=engine, deadline=deadline)  # type: ignore[no-any-return]
+        return self._send_now(request, engine=engine, deadline=deadline)
+
+    def _send_now(
+        self, request: RequestMessage, engine: Optional[AHK[Any]] = None, deadline: Optional[float] = None
+    ) -> Union[None, Tuple[int, int], int, str, bool, Window, List[Window], List[Control]]:
+        if self._pipelined:
+            result = self._send_pipelined(request, engine=engine, deadline=deadline)
+        else:
+            # callers waiting for the daemon take turns by priority
+            if not self._scheduler.acquire(_call_priority.get() or self._priority, deadline):
+                raise AHKCallTimeoutError(f'{request.function_name} timed out waiting for the daemon')
+            try:
+                result = self._send_lock_step(request, engine=engine, deadline=deadline)
+            finally:
+                self._scheduler.release()
+        if request.function_name in _SESSION_SETTING_FUNCTIONS:
+            # replayed onto the daemon if it has to be restarted
+            self._remember_session_setting(request)
+        return result
+
+    def _send_auto_batched(
+        self, request: RequestMessage, engine: Optional[AHK[Any]] = None, deadline: Optional[float] = None
+    ) -> Any:
+        """
+        Join the batch of calls being formed, starting one if there is none, and wait for the result of this call
+        """
+        fut = self._create_future()
+        with self._forming_batch_lock:
+            batch = self._forming_batch
+            leader = batch is None or batch.engine is not engine
+            if batch is None or batch.engine is not engine:
+                batch = self._forming_batch = _AutoBatch(engine, self._create_future())
+            batch.calls.append((request, fut, deadline))
+            if len(batch.calls) >= self._auto_batch_max_size:
+                self._forming_batch = None
+                batch.full.set_result(None)
+        if leader:
+            self._lead_batch(batch)
+        return self._wait_future(fut, timeout=_time_left(deadline))
+
+    def _lead_batch(self, batch: _AutoBatch) -> None:
+        # in the async API, the batch is sent by a task of its own so that it goes out even if the caller that
+        # started it is cancelled
+        return self._send_batch(batch)
+
+    def _send_batch(self, batch: _AutoBatch) -> None:
+        try:
+            self._wait_future(batch.full, timeout=self._auto_batch_delay)
+        except AHKCallTimeoutError:
+            pass  # no more calls joined in time
+        with self._forming_batch_lock:
+            if self._forming_batch is batch:
+                self._forming_batch = None
+        requests = [request for request, _, _ in batch.calls]
+        deadlines = [deadline for _, _, deadline in batch.calls]
+        # each caller waits only until its own deadline; the batch may take until the last of them
+        deadline = None if None in deadlines else max(d for d in deadlines if d is not None)
+        send: Callable[[RequestMessage], Any] = partial(self._send_now, engine=batch.engine, deadline=deadline)
+        try:
+            if len(requests) == 1:
+                results = [send(requests[0])]
+            else:
+                results = self._send_many(requests, send)
+        except Exception as e:
+            results = [e] * len(requests)
+        except BaseException:
+            error = AHKProtocolError('The call was abandoned before its batch was sent')
+            for _, fut, _ in batch.calls:
+                if not fut.done():
+                    fut.set_exception(error)
+            raise
+        for (_, fut, _), result in zip(batch.calls, results):
+            if fut.done():
+                continue
+            if isinstance(result, Exception):
+                fut.set_exception(result)
+            else:
+                fut.set_result(result)
+        return None
+
+    def _send_lock_step(
+        self, request: RequestMessage, engine: Optional[AHK[Any]] = None, deadline: Optional[float] = None
+    ) -> Any:
+        if not self._acquire_lock(deadline):
+            raise AHKCallTimeoutError(f'{request.function_name} timed out waiting for the daemon')
+        proc = self._proc
+        assert proc is not None
+        try:
+            if proc.returncode is not None:
+                # the daemon died while idle. Nothing was sent to it yet, so the call goes to its replacement
+                proc = self._proc = self._restart_process(proc)
+            return self._request(proc, request, engine=engine, deadline=deadline)
+        except AHKCallTimeoutError:
+            # the stuck daemon was killed; a replacement takes its place
+            self._proc = self._restart_process(proc)
+            raise
+        except AHKProcessExitedError as e:
+            self._proc = self._restart_process(proc)
+            raise AHKFailoverError(f'{e} The daemon has been replaced; the call may be retried.') from e
+        except AHKProtocolError:
+            self._proc = self._resync(proc)
+            raise
+        finally:
+            self.lock.release()
 
 
     def _sync_run_nonblocking(
@@ -802,5 +2471,613 @@ class DaemonProcessTransport(Transport):
             return self._sync_run_nonblocking(proc, script_bytes, timeout=timeout)
 
 
+class DaemonPoolTransport(DaemonProcessTransport):
+    """
+    Transport that runs a pool of daemon processes from the same rendered script and hands each request to an idle
+    daemon, so that concurrent callers are not serialized on a single daemon (e.g., a slow ``image_search`` does
+    not stall window queries made at the same time).
+
+    Session settings (coord mode, send mode, title match mode, detect hidden windows, etc.) are applied to every
+    daemon in the pool, within the deadline of the call; a daemon that fails to apply one is replaced.
+
+    :param pool_size: the number of daemon processes to run
+    """
+
+    def __init__(self, *, pool_size: int = 4, **kwargs: Any):
+        if pool_size < 1:
+            raise ValueError(f'pool_size must be at least 1, got {pool_size!r}')
+        if kwargs.get('pipelined'):
+            raise ValueError('pipelined mode is not supported by the daemon pool transport')
+        if kwargs.get('ack', 'wait') != 'wait':
+            raise ValueError('ack="deferred" is not supported by the daemon pool transport')
+        if kwargs.get('auto_batch'):
+            raise ValueError('auto_batch is not supported by the daemon pool transport')
+        super().__init__(**kwargs)
+        self._pool_size = pool_size
+        self._scheduler = _PriorityScheduler(pool_size, self._priority_aging)
+        self._members: List[SyncAHKProcess] = []
+        self._idle_members: Any = queue.Queue()
+
+    def start(self) -> None:
+        assert not self._members, 'cannot start a pool twice'
+        with warnings.catch_warnings(record=True) as caught_warnings:
+            with self.lock:
+                for _ in range(self._pool_size):
+                    proc = self._create_daemon()
+                    proc.start()
+                    self._handshake(proc)
+                    self._members.append(proc)
+                    self._idle_members.put_nowait(proc)
+                self._proc = self._members[0]
+            self._start_supervision()
+            self._fill_nonblocking_pool()
+        if caught_warnings:
+            for warning in caught_warnings:
+                warnings.warn(warning.message, warning.category, stacklevel=2)
+
+    def _processes(self) -> List[SyncAHKProcess]:
+        return list(self._members)
+
+    def _swap_member(self, proc: SyncAHKProcess, new_proc: SyncAHKProcess) -> SyncAHKProcess:
+        if new_proc is not proc:
+            self._members[self._members.index(proc)] = new_proc
+            if self._proc is proc:
+                self._proc = new_proc
+        return new_proc
+
+    def _resync_member(self, proc: SyncAHKProcess) -> SyncAHKProcess:
+        """
+        Recover a daemon of the pool after a protocol error, replacing it with a fresh one if need be
+        """
+        return self._swap_member(proc, self._resync(proc))
+
+    def _replace_member(self, proc: SyncAHKProcess) -> SyncAHKProcess:
+        return self._swap_member(proc, self._restart_process(proc))
+
+    def _check_daemons(self) -> None:
+        # check the members that are idle right now; the others are evidently working
+        idle: List[SyncAHKProcess] = []
+        try:
+            while len(idle) < self._pool_size:
+                idle.append(self._idle_members.get_nowait())
+        except (asyncio.QueueEmpty, queue.Empty):
+            pass
+        try:
+            for i, proc in enumerate(idle):
+                try:
+                    if proc.returncode is not None:
+                        raise AHKProcessExitedError('The AHK process exited')
+                    ping = RequestMessage(function_name='AHKEcho', args=['ping'])
+                    self._request(proc, ping, deadline=time.monotonic() + self._ping_timeout)
+                except Exception:
+                    idle[i] = self._replace_member(proc)
+        finally:
+            for proc in idle:
+                self._idle_members.put_nowait(proc)
+        return None
+
+    def _broadcast(
+        self, request: RequestMessage, engine: Optional[AHK[Any]] = None, deadline: Optional[float] = None
+    ) -> Any:
+        """
+        Apply a session setting to every daemon of the pool. The first daemon tells whether the setting is valid;
+        once it has taken the setting, a daemon that fails to apply it is replaced by a fresh one, which starts with
+        the session settings applied.
+        """
+        # Check out every member so no other request observes a partially-applied setting.
+        # Broadcasts are serialized with the lock so two broadcasts cannot deadlock one another.
+        with self.lock:
+            members: List[SyncAHKProcess] = []
+            try:
+                while len(members) < self._pool_size:
+                    members.append(self._checkout_member(deadline))
+                try:
+                    result = self._request(members[0], request, engine=engine, deadline=deadline)
+                except (AHKCallTimeoutError, AHKProcessExitedError, AHKProtocolError):
+                    members[0] = self._replace_member(members[0])
+                    raise
+                self._remember_session_setting(request)
+                for i, proc in enumerate(members[1:], start=1):
+                    try:
+                        self._request(proc, request, engine=engine, deadline=deadline)
+                    except Exception:
+                        members[i] = self._replace_member(proc)
+            finally:
+                for proc in members:
+                    self._idle_members.put_nowait(proc)
+        return result
+
+    def _checkout_member(self, deadline: Optional[float]) -> SyncAHKProcess:
+        timeout = _time_left(deadline)
+        try:
+            proc: SyncAHKProcess = self._idle_members.get(timeout=timeout)
+            return proc
+        except (asyncio.TimeoutError, queue.Empty):
+            raise AHKCallTimeoutError('Timed out waiting for an idle daemon') from None
+
+    def send(
+        self, request: RequestMessage, engine: Optional[AHK[Any]] = None, deadline: Optional[float] = None
+    ) -> Union[None, Tuple[int, int], int, str, bool, Window, List[Window], List[Control]]:
+        if deadline is None and self._call_timeout is not None:
+            deadline = time.monotonic() + self._call_timeout
+        if request.function_name in _SESSION_SETTING_FUNCTIONS:
+            return self._broadcast(request, engine=engine, deadline=deadline)  # type: ignore[no-any-return]
+        # callers waiting for an idle daemon take turns by priority
+        if not self._scheduler.acquire(_call_priority.get() or self._priority, deadline):
+            raise AHKCallTimeoutError('Timed out waiting for an idle daemon')
+        try:
+            return self._send_to_member(request, engine=engine, deadline=deadline)  # type: ignore[no-any-return]
+        finally:
+            self._scheduler.release()
+
+    def _send_to_member(
+        self, request: RequestMessage, engine: Optional[AHK[Any]] = None, deadline: Optional[float] = None
+    ) -> Any:
+        proc = self._checkout_member(deadline)
+        try:
+            if proc.returncode is not None:
+                # the daemon died while idle. Nothing was sent to it yet, so the call goes to its replacement
+                proc = self._replace_member(proc)
+            return self._request(proc, request, engine=engine, deadline=deadline)
+        except AHKCallTimeoutError:
+            # the stuck daemon was killed; a replacement takes its place in the pool
+            proc = self._replace_member(proc)
+            raise
+        except AHKProcessExitedError as e:
+            proc = self._replace_member(proc)
+            raise AHKFailoverError(f'{e} The daemon has been replaced; the call may be retried.') from e
+        except AHKProtocolError:
+            proc = self._resync_member(proc)
+            raise
+        finally:
+            self._idle_members.put_nowait(proc)
+
+
+class IOThreadTransport(DaemonProcessTransport):
+    """
+    Transport that hands calls to a :py:class:`~ahk._io_thread.DaemonIOThread`, which does all I/O with the daemon
+    on a dedicated thread. Engines using this transport (sync or async, in any threads or event loops) can share a
+    single daemon by passing the same ``io_thread``.
+
+    :param io_thread: the I/O thread to use. By default, one is started from the other options and stopped along
+      with this transport
+    """
+
+    def __init__(self, *, io_thread: Optional[DaemonIOThread] = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._owns_io_thread = io_thread is None
+        self._io_thread = io_thread if io_thread is not None else DaemonIOThread(**kwargs)
+
+    def start(self) -> None:
+        # starting the daemon blocks until it is ready
+        return self._io_thread.start()
+
+    def _lane_session_settings(self) -> List[Tuple[Tuple[str, ...], RequestMessage]]:
+        return list(self._io_thread.transport._session_settings.items())
+
+    def stop(self) -> None:
+        for proc in self._take_lanes():
+            kill(proc)
+        if not self._owns_io_thread:
+            return None  # stopped by its owner
+        return self._io_thread.stop()
+
+    def _supports_batching(self) -> bool:
+        return self._io_thread.transport._supports_batching()
+
+    def _supports_uploads(self) -> bool:
+        return self._io_thread.transport._supports_uploads()
+
+    def send(
+        self, request: RequestMessage, engine: Optional[AHK[Any]] = None, deadline: Optional[float] = None
+    ) -> Union[None, Tuple[int, int], int, str, bool, Window, List[Window], List[Control]]:
+        if deadline is None and self._call_timeout is not None:
+            deadline = time.monotonic() + self._call_timeout
+        if self._goes_to_lane(request):
+            # sent from the calling thread, so that the I/O thread keeps serving other calls
+            return self._send_to_lane(request, engine=engine, deadline=deadline)  # type: ignore[no-any-return]
+        fut = self._io_thread.submit(request, engine=engine, deadline=deadline)
+        try:
+            result = self._wait_submitted(fut, _time_left(deadline))
+        except (asyncio.TimeoutError, FutureTimeoutError):
+            raise AHKCallTimeoutError(f'{request.function_name} did not complete before its deadline') from None
+        return result  # type: ignore[no-any-return]
+
+    def _wait_submitted(self, fut: Future[Any], timeout: Optional[float]) -> Any:
+        # in the async API, cancelling the caller withdraws the call unless it was sent already
+        return fut.result(timeout)
+
+
+class DaemonSocketTransport(DaemonProcessTransport):
+    """
+    Transport that talks to a daemon over a local TCP socket instead of the pipes of a daemon process of its own.
+
+    The daemon runs the socket variant of the daemon script (``daemon-socket.ahk``) and keeps running after the
+    Python process that started it exits, so later processes connect to it rather than each starting a daemon.
+    It serves one connection at a time; other connections wait until the current one is closed. Session settings
+    (coord mode, send mode, etc.) belong to the daemon and carry over from one connection to the next.
+
+    :param host: the address the daemon listens on
+    :param port: the port the daemon listens on
+    :param launch: if no daemon is listening at the address, start one
+    :param connect_timeout: seconds to keep trying to connect (e.g., while a launched daemon starts up)
+    :param socket_buffer_size: size of the socket's send and receive buffers, if not the system default
+    """
+
+    def __init__(
+        self,
+        *,
+        host: str = '127.0.0.1',
+        port: int = DEFAULT_DAEMON_SOCKET_PORT,
+        launch: bool = True,
+        connect_timeout: float = 10.0,
+        socket_buffer_size: Optional[int] = None,
+        **kwargs: Any,
+    ):
+        if kwargs.get('standby'):
+            raise ValueError('standby is not supported by the daemon socket transport')
+        super().__init__(**kwargs)
+        self._address = (host, port)
+        self._launch = launch
+        self._connect_timeout = connect_timeout
+        self._socket_buffer_size = socket_buffer_size
+        self._launch_runargs: Optional[List[str]] = None
+
+    def _socket_daemon_runargs(self) -> List[str]:
+        """
+        The command that starts a daemon listening at the transport's address
+        """
+        template_name = 'daemon-socket-v2.ahk' if self._version == 'v2' else 'daemon-socket.ahk'
+        template = self._jinja_env.get_template(template_name)
+        host, port = self._address
+        return self._create_process(template=template, socket_host=host, socket_port=port).runargs
+
+    def _create_daemon(self) -> SyncAHKProcess:
+        if self._launch and self._launch_runargs is None:
+            self._launch_runargs = self._socket_daemon_runargs()
+        return SyncAHKSocketConnection(
+            self._address,
+            launch_args=self._launch_runargs,
+            connect_timeout=self._connect_timeout,
+            buffer_size=self._socket_buffer_size,
+        )
+
+
+class BrokerTransport(DaemonSocketTransport):
+    """
+    Transport that sends calls to a broker (``python -m ahk.broker``), which runs the daemon and shares it between
+    all the processes connected to it. Unlike a socket daemon, the broker serves any number of connections at once.
+
+    If no broker is listening at the address, one is started (detached) with the executable and version of the
+    engine, unless ``launch=False``. Non-blocking calls and ``run_script`` still run in processes of their own.
+    Takes the same options as :py:class:`AsyncDaemonSocketTransport`; ``port`` defaults to ``DEFAULT_BROKER_PORT``.
+    """
+
+    def __init__(self, *, port: int = DEFAULT_BROKER_PORT, **kwargs: Any):
+        super().__init__(port=port, **kwargs)
+
+    def _socket_daemon_runargs(self) -> List[str]:
+        host, port = self._address
+        runargs = [sys.executable, '-m', 'ahk.broker', '--host', host, '--port', str(port)]
+        if self._executable_path:
+            runargs += ['--executable-path', self._executable_path]
+        if self._version is not None:
+            runargs += ['--version', self._version]
+        return runargs
+
+
+class RingBufferTransport(DaemonProcessTransport):
+    """
+    Experimental transport that passes requests and responses through ring buffers in shared memory instead of the
+    daemon's stdin and stdout, so that a call takes no pipe reads, writes or flushes. Requests and responses are
+    encoded as usual.
+
+    Both sides poll their ring for data: right away at first, then less and less often once there is nothing to
+    read, up to every ``ring_max_poll_interval`` seconds. This suits high call rates, such as polling the mouse
+    position on every frame, at the cost of some CPU time while waiting.
+
+    :param ring_capacity: the size in bytes of each ring. Larger requests and responses are passed through in parts
+    :param ring_max_poll_interval: the longest to wait between looks at a ring that has nothing to read
+    """
+
+    def __init__(
+        self, *, ring_capacity: int = DEFAULT_RING_CAPACITY, ring_max_poll_interval: float = 0.001, **kwargs: Any
+    ):
+        if ring_capacity < 1:
+            raise ValueError(f'ring_capacity must be at least 1, got {ring_capacity!r}')
+        super().__init__(**kwargs)
+        self._ring_capacity = ring_capacity
+        self._ring_max_poll_interval = ring_max_poll_interval
+        self._ring_runargs: Optional[List[str]] = None
+
+    def _ring_daemon_runargs(self) -> List[str]:
+        """
+        The command that starts a daemon serving the ring file whose path is appended to it, along with the ID of
+        this process (see :py:class:`AsyncAHKRingConnection`)
+        """
+        template_name = 'daemon-ring-v2.ahk' if self._version == 'v2' else 'daemon-ring.ahk'
+        template = self._jinja_env.get_template(template_name)
+        return self._create_process(template=template).runargs
+
+    def _create_daemon(self) -> SyncAHKProcess:
+        if self._ring_runargs is None:
+            self._ring_runargs = self._ring_daemon_runargs()
+        rings = SharedRings.create(self._ring_capacity)
+        return SyncAHKRingConnection(self._ring_runargs, rings, max_poll_interval=self._ring_max_poll_interval)
+
+
+class _SharedDaemon:
+    """
+    A daemon transport (and its hotkey process) shared by the engines using :py:class:`AsyncSharedDaemonTransport`
+    with the same configuration
+    """
+
+    def __init__(self, key: str, transport: DaemonProcessTransport):
+        self.key = key
+        self.transport = transport
+        self.clients: List[SharedDaemonTransport] = []  # one per engine; the daemon is stopped with the last
+        self.hotkey_clients: List[SharedDaemonTransport] = []  # the engines that started hotkeys
+        # the engine settings as last sent to the daemon, for the settings any engine has changed
+        self.applied: dict[Tuple[str, ...], List[str]] = {}
+        self.state_lock = threading.Lock()
+        self._init_lock = threading.Lock()
+
+    @property
+    def init_lock(self) -> Any:
+        return self._init_lock
+
+
+# the shared daemons of this process, by the key of their configuration; see AsyncSharedDaemonTransport
+_shared_daemons: dict[str, _SharedDaemon] = {}
+_shared_daemons_lock = threading.Lock()
+
+
+def _shared_daemon_key(transport_class: Type[DaemonProcessTransport], options: dict[str, Any]) -> str:
+    """
+    Hash of everything that makes one daemon different from another: the transport class and its options, with the
+    directives and extensions by the script they add
+    """
+    config: List[Tuple[str, str]] = []
+    for name, value in sorted(options.items()):
+        if name == 'directives':
+            value = [str(directive) for directive in value or []]
+        elif name == 'extensions':
+            value = [
+                (ext.script_text, [str(include) for include in ext.includes])
+                for ext in _resolve_extensions(value or [])
+            ]
+        config.append((name, repr(value)))
+    return hashlib.sha256(
+        bytes(repr((transport_class.__module__, transport_class.__qualname__, config)), 'UTF-8')
+    ).hexdigest()
+
+
+class SharedDaemonTransport(Transport):
+    """
+    Transport that shares one daemon, and one hotkey process, between all the engines of this process that use it
+    with the same configuration (executable, version, directives, extensions and transport options). The daemon is
+    started by the first call of any of them and stopped when the last of them is stopped with :py:meth:`stop`.
+
+    Each engine keeps its own coord mode, send mode, send level, title match mode, hidden window detection and key
+    delay. While the engines sharing the daemon differ in these settings, the settings of the calling engine are sent
+    along with each of its calls, in the same batch, so they apply to that call alone. The tray menu and the
+    clipboard callback belong to the shared processes. In the async API, the engines sharing a daemon must be used
+    from the same event loop.
+
+    :param daemon_transport_class: the transport that runs the shared daemon; it is given all other options
+    """
+
+    def __init__(
+        self,
+        *,
+        daemon_transport_class: Type[DaemonProcessTransport] = DaemonProcessTransport,
+        coalesce_reads: bool = False,
+        read_cache: Optional[ReadCache] = None,
+        **kwargs: Any,
+    ):
+        key = _shared_daemon_key(daemon_transport_class, kwargs)
+        with _shared_daemons_lock:
+            shared = _shared_daemons.get(key)
+            if shared is None:
+                shared = _shared_daemons[key] = _SharedDaemon(key, daemon_transport_class(**kwargs))
+            shared.clients.append(self)
+        self._shared = shared
+        self._settings: dict[Tuple[str, ...], List[str]] = {}  # the engine settings this engine has changed
+        self._hotkeys: List[Hotkey] = []
+        self._hotstrings: List[Hotstring] = []
+        self._stopped = False
+        super().__init__(
+            directives=shared.transport._directives,
+            version=shared.transport._version,
+            hotkey_transport=shared.transport._hotkey_transport,
+            coalesce_reads=coalesce_reads,
+            read_cache=read_cache,
+        )
+
+    def init(self) -> None:
+        shared = self._shared
+        with shared.init_lock:
+            if not shared.transport._started:
+                shared.transport.init()
+        super().init()
+        return None
+
+    def stop(self) -> None:
+        """
+        Stop using the shared daemon. It is stopped, along with the hotkey process, once no engine uses it.
+        """
+        if self._stopped:
+            return None
+        self._stopped = True
+        shared = self._shared
+        self.stop_hotkeys()
+        with _shared_daemons_lock:
+            shared.clients.remove(self)
+            last = not shared.clients
+            if last:
+                del _shared_daemons[shared.key]
+        if last:
+            shared.transport.stop()
+        return None
+
+    def _engine_setting(self, key: Tuple[str, ...]) -> List[str]:
+        settings = self._settings.get(key)
+        return settings if settings is not None else _default_engine_setting(key, self._version)
+
+    def _settings_to_send(self, changing: Sequence[Tuple[str, ...]]) -> List[Tuple[Tuple[str, ...], List[str]]]:
+        """
+        The settings of this engine to send along with a call, if the daemon may have different ones. Settings the
+        call itself changes are left out.
+        """
+        shared = self._shared
+        with shared.state_lock:
+            keys = set(shared.applied)
+            for client in shared.clients:
+                keys.update(client._settings)
+            if not keys:
+                return []  # no engine has changed a setting
+            own = [(key, self._engine_setting(key)) for key in keys if key not in changing]
+            differs = any(
+                shared.applied.get(key, _default_engine_setting(key, self._version)) != value
+                or any(client._engine_setting(key) != value for client in shared.clients)
+                for key, value in own
+            )
+        return own if differs else []
+
+    def _record_settings(self, settings: List[Tuple[Tuple[str, ...], List[str]]], own: bool) -> None:
+        shared = self._shared
+        with shared.state_lock:
+            for key, value in settings:
+                shared.applied[key] = value
+                if own:
+                    self._settings[key] = value
+        return None
+
+    def send(
+        self, request: RequestMessage, engine: Optional[AHK[Any]] = None, deadline: Optional[float] = None
+    ) -> Union[None, Tuple[int, int], int, str, bool, Window, List[Window], List[Control]]:
+        transport = self._shared.transport
+        is_batch = isinstance(request, BatchRequestMessage)
+        requests = request.requests if isinstance(request, BatchRequestMessage) else [request]
+        changes = [
+            _split_engine_settings(call) if call.function_name in _ENGINE_SETTING_FUNCTIONS else [] for call in requests
+        ]
+        prefix = self._settings_to_send([key for change in changes for key, _ in change])
+        settings = [RequestMessage(function_name=key[0], args=value) for key, value in prefix]
+        results: Any
+        if not settings:
+            result = transport.send(request, engine=engine, deadline=deadline)
+            results = result if is_batch else [result]
+        elif transport._supports_batching():
+            batch = BatchRequestMessage(requests=settings + requests)
+            if transport._goes_to_lane(request):
+                # the call goes to a lane all the same, with the settings of this engine
+                results = transport._send_to_lane(batch, engine=engine, deadline=deadline)
+            else:
+                results = transport.send(batch, engine=engine, deadline=deadline)
+            assert isinstance(results, list)
+            settings_count = len(settings)
+            results = results[settings_count:]
+            # the settings hold in the daemon whether or not the call failed
+            self._record_settings(prefix, own=False)
+            if not is_batch and isinstance(results[0], Exception):
+                raise results[0]
+        else:
+            # the daemon takes no batches, so the settings go just ahead of the call
+            for setting in settings:
+                transport.send(setting, engine=engine, deadline=deadline)
+            self._record_settings(prefix, own=False)
+            result = transport.send(request, engine=engine, deadline=deadline)
+            results = result if is_batch else [result]
+        for change, result in zip(changes, results):
+            if change and not isinstance(result, Exception):
+                self._record_settings(change, own=True)
+        return results if is_batch else results[0]  # type: ignore[no-any-return]
+
+
+    def send_nonblocking(
+        self, request: RequestMessage, engine: Optional[AHK[Any]] = None
+    ) -> FutureResult[Union[None, Tuple[int, int], int, str, bool, Window, List[Window], List[Control]]]:
+        return self._shared.transport.send_nonblocking(request, engine=engine)
+
+    def _supports_batching(self) -> bool:
+        return self._shared.transport._supports_batching()
+
+    def _supports_uploads(self) -> bool:
+        return self._shared.transport._supports_uploads()
+
+    # fmt: off
+    @overload
+    def run_script(self, script_text_or_path: str, /, *, timeout: Optional[int] = None) -> str: ...
+    @overload
+    def run_script(self, script_text_or_path: str, /, *, blocking: Literal[False], timeout: Optional[int] = None) -> FutureResult[str]: ...
+    @overload
+    def run_script(self, script_text_or_path: str, /, *, blocking: Literal[True], timeout: Optional[int] = None) -> str: ...
+    @overload
+    def run_script(self, script_text_or_path: str, /, *, blocking: bool = True, timeout: Optional[int] = None) -> Union[str, FutureResult[str]]: ...
+    # fmt: on
+    def run_script(
+        self, script_text_or_path: str, /, *, blocking: bool = True, timeout: Optional[int] = None
+    ) -> Union[str, FutureResult[str]]:
+        return self._shared.transport.run_script(script_text_or_path, blocking=blocking, timeout=timeout)
+
+    # hotkeys and hotstrings go to the shared hotkey process, which runs while any engine has hotkeys started.
+    # Clearing them clears only those of this engine
+
+    def add_hotkey(self, hotkey: Hotkey) -> None:
+        super().add_hotkey(hotkey)
+        self._hotkeys.append(hotkey)
+        return None
+
+    def add_hotstring(self, hotstring: Hotstring) -> None:
+        super().add_hotstring(hotstring)
+        self._hotstrings.append(hotstring)
+        return None
+
+    def remove_hotkey(self, hotkey: Hotkey) -> None:
+        super().remove_hotkey(hotkey)
+        if hotkey in self._hotkeys:
+            self._hotkeys.remove(hotkey)
+        return None
+
+    def remove_hotstring(self, hotstring: Hotstring) -> None:
+        super().remove_hotstring(hotstring)
+        if hotstring in self._hotstrings:
+            self._hotstrings.remove(hotstring)
+        return None
+
+    def clear_hotkeys(self) -> None:
+        while self._hotkeys:
+            self.remove_hotkey(self._hotkeys[-1])
+        return None
+
+    def clear_hotstrings(self) -> None:
+        while self._hotstrings:
+            self.remove_hotstring(self._hotstrings[-1])
+        return None
+
+    def start_hotkeys(self) -> None:
+        shared = self._shared
+        with shared.state_lock:
+            if self in shared.hotkey_clients:
+                return None
+            shared.hotkey_clients.append(self)
+            start = len(shared.hotkey_clients) == 1
+        if start:
+            super().start_hotkeys()
+        return None
+
+    def stop_hotkeys(self) -> None:
+        shared = self._shared
+        with shared.state_lock:
+            if self not in shared.hotkey_clients:
+                return None
+            shared.hotkey_clients.remove(self)
+            stop = not shared.hotkey_clients
+        if stop:
+            super().stop_hotkeys()
+        return None
+
+
 if TYPE_CHECKING:
     from .engine import AHK
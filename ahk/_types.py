@@ -74,6 +74,8 @@ MouseButton: TypeAlias = Union[
 
 SendMode: TypeAlias = Literal['Event', 'Input', 'InputThenPlay', 'Play', '']
 
+CallPriority: TypeAlias = Literal['interactive', 'normal', 'background']
+
 FunctionName = Literal[
     'AHKBlockInput',
     'AHKClipWait',
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Type
+from typing import TYPE_CHECKING
+
+from ahk._async.transport import AsyncDaemonPoolTransport
+from ahk._async.transport import AsyncDaemonProcessTransport
+from ahk._async.transport import DEFAULT_BROKER_PORT
+from ahk._utils import _get_executable_major_version
+from ahk._utils import _resolve_executable_path
+from ahk.message import ExceptionResponseMessage
+from ahk.message import NoValueResponseMessage
+from ahk.message import parse_request
+from ahk.message import parse_upload
+from ahk.message import PROTOCOL_VERSION
+from ahk.message import RequestMessage
+from ahk.message import ResponseFrame
+from ahk.message import ResponseMessage
+from ahk.message import StringResponseMessage
+from ahk.message import UPLOAD_PREFIX
+
+if TYPE_CHECKING:
+    from ahk._async.engine import AsyncAHK
+
+# requests carry their arguments inline (e.g., the text for set_clipboard), so lines may be long
+_MAX_REQUEST_SIZE = 256 * 1024 * 1024
+
+
+def _forwarded_response(
+    transport: AsyncDaemonProcessTransport, frame: ResponseFrame, engine: Optional[AsyncAHK[Any]]
+) -> Any:
+    if transport._protocol is None:
+        # the transport's own handshake with the daemon, which needs the results
+        return ResponseMessage.from_frame(frame, engine=engine).unpack()
+    return ResponseMessage.from_frame(frame)
+
+
+class BrokerDaemonTransport(AsyncDaemonProcessTransport):
+    """
+    Daemon transport of the broker. Calls are answered with the response message of the daemon, which the broker
+    passes on to its client, rather than with the result of the call.
+    """
+
+    def _unpack_response(self, frame: ResponseFrame, engine: Optional[AsyncAHK[Any]] = None) -> Any:
+        return _forwarded_response(self, frame, engine)
+
+
+class BrokerDaemonPoolTransport(AsyncDaemonPoolTransport):
+    """
+    Like :py:class:`BrokerDaemonTransport`, for a pool of daemons
+    """
+
+    def _unpack_response(self, frame: ResponseFrame, engine: Optional[AsyncAHK[Any]] = None) -> Any:
+        return _forwarded_response(self, frame, engine)
+
+
+class Broker:
+    """
+    Runs the AutoHotkey daemon on behalf of any number of Python processes, so that each of them does not start
+    (and detect the version of) a daemon of its own. Clients connect over a local TCP socket with
+    ``TransportClass=AsyncBrokerTransport`` (or ``BrokerTransport`` in the sync API) and speak the daemon protocol
+    to the broker. Requests from all clients are multiplexed onto the daemon; each response goes back to the client
+    that made the request, with that client's request ID.
+
+    The daemon, and so its settings (coord mode, send mode, etc.), is shared by all clients.
+
+    :param host: the address to listen on
+    :param port: the port to listen on; ``0`` picks a free one (see :py:attr:`port`)
+    :param pool_size: the number of daemons to run. A single daemon is sent the calls of all clients in pipelined
+        mode; with more, each call goes to an idle daemon of the pool
+    :param transport_options: options for the daemon transport, e.g. ``executable_path`` and ``version``
+    """
+
+    TransportClass: Type[AsyncDaemonProcessTransport] = BrokerDaemonTransport
+    PoolTransportClass: Type[AsyncDaemonPoolTransport] = BrokerDaemonPoolTransport
+
+    def __init__(
+        self, *, host: str = '127.0.0.1', port: int = DEFAULT_BROKER_PORT, pool_size: int = 1, **transport_options: Any
+    ):
+        self.address = (host, port)
+        self.transport: AsyncDaemonProcessTransport
+        if pool_size > 1:
+            self.transport = self.PoolTransportClass(pool_size=pool_size, **transport_options)
+        else:
+            transport_options.setdefault('pipelined', True)
+            self.transport = self.TransportClass(**transport_options)
+        self._server: Optional[asyncio.Server] = None
+        self._connections: Set[asyncio.Task[None]] = set()
+
+    @property
+    def port(self) -> int:
+        """
+        The port the broker listens on, once started
+        """
+        assert self._server is not None, 'the broker has not been started'
+        return int(self._server.sockets[0].getsockname()[1])
+
+    async def start(self) -> None:
+        """
+        Start the daemon and start accepting connections
+        """
+        await self.transport.init()
+        host, port = self.address
+        self._server = await asyncio.start_server(self._serve_client, host, port, limit=_MAX_REQUEST_SIZE)
+        return None
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        assert self._server is not None
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def stop(self) -> None:
+        """
+        Close all connections and stop the daemon
+        """
+        if self._server is not None:
+            self._server.close()
+        for connection in list(self._connections):
+            connection.cancel()
+        if self._connections:
+            await asyncio.wait(self._connections)
+        if self._server is not None:
+            await self._server.wait_closed()
+            self._server = None
+        await self.transport.stop()
+        return None
+
+    def _hello(self) -> StringResponseMessage:
+        # the broker correlates and frames the responses to each client itself, and assembles uploaded arguments
+        # before passing the request on; batches and uploads are up to the daemon
+        protocol = self.transport._protocol
+        features = ['length-framing', 'request-ids']
+        if protocol is not None:
+            features.extend(feature for feature in ('batch', 'chunked-args') if feature in protocol.features)
+        return StringResponseMessage(raw_content=bytes('\n'.join([str(PROTOCOL_VERSION), *features]), 'UTF-8'))
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        connection = asyncio.current_task()
+        assert connection is not None
+        self._connections.add(connection)
+        calls: Set[asyncio.Task[None]] = set()
+        uploads: Dict[bytes, List[bytes]] = {}
+        length_prefixed = False
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.endswith(b'\n'):
+                    return None  # the client closed the connection
+                try:
+                    if line.startswith(UPLOAD_PREFIX):
+                        upload_id, chunk = parse_upload(line)
+                        uploads.setdefault(upload_id, []).append(chunk)
+                        continue
+                    request = parse_request(line, uploads)
+                except ValueError:
+                    return None  # not a client of the broker
+                if request.function_name == 'AHKProtocolHello':
+                    self._respond(writer, request.request_id, self._hello(), length_prefixed)
+                elif request.function_name == 'AHKSetResponseFraming':
+                    # acknowledged with the old framing
+                    self._respond(writer, request.request_id, NoValueResponseMessage(b'\xee\x80\x80'), length_prefixed)
+                    length_prefixed = request.args[:1] == ['length']
+                else:
+                    call = asyncio.ensure_future(self._forward(writer, request, length_prefixed))
+                    calls.add(call)
+                    call.add_done_callback(calls.discard)
+        except (ConnectionError, asyncio.CancelledError):
+            return None
+        finally:
+            # calls of a client that went away are withdrawn
+            for call in list(calls):
+                call.cancel()
+            writer.close()
+            self._connections.discard(connection)
+
+    async def _forward(self, writer: asyncio.StreamWriter, request: RequestMessage, length_prefixed: bool) -> None:
+        # the transport numbers the requests it sends to the daemon itself
+        request_id, request.request_id = request.request_id, None
+        response: Any
+        try:
+            response = await self.transport.send(request)
+        except Exception as e:
+            # e.g., the daemon had to be replaced. The client gets the error, and may retry the call
+            response = ExceptionResponseMessage(raw_content=bytes(str(e), 'UTF-8'))
+        self._respond(writer, request_id, response, length_prefixed)
+        return None
+
+    @staticmethod
+    def _respond(
+        writer: asyncio.StreamWriter, request_id: Optional[int], response: ResponseMessage, length_prefixed: bool
+    ) -> None:
+        if writer.is_closing():
+            return None  # the client went away
+        header = b'' if request_id is None else b'#%d\n' % request_id
+        writer.write(header + response.to_bytes(length_prefixed=length_prefixed) + b'\n')
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog='python -m ahk.broker', description='Share an AutoHotkey daemon between Python processes'
+    )
+    parser.add_argument('--host', default='127.0.0.1', help='the address to listen on (default: %(default)s)')
+    parser.add_argument(
+        '--port', type=int, default=DEFAULT_BROKER_PORT, help='the port to listen on (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--executable-path', default='', help='the AutoHotkey executable (default: found like AHK() does)'
+    )
+    parser.add_argument(
+        '--version', choices=['v1', 'v2'], default=None, help='the AutoHotkey version (default: detected)'
+    )
+    parser.add_argument('--pool-size', type=int, default=1, help='the number of daemons to run (default: %(default)s)')
+    args = parser.parse_args(argv)
+    executable_path = _resolve_executable_path(executable_path=args.executable_path, version=args.version)
+    version = args.version or _get_executable_major_version(executable_path)
+    broker = Broker(
+        host=args.host,
+        port=args.port,
+        pool_size=args.pool_size,
+        executable_path=executable_path,
+        version=version,
+    )
+    try:
+        asyncio.run(broker.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,22 @@ class WindowNotFoundException(AHKBaseException): ...
 class AHKProtocolError(AHKBaseException): ...
 
 
+class AHKProcessExitedError(AHKProtocolError): ...
+
+
+class AHKFailoverError(AHKProcessExitedError):
+    # the daemon died during the call and has already been replaced, so the call can be retried
+    ...
+
+
+class AHKCallTimeoutError(AHKBaseException, TimeoutError): ...
+
+
+class AHKDeferredCallError(AHKBaseException):
+    # a call made with ack='deferred' failed after it had returned; the original error is the __cause__
+    ...
+
+
 class AHKExecutionException(AHKBaseException):
     pass
 
@@ -112,8 +112,12 @@ class Extension:
         includes: list[str] | None = None,
         dependencies: list[Extension] | None = None,
         requires_autohotkey: typing.Literal['v1', 'v2'] | None = None,
+        long_blocking_functions: list[str] | None = None,
     ):
         self._requires = requires_autohotkey
+        # functions of the script that may block for a long time (e.g., waiting for input), which the transport
+        # sends to an auxiliary daemon so they do not hold up other calls
+        self.long_blocking_functions: list[str] = long_blocking_functions or []
         self._text: str = script_text or ''
         self._includes: list[str] = includes or []
         self.dependencies: list[Extension] = dependencies or []
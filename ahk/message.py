@@ -3,18 +3,29 @@ from __future__ import annotations
 import ast
 import base64
 import itertools
+import re
 import string
 import sys
 from abc import abstractmethod
+from array import array
 from base64 import b64encode
+from functools import partial
 from typing import Any
+from typing import Callable
 from typing import cast
+from typing import Dict
+from typing import FrozenSet
 from typing import Generator
+from typing import Iterable
+from typing import Iterator
 from typing import List
+from typing import NamedTuple
 from typing import NoReturn
 from typing import Optional
+from typing import overload
 from typing import Protocol
 from typing import runtime_checkable
+from typing import Sequence
 from typing import Tuple
 from typing import Type
 from typing import TYPE_CHECKING
@@ -59,6 +70,76 @@ def is_window_control_list_response(resp_obj: object) -> TypeGuard[Tuple[str, Li
     return True
 
 
+_INT_LITERAL = re.compile(r'[+-]?(?:0[xX][0-9a-fA-F]+|0|[1-9][0-9]*)')
+_FLOAT_LITERAL = re.compile(r'[+-]?(?:(?:[0-9]+\.[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?|[0-9]+[eE][+-]?[0-9]+)')
+
+
+def _parse_number_literal(s: str) -> Optional[Union[int, float]]:
+    # ASCII decimal, hexadecimal and float literals only; None for anything else
+    if _INT_LITERAL.fullmatch(s):
+        return int(s, 0)
+    if _FLOAT_LITERAL.fullmatch(s):
+        return float(s)
+    return None
+
+
+def parse_number(s: str) -> Union[int, float]:
+    """
+    Parse a Python int or float literal, as written by the daemon (e.g., ``42``, ``-7``, ``0x1F`` or ``50.000000``).
+    Anything else is evaluated with ``ast.literal_eval``, as before, raising the same errors.
+    """
+    val = _parse_number_literal(s)
+    if val is None:
+        return cast(Union[int, float], ast.literal_eval(s))
+    return val
+
+
+def parse_tuple(s: str) -> Tuple[Any, ...]:
+    """
+    Parse a tuple literal. Tuples of numbers, such as coordinates and positions, are parsed by splitting the string;
+    anything else (e.g., tuples containing strings returned by extensions) is evaluated with ``ast.literal_eval``.
+    """
+    text = s.strip()
+    if text.startswith('(') and text.endswith(')'):
+        parts = text[1:-1].split(',')
+        if len(parts) > 1 and not parts[-1].strip():
+            parts.pop()  # trailing comma
+        if len(parts) > 1 or text[1:-1].rstrip().endswith(','):
+            numbers = [_parse_number_literal(part.strip(' \t')) for part in parts]
+            if None not in numbers:
+                return tuple(numbers)
+    val = ast.literal_eval(s)
+    assert isinstance(val, tuple)
+    return val
+
+
+_CONTROL_LIST_HEAD = re.compile(r"\s*\(\s*'([^'\\]*)'\s*,\s*\[\s*")
+_CONTROL_LIST_ITEM = re.compile(r"\(\s*'([^'\\]*)'\s*,\s*'([^'\\]*)'\s*\)\s*(?:,\s*)?")
+_CONTROL_LIST_TAIL = re.compile(r'\]\s*\)\s*')
+
+
+def parse_window_control_list(s: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """
+    Parse the ``('<ahk_id>', [('<hwnd>', '<class>'), ...])`` payload of a window control list response in a single
+    pass over the string. Payloads that are not in the form the daemon writes (e.g., with escaped quotes) are
+    evaluated with ``ast.literal_eval``.
+    """
+    head = _CONTROL_LIST_HEAD.match(s)
+    if head is not None:
+        controls: List[Tuple[str, str]] = []
+        position = head.end()
+        item = _CONTROL_LIST_ITEM.match(s, position)
+        while item is not None:
+            controls.append((item.group(1), item.group(2)))
+            position = item.end()
+            item = _CONTROL_LIST_ITEM.match(s, position)
+        if _CONTROL_LIST_TAIL.fullmatch(s, position):
+            return head.group(1), controls
+    val = ast.literal_eval(s)
+    assert is_window_control_list_response(val)
+    return val
+
+
 def is_winget_response_type(
     obj: object,
 ) -> TypeGuard[
@@ -95,6 +176,171 @@ def tom_generator() -> Generator[bytes, None, None]:
 
 TOMS = tom_generator()
 
+# marks the size line of a response as a byte count (length-prefixed framing) rather than a newline count
+LENGTH_PREFIX = b'='
+
+
+T_LazyItem = TypeVar('T_LazyItem')
+
+
+class LazyList(Sequence[T_LazyItem]):
+    """
+    A read-only, list-like sequence for large responses (such as window lists) whose items are only created when
+    they are accessed. The response is parsed into keys (e.g., window IDs) the first time the length or an item is
+    needed, and each item is created from its key on first access.
+
+    It compares equal to a ``list`` with the same items. Use ``list()`` to get a mutable copy.
+    """
+
+    def __init__(self, load_keys: Callable[[], Sequence[Any]], make_item: Callable[[Any], T_LazyItem]):
+        self._load_keys = load_keys
+        self._make_item = make_item
+        self._keys: Optional[Sequence[Any]] = None
+        self._items: List[Optional[T_LazyItem]] = []  # allocated when the first item is accessed
+
+    def _get_keys(self) -> Sequence[Any]:
+        if self._keys is None:
+            self._keys = self._load_keys()
+        return self._keys
+
+    def __len__(self) -> int:
+        return len(self._get_keys())
+
+    @overload
+    def __getitem__(self, index: int) -> T_LazyItem: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[T_LazyItem]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[T_LazyItem, List[T_LazyItem]]:
+        keys = self._get_keys()
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(keys)))]
+        if index < 0:
+            index += len(keys)
+        if not 0 <= index < len(keys):
+            raise IndexError('list index out of range')
+        if not self._items:
+            self._items = [None] * len(keys)
+        item = self._items[index]
+        if item is None:
+            item = self._make_item(keys[index])
+            self._items[index] = item
+        return item
+
+    def __iter__(self) -> Iterator[T_LazyItem]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, LazyList):
+            other = list(other)
+        if not isinstance(other, list):
+            return NotImplemented
+        return list(self) == other
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+class WindowIdArray(LazyList[T_LazyItem]):
+    """
+    A :py:class:`LazyList` of windows that stores the window IDs (HWNDs) as integers in an ``array('Q')``, so a
+    snapshot of thousands of windows costs 8 bytes per window until windows are accessed.
+
+    Snapshots can be compared without creating any window objects: :py:meth:`difference` (``-``) and
+    :py:meth:`intersection` (``&``) return new arrays, in the order of this array, and ``in`` accepts a window,
+    an ahk_id string or an integer HWND.
+    """
+
+    def __init__(self, load_ids: Callable[[], Tuple[array[int], bool]], make_window: Callable[[str], T_LazyItem]):
+        super().__init__(self._load_ids, self._make_window)
+        self._load_window_ids = load_ids
+        self._window_factory = make_window
+        self._hex_ids = True  # AutoHotkey v1 writes window IDs in hex, v2 in decimal
+        self._id_set: Optional[frozenset[int]] = None
+
+    @classmethod
+    def from_window_list(
+        cls, window_list: bytes, make_window: Callable[[str], T_LazyItem]
+    ) -> 'WindowIdArray[T_LazyItem]':
+        """
+        Create an array from the comma-separated window IDs of a window list response. The IDs are parsed when
+        the array is first used.
+        """
+
+        def parse_ids() -> Tuple[array[int], bool]:
+            ahk_ids = [ahk_id for ahk_id in window_list.decode(encoding='utf-8').split(',') if ahk_id]
+            hex_ids = not ahk_ids or ahk_ids[0][:2].lower() == '0x'
+            return array('Q', [int(ahk_id, 0) for ahk_id in ahk_ids]), hex_ids
+
+        return cls(parse_ids, make_window)
+
+    def _load_ids(self) -> array[int]:
+        ids, self._hex_ids = self._load_window_ids()
+        return ids
+
+    def _make_window(self, hwnd: int) -> T_LazyItem:
+        return self._window_factory(hex(hwnd) if self._hex_ids else str(hwnd))
+
+    def _with_ids(self, ids: array[int]) -> 'WindowIdArray[T_LazyItem]':
+        hex_ids = self._hex_ids
+        return WindowIdArray(lambda: (ids, hex_ids), self._window_factory)
+
+    @property
+    def ids(self) -> array[int]:
+        """
+        The window IDs (HWNDs), in order. This is the array's own storage and must not be modified.
+        """
+        ids = self._get_keys()
+        assert isinstance(ids, array)
+        return ids
+
+    def _get_id_set(self) -> frozenset[int]:
+        if self._id_set is None:
+            self._id_set = frozenset(self.ids)
+        return self._id_set
+
+    @staticmethod
+    def _to_id_set(other: Union['WindowIdArray[Any]', Iterable[int]]) -> frozenset[int]:
+        if isinstance(other, WindowIdArray):
+            return other._get_id_set()
+        return frozenset(other)
+
+    def difference(self, other: Union['WindowIdArray[Any]', Iterable[int]]) -> 'WindowIdArray[T_LazyItem]':
+        """
+        The windows in this array that are not in ``other`` (e.g., windows that appeared since a previous snapshot)
+        """
+        exclude = self._to_id_set(other)
+        return self._with_ids(array('Q', [hwnd for hwnd in self.ids if hwnd not in exclude]))
+
+    def intersection(self, other: Union['WindowIdArray[Any]', Iterable[int]]) -> 'WindowIdArray[T_LazyItem]':
+        """
+        The windows in this array that are also in ``other``
+        """
+        include = self._to_id_set(other)
+        return self._with_ids(array('Q', [hwnd for hwnd in self.ids if hwnd in include]))
+
+    def __sub__(self, other: Union['WindowIdArray[Any]', Iterable[int]]) -> 'WindowIdArray[T_LazyItem]':
+        return self.difference(other)
+
+    def __and__(self, other: Union['WindowIdArray[Any]', Iterable[int]]) -> 'WindowIdArray[T_LazyItem]':
+        return self.intersection(other)
+
+    def __contains__(self, item: object) -> bool:
+        hwnd: object = getattr(item, '_ahk_id', item)  # windows are looked up by their ID
+        if isinstance(hwnd, str):
+            try:
+                hwnd = int(hwnd, 0)
+            except ValueError:
+                return False
+        return hwnd in self._get_id_set()
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, WindowIdArray):
+            return self.ids == other.ids
+        return super().__eq__(other)
+
 
 class ResponseMessage:
     _type_order_mark = next(TOMS)
@@ -111,10 +357,33 @@ class ResponseMessage:
         _message_registry[tom] = cls
         super().__init_subclass__(**kwargs)
 
-    def __init__(self, raw_content: bytes, engine: Optional[Union[AsyncAHK[Any], AHK[Any]]] = None):
-        self._raw_content: bytes = raw_content
+    def __init__(self, raw_content: Union[bytes, memoryview], engine: Optional[Union[AsyncAHK[Any], AHK[Any]]] = None):
+        # may be a view into the transport's receive buffer; it is only copied if ``_raw_content`` is accessed
+        self._content: Union[bytes, memoryview] = raw_content
         self._engine: Optional[Union[AsyncAHK[Any], AHK[Any]]] = engine
 
+    @property
+    def _raw_content(self) -> bytes:
+        if isinstance(self._content, memoryview):
+            self._content = self._content.tobytes()
+        return self._content
+
+    @_raw_content.setter
+    def _raw_content(self, value: Union[bytes, memoryview]) -> None:
+        self._content = value
+
+    def _lazy_lists(self) -> bool:
+        """
+        Whether list responses should be unpacked as a :py:class:`LazyList` (see the ``lazy_lists`` engine option)
+        """
+        return self._engine is not None and self._engine._lazy_lists
+
+    def _decode(self) -> str:
+        """
+        Decode the message content as UTF-8 without first copying it out of the receive buffer
+        """
+        return str(self._content, encoding='utf-8')
+
     def __repr__(self) -> str:
         return f'ResponseMessage<fqn={self.fqn()!r}>'
 
@@ -133,9 +402,19 @@ class ResponseMessage:
         klass = cls._tom_lookup(tom)
         return klass(raw_content=message_bytes, engine=engine)
 
-    def to_bytes(self) -> bytes:
-        content_lines = self._raw_content.count(b'\n')
-        return self._type_order_mark + b'\n' + bytes(str(content_lines), 'ascii') + b'\n' + self._raw_content
+    @classmethod
+    def from_frame(
+        cls: Type[T_ResponseMessageType], frame: ResponseFrame, engine: Optional[Union[AsyncAHK[Any], AHK[Any]]] = None
+    ) -> 'ResponseMessageTypes':
+        klass = cls._tom_lookup(frame.tom)
+        return klass(raw_content=frame.payload, engine=engine)
+
+    def to_bytes(self, length_prefixed: bool = False) -> bytes:
+        if length_prefixed:
+            size_line = LENGTH_PREFIX + bytes(str(len(self._raw_content)), 'ascii')
+        else:
+            size_line = bytes(str(self._raw_content.count(b'\n')), 'ascii')
+        return self._type_order_mark + b'\n' + size_line + b'\n' + self._raw_content
 
     @abstractmethod
     def unpack(self) -> Any:
@@ -147,25 +426,22 @@ _message_registry: dict[bytes, 'ResponseMessageClassTypes'] = {}
 
 class TupleResponseMessage(ResponseMessage):
     def unpack(self) -> Tuple[Any, ...]:
-        s = self._raw_content.decode(encoding='utf-8')
-        val = ast.literal_eval(s)
-        assert isinstance(val, tuple)
-        return val
+        s = self._decode()
+        return parse_tuple(s)
 
 
 class CoordinateResponseMessage(ResponseMessage):
     def unpack(self) -> Coordinates:
-        s = self._raw_content.decode(encoding='utf-8')
-        val = ast.literal_eval(s)
-        assert isinstance(val, tuple)
+        s = self._decode()
+        val = parse_tuple(s)
         x, y = cast(Tuple[int, int], val)
         return Coordinates(x, y)
 
 
 class IntegerResponseMessage(ResponseMessage):
     def unpack(self) -> int:
-        s = self._raw_content.decode(encoding='utf-8')
-        val = ast.literal_eval(s)
+        s = self._decode()
+        val = parse_number(s)
         assert isinstance(val, int)
         return val
 
@@ -179,17 +455,25 @@ class BooleanResponseMessage(IntegerResponseMessage):
 
 class StringResponseMessage(ResponseMessage):
     def unpack(self) -> str:
-        return self._raw_content.decode('utf-8')
+        return self._decode()
 
 
 class WindowListResponseMessage(ResponseMessage):
-    def unpack(self) -> Union[List[Window], List[AsyncWindow]]:
+    def unpack(self) -> Union[List[Window], List[AsyncWindow], WindowIdArray[Window], WindowIdArray[AsyncWindow]]:
         from ._async.engine import AsyncAHK
         from ._async.window import AsyncWindow
         from ._sync.window import Window
         from ._sync.engine import AHK
 
-        s = self._raw_content.decode(encoding='utf-8')
+        if self._lazy_lists():
+            if isinstance(self._engine, AsyncAHK):
+                return WindowIdArray.from_window_list(self._raw_content, partial(AsyncWindow, self._engine))
+            elif isinstance(self._engine, AHK):
+                return WindowIdArray.from_window_list(self._raw_content, partial(Window, self._engine))
+            else:
+                raise ValueError(f'Invalid engine: {self._engine!r}')
+
+        s = self._decode()
         s = s.rstrip(',')
         window_ids = s.split(',')
         if isinstance(self._engine, AsyncAHK):
@@ -204,7 +488,7 @@ class WindowListResponseMessage(ResponseMessage):
 
 class NoValueResponseMessage(ResponseMessage):
     def unpack(self) -> None:
-        assert self._raw_content == b'\xee\x80\x80', f'Unexpected or Malformed response: {self._raw_content!r}'
+        assert self._content == b'\xee\x80\x80', f'Unexpected or Malformed response: {self._raw_content!r}'
         return None
 
 
@@ -212,20 +496,44 @@ class ExceptionResponseMessage(ResponseMessage):
     _exception_type: Type[Exception] = AHKExecutionException
 
     def unpack(self) -> NoReturn:
-        s = self._raw_content.decode(encoding='utf-8')
+        s = self._decode()
         raise self._exception_type(s)
 
 
 class WindowControlListResponseMessage(ResponseMessage):
-    def unpack(self) -> Union[List[AsyncControl], List[Control]]:
+    def unpack(
+        self,
+    ) -> Union[List[AsyncControl], List[Control], LazyList[AsyncControl], LazyList[Control]]:
         from ._async.engine import AsyncAHK
         from ._async.window import AsyncWindow, AsyncControl
         from ._sync.window import Window, Control
         from ._sync.engine import AHK
 
-        s = self._raw_content.decode(encoding='utf-8')
-        val = ast.literal_eval(s)
-        assert is_window_control_list_response(val)
+        if self._lazy_lists():
+            raw_content = self._raw_content
+            engine = self._engine
+
+            def load_controls() -> List[Tuple[Union[AsyncWindow, Window], str, str]]:
+                ahkid, control_list = parse_window_control_list(raw_content.decode(encoding='utf-8'))
+                window: Union[AsyncWindow, Window]
+                if isinstance(engine, AsyncAHK):
+                    window = AsyncWindow(engine=engine, ahk_id=ahkid)
+                else:
+                    assert isinstance(engine, AHK)
+                    window = Window(engine=engine, ahk_id=ahkid)
+                return [(window, hwnd, classname) for hwnd, classname in control_list]
+
+            if isinstance(engine, AsyncAHK):
+                return LazyList(
+                    load_controls, lambda key: AsyncControl(window=key[0], hwnd=key[1], control_class=key[2])
+                )
+            elif isinstance(engine, AHK):
+                return LazyList(load_controls, lambda key: Control(window=key[0], hwnd=key[1], control_class=key[2]))
+            else:
+                raise ValueError(f'Invalid engine: {engine!r}')
+
+        s = self._decode()
+        val = parse_window_control_list(s)
         assert self._engine is not None
         assert val is not None
         ahkid, controls = val
@@ -256,7 +564,7 @@ class WindowResponseMessage(ResponseMessage):
         from ._sync.window import Window
         from ._sync.engine import AHK
 
-        s = self._raw_content.decode(encoding='utf-8')
+        s = self._decode()
         ahk_id = s.strip()
         if isinstance(self._engine, AsyncAHK):
             async_ret = AsyncWindow(engine=self._engine, ahk_id=ahk_id)
@@ -279,8 +587,8 @@ class PositionResponseMessage(TupleResponseMessage):
 
 class FloatResponseMessage(ResponseMessage):
     def unpack(self) -> float:
-        s = self._raw_content.decode(encoding='utf-8')
-        val = ast.literal_eval(s)
+        s = self._decode()
+        val = parse_number(s)
         assert isinstance(val, float)
         return val
 
@@ -291,23 +599,363 @@ class TimeoutResponseMessage(ExceptionResponseMessage):
 
 class B64BinaryResponseMessage(ResponseMessage):
     def unpack(self) -> bytes:
-        b64_content = self._raw_content
+        b64_content = self._content
         b = base64.b64decode(b64_content)
         return b
 
 
+class BatchResponseMessage(ResponseMessage):
+    """
+    A response containing the framed responses for each call of a :py:class:`BatchRequestMessage`, in order.
+    """
+
+    def messages(self) -> List['ResponseMessageTypes']:
+        ret: List[ResponseMessageTypes] = []
+        frames = ResponseBuffer(self._raw_content)
+        while frames:
+            try:
+                frame = frames.next_frame()
+            except ValueError as e:
+                raise ValueError(f'Malformed batch response: {frames.unconsumed()!r}') from e
+            if frame is None:
+                raise ValueError(f'Truncated batch response: {frames.unconsumed()!r}')
+            ret.append(ResponseMessage.from_frame(frame, engine=self._engine))
+        return ret
+
+    def unpack(self) -> List[Any]:
+        """
+        Unpack each response in the batch. Exceptions from individual calls are returned in place of
+        their results, rather than raised.
+        """
+        ret: List[Any] = []
+        for message in self.messages():
+            try:
+                ret.append(message.unpack())
+            except Exception as e:
+                ret.append(e)
+        return ret
+
+
 T_RequestMessageType = TypeVar('T_RequestMessageType', bound='RequestMessage')
 
+# starts a line carrying a chunk of an argument that is uploaded ahead of its request (see RequestMessage.format_chunked)
+UPLOAD_PREFIX = b'+'
+
+# arguments longer than this many characters are uploaded in chunks of this size, if the daemon supports it
+DEFAULT_UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# functions whose first argument is binary data given as base64, which the daemon gets as the decoded bytes when uploaded
+BASE64_ARGUMENT_FUNCTIONS = frozenset({'AHKSetClipboardAll'})
+
 
 class RequestMessage:
-    def __init__(self, function_name: str, args: Optional[List[str]] = None):
+    def __init__(self, function_name: str, args: Optional[List[str]] = None, request_id: Optional[int] = None):
         self.function_name: str = function_name
         self.args: List[str] = args or []
+        self.request_id: Optional[int] = request_id
+
+    def _format_query(self, placeholders: Optional[Dict[Tuple[int, int], bytes]] = None) -> bytes:
+        def format_arg(index: int, arg: str) -> bytes:
+            if placeholders:
+                placeholder = placeholders.get((id(self), index))
+                if placeholder is not None:
+                    return placeholder
+            return b64encode(bytes(arg, 'UTF-8'))
+
+        arg_binary = b'|'.join(format_arg(index, arg) for index, arg in enumerate(self.args))
+        return bytes(self.function_name, 'UTF-8') + b'|' + arg_binary
+
+    def _format_line(self, placeholders: Optional[Dict[Tuple[int, int], bytes]] = None) -> bytes:
+        ret = self._format_query(placeholders) + b'\n'
+        if self.request_id is not None:
+            # the daemon echoes this header back as the first line of the response
+            ret = b'#' + bytes(str(self.request_id), 'ascii') + b'|' + ret
+        return ret
 
     def format(self) -> bytes:
-        arg_binary = b'|'.join(b64encode(bytes(arg, 'UTF-8')) for arg in self.args)
-        ret = bytes(self.function_name, 'UTF-8') + b'|' + arg_binary + b'\n'
-        return ret
+        return self._format_line()
+
+    def _calls(self) -> List[RequestMessage]:
+        return [self]
+
+    def format_chunked(self, chunk_size: int, upload_ids: Iterator[int]) -> Iterator[bytes]:
+        """
+        Format the request for a daemon that supports the ``'chunked-args'`` protocol feature: each argument longer
+        than ``chunk_size`` characters is uploaded ahead of the request in upload lines (``+<upload id>|<base64>``) of
+        at most ``chunk_size`` characters of the argument each, which the daemon assembles. The request then refers to
+        the argument as ``@<upload id>``, or as ``&<upload id>`` for binary data (see ``BASE64_ARGUMENT_FUNCTIONS``),
+        so that neither side has to hold the whole argument in a single line.
+
+        Yields the upload lines, then the request line.
+        """
+        placeholders: Dict[Tuple[int, int], bytes] = {}
+        for call in self._calls():
+            for index, arg in enumerate(call.args):
+                if len(arg) <= chunk_size:
+                    continue
+                upload_id = bytes(str(next(upload_ids)), 'ascii')
+                prefix = UPLOAD_PREFIX + upload_id + b'|'
+                if index == 0 and call.function_name in BASE64_ARGUMENT_FUNCTIONS:
+                    # already base64: uploaded as is, in slices that decode on their own
+                    step = max(chunk_size - chunk_size % 4, 4)
+                    for start in range(0, len(arg), step):
+                        end = start + step
+                        yield prefix + bytes(arg[start:end], 'ascii') + b'\n'
+                    placeholders[(id(call), index)] = b'&' + upload_id
+                else:
+                    for start in range(0, len(arg), chunk_size):
+                        end = start + chunk_size
+                        yield prefix + b64encode(bytes(arg[start:end], 'UTF-8')) + b'\n'
+                    placeholders[(id(call), index)] = b'@' + upload_id
+        yield self._format_line(placeholders)
+
+
+class BatchRequestMessage(RequestMessage):
+    """
+    Several function calls sent to the daemon as one request. The daemon dispatches each call in order and
+    answers with a single :py:class:`BatchResponseMessage`.
+    """
+
+    def __init__(self, requests: List[RequestMessage], request_id: Optional[int] = None):
+        super().__init__(function_name='', request_id=request_id)
+        self.requests: List[RequestMessage] = requests
+
+    def _format_query(self, placeholders: Optional[Dict[Tuple[int, int], bytes]] = None) -> bytes:
+        return b'*' + b'\t'.join(request._format_query(placeholders) for request in self.requests)
+
+    def _calls(self) -> List[RequestMessage]:
+        return self.requests
+
+
+def _parse_arg(arg: bytes, uploads: Optional[Dict[bytes, List[bytes]]]) -> str:
+    if arg[:1] in (b'@', b'&') and uploads is not None:
+        # uploaded ahead of the request (see RequestMessage.format_chunked)
+        chunks = uploads.pop(arg[1:], None)
+        if chunks is None:
+            raise ValueError(f'No upload {arg[1:]!r}')
+        if arg[:1] == b'&':
+            return str(b''.join(chunks), 'ascii')  # slices of the base64 argument
+        return str(b''.join(base64.b64decode(chunk, validate=True) for chunk in chunks), 'UTF-8')
+    return str(base64.b64decode(arg, validate=True), 'UTF-8')
+
+
+def _parse_query(query: bytes, uploads: Optional[Dict[bytes, List[bytes]]]) -> RequestMessage:
+    function_name, *encoded_args = query.split(b'|')
+    if encoded_args == [b'']:
+        encoded_args = []  # formatted the same as a single empty argument
+    args = [_parse_arg(arg, uploads) for arg in encoded_args]
+    return RequestMessage(function_name=str(function_name, 'UTF-8'), args=args)
+
+
+def parse_upload(line: bytes) -> Tuple[bytes, bytes]:
+    """
+    Parse an upload line as written by :py:meth:`RequestMessage.format_chunked`. Returns the upload ID and the chunk.
+
+    Raises ``ValueError`` if the line is not an upload line.
+    """
+    if not line.startswith(UPLOAD_PREFIX):
+        raise ValueError(f'Not an upload line: {line[:20]!r}')
+    upload_id, separator, chunk = line[1:].rstrip(b'\n').partition(b'|')
+    if not separator or not upload_id.isdigit():
+        raise ValueError(f'Malformed upload line: {line[:20]!r}')
+    return upload_id, chunk
+
+
+def parse_request(line: bytes, uploads: Optional[Dict[bytes, List[bytes]]] = None) -> RequestMessage:
+    """
+    Parse a request as written to the daemon by :py:meth:`RequestMessage.format`, e.g., as received by the broker.
+    Formatting the parsed request again gives back the same bytes.
+
+    With ``uploads``, the chunks of uploaded arguments by upload ID (see :py:func:`parse_upload`), arguments that
+    refer to an upload are replaced by the uploaded argument, which is removed from ``uploads``. The request then
+    formats as if the argument had been sent inline.
+
+    Raises ``ValueError`` if the line is not a formatted request.
+    """
+    if line.endswith(b'\n'):
+        line = line[:-1]
+    request_id = None
+    if line.startswith(b'#'):
+        header, _, line = line.partition(b'|')
+        request_id = int(header[1:])
+    if line.startswith(b'*'):
+        queries = line[1:].split(b'\t')
+        return BatchRequestMessage([_parse_query(query, uploads) for query in queries], request_id=request_id)
+    request = _parse_query(line, uploads)
+    request.request_id = request_id
+    return request
+
+
+def parse_request_id_line(line: bytes) -> Optional[int]:
+    """
+    Parse the correlation header line (``#<id>``) that precedes responses to requests made with a ``request_id``.
+    Returns ``None`` if the line is not a correlation header.
+    """
+    if not line.startswith(b'#'):
+        return None
+    try:
+        return int(line[1:])
+    except ValueError:
+        return None
+
+
+def parse_length_line(line: bytes) -> Optional[int]:
+    """
+    Parse the size line that follows the TOM of a length-prefixed response (``=<bytes>``).
+    Returns ``None`` if the response is framed by newline count instead.
+    """
+    if not line.startswith(LENGTH_PREFIX):
+        return None
+    return int(line[1:])
+
+
+# version of the daemon protocol spoken by this client, sent to the daemon with ``AHKProtocolHello``
+PROTOCOL_VERSION = 1
+
+
+class DaemonProtocol(NamedTuple):
+    """
+    The protocol version and optional protocol features (e.g., ``'batch'``, ``'length-framing'``, ``'request-ids'``)
+    a daemon announces in its answer to ``AHKProtocolHello``
+    """
+
+    version: int
+    features: FrozenSet[str]
+
+    @classmethod
+    def from_hello(cls, hello: str) -> DaemonProtocol:
+        """
+        Parse a hello announcement: the protocol version on the first line, followed by one feature per line.
+        Features this client does not know about are kept, but never used.
+        """
+        version, *features = hello.splitlines()
+        return cls(version=int(version), features=frozenset(feature.strip() for feature in features if feature.strip()))
+
+
+# daemons that predate the handshake only understand plain, newline-count framed requests
+LEGACY_PROTOCOL = DaemonProtocol(version=0, features=frozenset())
+
+
+class ResponseFrame(NamedTuple):
+    """
+    One framed response parsed out of a :py:class:`ResponseBuffer`
+    """
+
+    request_id: Optional[int]
+    tom: bytes
+    length_prefixed: bool
+    payload: memoryview
+
+
+class ResponseBuffer:
+    """
+    Receive buffer for the framed responses written by the daemon.
+
+    Data is appended with :py:meth:`feed` as it is read and complete responses are parsed in place by
+    :py:meth:`next_frame`. The payload of each frame is a view into the buffer rather than a copy, so reading a
+    response does not copy its content until a message decodes it.
+    """
+
+    def __init__(self, data: bytes = b''):
+        self._buffer: Union[bytes, bytearray] = data
+        self._start = 0  # start of the first frame that has not been consumed yet
+        # progress through the payload of a partially received line-framed response, so that it is not scanned
+        # again from the beginning each time more data arrives: (newlines found, offset of the last one, offset scanned)
+        self._line_scan: Tuple[int, int, int] = (0, 0, 0)
+
+    def __bool__(self) -> bool:
+        return self._start < len(self._buffer)
+
+    def unconsumed(self) -> bytes:
+        start = self._start
+        return bytes(self._buffer[start:])
+
+    def feed(self, data: bytes) -> None:
+        buffer = self._buffer
+        try:
+            if not isinstance(buffer, bytearray):
+                raise BufferError('buffer is not writable')
+            if self._start:
+                del buffer[: self._start]
+            buffer += data
+        except BufferError:
+            # payloads of frames returned earlier are still in use. Leave them intact and continue in a new buffer.
+            start = self._start
+            new_buffer = bytearray(buffer[start:])
+            new_buffer += data
+            self._buffer = new_buffer
+        self._start = 0
+
+    def discard_until(self, marker: bytes) -> bool:
+        """
+        Discard buffered data up to (but not including) the first occurrence of ``marker``, to skip past unframed
+        output to a known point in the stream.
+
+        Returns ``False`` if the marker has not been received yet. Only the data that could be the beginning of the
+        marker is kept in that case.
+        """
+        self._line_scan = (0, 0, 0)
+        position = self._buffer.find(marker, self._start)
+        if position == -1:
+            self._start = max(self._start, len(self._buffer) - len(marker) + 1)
+            return False
+        self._start = position
+        return True
+
+    def next_frame(self) -> Optional[ResponseFrame]:
+        """
+        Parse the next complete response in the buffer and consume it.
+
+        Returns ``None`` if the buffer does not contain a complete response yet.
+        Raises ``ValueError`` if the buffered data is not a framed response.
+        """
+        buffer = self._buffer
+        start = self._start
+        line_end = buffer.find(b'\n', start)
+        if line_end == -1:
+            return None
+        request_id = parse_request_id_line(bytes(buffer[start:line_end])) if buffer[start] == 0x23 else None  # '#'
+        tom_start = start
+        if request_id is not None:
+            tom_start = line_end + 1
+            line_end = buffer.find(b'\n', tom_start)
+            if line_end == -1:
+                return None
+        size_start = line_end + 1
+        size_end = buffer.find(b'\n', size_start)
+        if size_end == -1:
+            return None
+        size_line = bytes(buffer[size_start:size_end])
+        num_bytes = parse_length_line(size_line)
+        payload_start = size_end + 1
+        if num_bytes is not None:
+            payload_end = payload_start + num_bytes
+            if len(buffer) <= payload_end:  # the payload is followed by a newline
+                return None
+            if buffer[payload_end] != 0x0A:  # '\n'
+                raise ValueError(f'Response payload of declared length {num_bytes} is not followed by a newline')
+        else:
+            # the payload is followed by one more newline than it contains
+            lines_remaining = int(size_line) + 1
+            found, last_newline, scanned = self._line_scan
+            payload_end = start + last_newline if found else size_end
+            search_from = max(payload_end + 1, start + scanned)
+            while found < lines_remaining:
+                newline = buffer.find(b'\n', search_from)
+                if newline == -1:
+                    self._line_scan = (found, payload_end - start, len(buffer) - start)
+                    return None
+                payload_end = newline
+                search_from = newline + 1
+                found += 1
+            self._line_scan = (0, 0, 0)
+        self._start = payload_end + 1
+        return ResponseFrame(
+            request_id=request_id,
+            tom=bytes(buffer[tom_start:line_end]),
+            length_prefixed=num_bytes is not None,
+            payload=memoryview(buffer)[payload_start:payload_end],
+        )
 
 
 ResponseMessageTypes = Union[
@@ -322,6 +970,7 @@ ResponseMessageTypes = Union[
     WindowControlListResponseMessage,
     ExceptionResponseMessage,
     PositionResponseMessage,
+    BatchResponseMessage,
 ]
 ResponseMessageClassTypes = Union[
     Type[PositionResponseMessage],
@@ -334,6 +983,7 @@ ResponseMessageClassTypes = Union[
     Type[NoValueResponseMessage],
     Type[WindowControlListResponseMessage],
     Type[ExceptionResponseMessage],
+    Type[BatchResponseMessage],
     Type[ResponseMessage],
 ]
 if TYPE_CHECKING:
@@ -10,7 +10,14 @@ build_py = unasync.cmdclass_build_py(
                 'AsyncTransport': 'Transport',
                 'AsyncWindow': 'Window',
                 'AsyncControl': 'Control',
+                'AsyncBatch': 'Batch',
                 'AsyncDaemonProcessTransport': 'DaemonProcessTransport',
+                'AsyncDaemonPoolTransport': 'DaemonPoolTransport',
+                'AsyncIOThreadTransport': 'IOThreadTransport',
+                'AsyncDaemonSocketTransport': 'DaemonSocketTransport',
+                'AsyncBrokerTransport': 'BrokerTransport',
+                'AsyncRingBufferTransport': 'RingBufferTransport',
+                'AsyncSharedDaemonTransport': 'SharedDaemonTransport',
                 '_AIOP': '_SIOP',
                 'async_create_process': 'sync_create_process',
                 'adrain_stdin': 'drain_stdin',
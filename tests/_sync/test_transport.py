@@ -0,0 +1,1471 @@
+import asyncio
+import contextlib
+import contextvars
+import hashlib
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any
+from typing import Callable
+from typing import List
+from unittest import TestCase
+from unittest import mock
+
+import pytest
+
+from ahk import AHK
+from ahk import Window
+from ahk._cache import ReadCache
+from ahk._io_thread import DaemonIOThread
+from ahk._sync.transport import BrokerTransport
+from ahk._sync.transport import DaemonPoolTransport
+from ahk._sync.transport import DaemonProcessTransport
+from ahk._sync.transport import DaemonSocketTransport
+from ahk._sync.transport import IOThreadTransport
+from ahk._sync.transport import RingBufferTransport
+from ahk._sync.transport import SharedDaemonTransport
+from ahk._sync.transport import SyncAHKProcess
+from ahk.exceptions import AHKCallTimeoutError
+from ahk.exceptions import AHKDeferredCallError
+from ahk.exceptions import AHKExecutionException
+from ahk.exceptions import AHKFailoverError
+from ahk.exceptions import AHKProcessExitedError
+from ahk.exceptions import AHKProtocolError
+from ahk.extensions import Extension
+from ahk.message import DaemonProtocol
+from ahk.message import LazyList
+from ahk.message import LEGACY_PROTOCOL
+from ahk.message import RequestMessage
+from ahk.message import ResponseMessage
+from ahk.message import WindowIdArray
+
+STANDIN_DAEMON = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'standin_daemon.py')
+STANDIN_BROKER = os.path.join(os.path.dirname(STANDIN_DAEMON), 'standin_broker.py')
+
+
+class StandinDaemonTransport(DaemonProcessTransport):
+    """
+    Daemon transport that runs the Python stand-in daemon instead of AutoHotkey
+    """
+
+    daemon_args: List[str] = []
+
+    def _create_process(self, template: Any = None, **template_kwargs: Any) -> SyncAHKProcess:
+        return SyncAHKProcess(runargs=[sys.executable, STANDIN_DAEMON, *self.daemon_args])
+
+
+def make_engine(
+    *, TransportClass: Any = None, lazy_lists: bool = False, read_cache: Any = False, **transport_options: Any
+) -> AHK:
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # version detection and the executable check do not apply to the stand-in
+        return AHK(
+            executable_path=sys.executable,
+            TransportClass=TransportClass or StandinDaemonTransport,
+            transport_options=transport_options,
+            lazy_lists=lazy_lists,
+            read_cache=read_cache,
+        )
+
+
+def gather(calls: List[Callable[[], Any]]) -> List[Any]:
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        return list(pool.map(lambda call: call(), calls))
+
+
+class TestPipelinedTransport(TestCase):
+    def setUp(self) -> None:
+        self.transport = StandinDaemonTransport(executable_path=sys.executable, pipelined=True)
+        self.transport.init()
+
+    def tearDown(self) -> None:
+        self.transport._proc.kill()
+        self.transport._proc._proc.wait()
+
+    def test_pipelined_call(self):
+        assert self.transport.function_call('AHKEcho', ['hello']) == 'hello'
+
+    def test_many_calls_in_flight(self):
+        calls = [partial(self.transport.function_call, 'AHKEcho', [str(i)]) for i in range(50)]
+        results = gather(calls)
+        assert results == [str(i) for i in range(50)]
+        assert self.transport._pending == {}
+
+    def test_mixed_calls_resolve_to_their_own_callers(self):
+        calls = [
+            partial(self.transport.function_call, 'StandinSleep', ['0.2', 'slow']),
+            partial(self.transport.function_call, 'AHKWinGetTitle', ['0x1']),
+        ]
+        assert gather(calls) == ['slow', 'title of 0x1']
+
+    def test_error_is_delivered_to_its_caller(self):
+        calls = [
+            partial(self.transport.function_call, 'StandinFail', ['boom']),
+            partial(self.transport.function_call, 'AHKEcho', ['fine']),
+        ]
+        with pytest.raises(AHKExecutionException, match='boom'):
+            gather(calls)
+        assert self.transport.function_call('AHKEcho', ['still fine']) == 'still fine'
+
+
+    def test_late_responses_are_discarded(self):
+        proc = self.transport._proc
+        # a request that nobody waits for any more, answered while another call is in flight
+        abandoned = RequestMessage('StandinSleep', ['0.1', 'late'], request_id=next(self.transport._request_ids))
+        proc.write(abandoned.format())
+        assert self.transport.function_call('StandinSleep', ['0.2', 'on time']) == 'on time'
+        assert self.transport._pending == {}
+
+    def test_pipelined_batches(self):
+        calls = [
+            partial(self.transport.function_call_many, [('AHKEcho', [f'{i}-{j}']) for j in range(5)]) for i in range(10)
+        ]
+        results = gather(calls)
+        assert results == [[f'{i}-{j}' for j in range(5)] for i in range(10)]
+
+
+class TestLockStepTransport(TestCase):
+    def setUp(self) -> None:
+        self.transport = StandinDaemonTransport(executable_path=sys.executable)
+        self.transport.init()
+
+    def tearDown(self) -> None:
+        self.transport._proc.kill()
+        self.transport._proc._proc.wait()
+
+    def test_lock_step_calls(self):
+        calls = [partial(self.transport.function_call, 'AHKEcho', [str(i)]) for i in range(10)]
+        assert gather(calls) == [str(i) for i in range(10)]
+
+
+class TestBatch(TestCase):
+    def setUp(self) -> None:
+        self.ahk = make_engine()
+
+    def tearDown(self) -> None:
+        self.ahk._transport._proc.kill()
+        self.ahk._transport._proc._proc.wait()
+
+    def test_function_call_many(self):
+        calls = [('AHKWinGetTitle', [f'0x{i:x}']) for i in range(500)]
+        results = self.ahk.function_call_many(calls)
+        assert results == [f'title of 0x{i:x}' for i in range(500)]
+
+    def test_function_call_many_exceptions(self):
+        calls = [('AHKEcho', ['one']), ('StandinFail', ['boom']), ('AHKEcho', ['three'])]
+        with pytest.raises(AHKExecutionException, match='boom'):
+            self.ahk.function_call_many(calls)
+        one, error, three = self.ahk.function_call_many(calls, return_exceptions=True)
+        assert (one, three) == ('one', 'three')
+        assert isinstance(error, AHKExecutionException)
+
+    def test_batch_context(self):
+        with self.ahk.batch() as batch:
+            first = batch.function_call('AHKEcho', ['first'])
+            failed = batch.function_call('StandinFail', ['boom'])
+            title = batch.function_call('AHKWinGetTitle', ['0x1'])
+            assert not first.done()
+        assert first.result() == 'first'
+        assert title.result() == 'title of 0x1'
+        with pytest.raises(AHKExecutionException, match='boom'):
+            failed.result()
+
+
+class StandinDaemonPoolTransport(DaemonPoolTransport):
+    def _create_process(self, template: Any = None, **template_kwargs: Any) -> SyncAHKProcess:
+        return SyncAHKProcess(runargs=[sys.executable, STANDIN_DAEMON])
+
+
+class TestDaemonPoolTransport(TestCase):
+    def setUp(self) -> None:
+        self.transport = StandinDaemonPoolTransport(executable_path=sys.executable, pool_size=4)
+        self.transport.init()
+        for proc in self.transport._members:  # wait for every stand-in to finish starting up
+            self.transport._request(proc, RequestMessage('AHKEcho', ['ready']))
+
+    def tearDown(self) -> None:
+        for proc in self.transport._members:
+            proc.kill()
+            proc._proc.wait()
+
+    def test_slow_calls_run_concurrently(self):
+        calls = [partial(self.transport.function_call, 'StandinSleep', ['0.5', str(i)]) for i in range(4)]
+        start = time.perf_counter()
+        assert gather(calls) == ['0', '1', '2', '3']
+        # serialized on one daemon, these would take at least 2 seconds
+        assert time.perf_counter() - start < 1.5
+
+    def test_session_settings_applied_to_every_daemon(self):
+        self.transport.function_call('AHKSetCoordMode', ['Mouse', 'Client'])
+        calls = [partial(self.transport.function_call, 'StandinState') for _ in range(4)]
+        results = gather(calls)
+        pids = {result.split(':')[0] for result in results}
+        assert len(pids) == 4
+        assert all(result.endswith(':Client') for result in results)
+
+    def test_member_failing_a_session_setting_is_replaced(self):
+        dead = self.transport._members[2]
+        dead.kill()
+        dead._proc.wait()
+        self.transport.function_call('AHKSetCoordMode', ['Mouse', 'Client'])
+        assert dead not in self.transport._members
+        calls = [partial(self.transport.function_call, 'StandinState') for _ in range(4)]
+        results = gather(calls)
+        assert len({result.split(':')[0] for result in results}) == 4
+        assert all(result.endswith(':Client') for result in results)
+
+
+    def test_pool_size_must_be_positive(self):
+        with pytest.raises(ValueError):
+            StandinDaemonPoolTransport(executable_path=sys.executable, pool_size=0)
+
+
+class TestNonblockingPool(TestCase):
+    def setUp(self) -> None:
+        self.transports: List[StandinDaemonTransport] = []
+
+    def tearDown(self) -> None:
+        for transport in self.transports:
+            for proc in [transport._proc] + [proc for _, proc in transport._nonblocking_idle]:
+                proc.kill()
+                proc._proc.wait()
+
+    def make_transport(self, **kwargs: Any) -> StandinDaemonTransport:
+        transport = StandinDaemonTransport(executable_path=sys.executable, **kwargs)
+        transport.init()
+        self.transports.append(transport)
+        return transport
+
+    def nonblocking_call(self, transport: StandinDaemonTransport, function_name: str, args: Any = None) -> Any:
+        fut = transport.function_call(function_name, args, blocking=False)
+        return fut.result()
+
+    def test_pool_is_filled_on_start(self):
+        transport = self.make_transport(nonblocking_pool_min_size=2, nonblocking_pool_max_size=2)
+        assert len(transport._nonblocking_idle) == 2
+
+    def test_warm_daemon_is_reused(self):
+        transport = self.make_transport(nonblocking_pool_min_size=1, nonblocking_pool_max_size=2)
+        first = self.nonblocking_call(transport, 'StandinState')
+        second = self.nonblocking_call(transport, 'StandinState')
+        assert first == second
+
+    def test_daemon_is_recycled_after_session_setting(self):
+        transport = self.make_transport(nonblocking_pool_min_size=1, nonblocking_pool_max_size=2)
+        self.nonblocking_call(transport, 'AHKSetCoordMode', ['Mouse', 'Client'])
+        assert (self.nonblocking_call(transport, 'StandinState')).endswith(':Screen')
+
+    def test_daemon_is_recycled_after_tray_tip(self):
+        ahk = make_engine(nonblocking_pool_min_size=1, nonblocking_pool_max_size=2)
+        ahk._transport.init()
+        self.transports.append(ahk._transport)
+        before = self.nonblocking_call(ahk._transport, 'StandinState')
+        fut = ahk.show_traytip('title', 'text', blocking=False)
+        fut.result()
+        assert self.nonblocking_call(ahk._transport, 'StandinState') != before
+
+    def test_idle_daemons_expire(self):
+        transport = self.make_transport(nonblocking_pool_max_size=2, nonblocking_pool_idle_timeout=0)
+        first = self.nonblocking_call(transport, 'StandinState')
+        second = self.nonblocking_call(transport, 'StandinState')
+        assert first != second
+
+    def test_min_size_cannot_exceed_max_size(self):
+        with pytest.raises(ValueError):
+            StandinDaemonTransport(executable_path=sys.executable, nonblocking_pool_min_size=2)
+
+
+class TestLengthPrefixedFraming(TestCase):
+    def setUp(self) -> None:
+        self.transport = StandinDaemonTransport(executable_path=sys.executable, response_framing='length')
+        self.transport.init()
+
+    def tearDown(self) -> None:
+        self.transport._proc.kill()
+        self.transport._proc._proc.wait()
+
+    def test_response_is_read_by_length(self):
+        proc = self.transport._proc
+        proc.write(RequestMessage('AHKEcho', ['héllo\nwörld\n']).format())
+        proc.drain_stdin()
+        frame = self.transport._read_response(proc)
+        assert frame.length_prefixed
+        assert len(frame.payload) == len('héllo\nwörld\n'.encode('utf-8'))
+        assert ResponseMessage.from_frame(frame).unpack() == 'héllo\nwörld\n'
+
+    def test_multiline_response(self):
+        result = self.transport.function_call('StandinLines', ['5000'])
+        assert result.splitlines() == [f'line {i}' for i in range(5000)]
+
+    def test_batch_with_length_prefixed_framing(self):
+        calls = [('AHKEcho', ['one\ntwo']), ('StandinFail', ['boom']), ('StandinLines', ['3'])]
+        one, error, lines = self.transport.function_call_many(calls)
+        assert one == 'one\ntwo'
+        assert isinstance(error, AHKExecutionException)
+        assert lines == 'line 0\nline 1\nline 2'
+
+
+class LegacyStandinDaemonTransport(StandinDaemonTransport):
+    """
+    Stand-in daemon transport whose daemon does not support any protocol extensions
+    """
+
+    daemon_args = ['--legacy']
+
+
+class BatchOnlyStandinDaemonTransport(StandinDaemonTransport):
+    """
+    Stand-in daemon transport whose daemon announces batching as its only protocol feature
+    """
+
+    daemon_args = ['--features=batch']
+
+
+class TestLegacyDaemon(TestCase):
+    def tearDown(self) -> None:
+        self.transport._proc.kill()
+        self.transport._proc._proc.wait()
+
+    def test_falls_back_to_line_framing(self):
+        self.transport = LegacyStandinDaemonTransport(executable_path=sys.executable, response_framing='length')
+        self.transport.init()
+        assert self.transport.function_call('StandinLines', ['3']) == 'line 0\nline 1\nline 2'
+
+    def test_handshake_detects_legacy_daemon(self):
+        self.transport = LegacyStandinDaemonTransport(executable_path=sys.executable)
+        self.transport.init()
+        assert self.transport._protocol == LEGACY_PROTOCOL
+        assert self.transport.function_call('AHKEcho', ['hello']) == 'hello'
+
+    def test_pipelined_falls_back_to_lock_step(self):
+        self.transport = LegacyStandinDaemonTransport(executable_path=sys.executable, pipelined=True)
+        with pytest.warns(UserWarning, match='request IDs'):
+            self.transport.init()
+        assert not self.transport._pipelined
+        calls = [partial(self.transport.function_call, 'AHKEcho', [str(i)]) for i in range(10)]
+        assert gather(calls) == [str(i) for i in range(10)]
+
+    def test_function_call_many_without_batching(self):
+        self.transport = LegacyStandinDaemonTransport(executable_path=sys.executable)
+        self.transport.init()
+        one, error, two = self.transport.function_call_many(
+            [('AHKEcho', ['one']), ('StandinFail', ['boom']), ('AHKEcho', ['two'])]
+        )
+        assert (one, two) == ('one', 'two')
+        assert isinstance(error, AHKExecutionException)
+
+
+class TestProtocolHandshake(TestCase):
+    def tearDown(self) -> None:
+        self.transport._proc.kill()
+        self.transport._proc._proc.wait()
+
+    def read_echo_frame(self) -> Any:
+        proc = self.transport._proc
+        proc.write(RequestMessage('AHKEcho', ['hello']).format())
+        proc.drain_stdin()
+        return self.transport._read_response(proc)
+
+    def test_length_framing_is_chosen_when_supported(self):
+        self.transport = StandinDaemonTransport(executable_path=sys.executable)
+        self.transport.init()
+        assert self.transport._protocol == DaemonProtocol(
+            version=1, features=frozenset(['batch', 'length-framing', 'request-ids', 'chunked-args'])
+        )
+        assert (self.read_echo_frame()).length_prefixed
+
+    def test_line_framing_can_be_forced(self):
+        self.transport = StandinDaemonTransport(executable_path=sys.executable, response_framing='lines')
+        self.transport.init()
+        assert not (self.read_echo_frame()).length_prefixed
+
+    def test_only_announced_features_are_used(self):
+        self.transport = BatchOnlyStandinDaemonTransport(executable_path=sys.executable, pipelined=True)
+        with pytest.warns(UserWarning, match='request IDs'):
+            self.transport.init()
+        assert not (self.read_echo_frame()).length_prefixed
+        assert self.transport.function_call_many([('AHKEcho', ['a']), ('AHKEcho', ['b'])]) == ['a', 'b']
+
+
+class TestResync(TestCase):
+    def tearDown(self) -> None:
+        self.transport._proc.kill()
+        self.transport._proc._proc.wait()
+
+    def make_transport(self, **options: Any) -> None:
+        self.transport = StandinDaemonTransport(executable_path=sys.executable, **options)
+        self.transport.init()
+        self.transport.function_call('AHKSetCoordMode', ['Mouse', 'Client'])
+
+    def test_stale_response_is_skipped(self):
+        self.make_transport()
+        proc = self.transport._proc
+        # a response nobody waits for anymore, e.g. because its caller was cancelled
+        proc.write(RequestMessage('AHKEcho', ['stale'], request_id=1).format())
+        proc.drain_stdin()
+        assert self.transport.function_call('AHKEcho', ['fresh']) == 'fresh'
+
+    def test_unexpected_output_is_drained(self):
+        self.make_transport()
+        pid, _ = (self.transport.function_call('StandinState')).split(':')
+        with pytest.raises(AHKProtocolError, match='Unexpected data'):
+            self.transport.function_call('StandinGarbage')
+        assert self.transport.function_call('AHKEcho', ['hello']) == 'hello'
+        assert self.transport.function_call('StandinState') == f'{pid}:Client'
+
+    def test_unresponsive_daemon_is_restarted(self):
+        self.make_transport(resync_timeout=0.5)
+        pid, _ = (self.transport.function_call('StandinState')).split(':')
+        start = time.perf_counter()
+        with pytest.raises(AHKProtocolError):
+            self.transport.function_call('StandinGarbage', ['30'])
+        assert time.perf_counter() - start < 10
+        new_pid, coord_mode = (self.transport.function_call('StandinState')).split(':')
+        assert new_pid != pid
+        assert coord_mode == 'Client'  # session settings are replayed onto the new daemon
+
+    def test_exited_daemon_is_restarted(self):
+        self.make_transport()
+        with pytest.raises(AHKProcessExitedError):
+            self.transport.function_call('StandinExit')
+        assert (self.transport.function_call('StandinState')).endswith(':Client')
+
+    def test_pipelined_recovers_from_unexpected_output(self):
+        self.make_transport(pipelined=True)
+        with pytest.raises(AHKProtocolError):
+            self.transport.function_call('StandinGarbage')
+        assert self.transport.function_call('AHKEcho', ['hello']) == 'hello'
+        assert (self.transport.function_call('StandinState')).endswith(':Client')
+
+
+class TestDeadlines(TestCase):
+    def tearDown(self) -> None:
+        self.transport._proc.kill()
+        self.transport._proc._proc.wait()
+
+    def make_transport(self, transport_class: Any = StandinDaemonTransport, **options: Any) -> None:
+        self.transport = transport_class(executable_path=sys.executable, **options)
+        self.transport.init()
+        self.transport.function_call('AHKSetCoordMode', ['Mouse', 'Client'])
+
+    def test_stuck_daemon_is_replaced(self):
+        self.make_transport()
+        pid, _ = (self.transport.function_call('StandinState')).split(':')
+        start = time.perf_counter()
+        with pytest.raises(AHKCallTimeoutError):
+            self.transport.function_call('StandinSleep', ['30'], timeout=0.5)
+        assert time.perf_counter() - start < 10
+        new_pid, coord_mode = (self.transport.function_call('StandinState')).split(':')
+        assert new_pid != pid
+        assert coord_mode == 'Client'
+
+    def test_deadlines_do_not_start_a_thread_per_call(self):
+        self.make_transport(call_timeout=10)
+        self.transport.function_call('AHKEcho', ['warm up'])  # the watchdog thread, if any, is running now
+        threads = threading.active_count()
+        with mock.patch('threading.Timer', side_effect=AssertionError('timer thread started')):
+            for i in range(20):
+                assert self.transport.function_call('AHKEcho', [str(i)]) == str(i)
+        assert threading.active_count() == threads
+
+    def test_waiting_callers_resume(self):
+        self.make_transport()
+        stuck = partial(self.transport.function_call, 'StandinSleep', ['30'], timeout=0.5)
+        waiting = partial(self.transport.function_call, 'AHKEcho', ['hello'])
+
+        def call_stuck() -> Any:
+            try:
+                return stuck()
+            except AHKCallTimeoutError as e:
+                return e
+
+        start = time.perf_counter()
+        timed_out, result = gather([call_stuck, waiting])
+        assert isinstance(timed_out, AHKCallTimeoutError)
+        assert result == 'hello'
+        assert time.perf_counter() - start < 10
+
+    def test_timeout_waiting_for_busy_daemon(self):
+        self.make_transport()
+        slow = partial(self.transport.function_call, 'StandinSleep', ['1', 'done'])
+
+        def call_waiting() -> Any:
+            time.sleep(0.1)  # let the slow call go first
+            try:
+                return self.transport.function_call('AHKEcho', ['hello'], timeout=0.2)
+            except AHKCallTimeoutError as e:
+                return e
+
+        result, timed_out = gather([slow, call_waiting])
+        assert result == 'done'  # the daemon is not replaced when a call times out before reaching it
+        assert isinstance(timed_out, AHKCallTimeoutError)
+
+    def test_engine_deadline(self):
+        ahk = make_engine()
+        self.transport = ahk._transport
+        with ahk.deadline(0.5):
+            with pytest.raises(AHKCallTimeoutError):
+                ahk.function_call('StandinSleep', ['30'])
+        assert ahk.function_call('StandinSleep', ['0.6', 'ok']) == 'ok'  # no deadline outside of the block
+        assert ahk.function_call('AHKEcho', ['hello'], timeout=1) == 'hello'
+
+    def test_default_call_timeout(self):
+        self.make_transport(call_timeout=0.5)
+        with pytest.raises(AHKCallTimeoutError):
+            self.transport.function_call('StandinSleep', ['30'])
+        assert self.transport.function_call('AHKEcho', ['hello']) == 'hello'
+
+    def test_pipelined_daemon_is_replaced(self):
+        self.make_transport(pipelined=True)
+        with pytest.raises(AHKCallTimeoutError):
+            self.transport.function_call('StandinSleep', ['30'], timeout=0.5)
+        assert self.transport.function_call('AHKEcho', ['hello']) == 'hello'
+        assert (self.transport.function_call('StandinState')).endswith(':Client')
+
+    def test_pool_member_is_replaced(self):
+        self.transport = StandinDaemonPoolTransport(executable_path=sys.executable, pool_size=2)
+        self.transport.init()
+        with pytest.raises(AHKCallTimeoutError):
+            self.transport.function_call('StandinSleep', ['30'], timeout=0.5)
+        results = gather([partial(self.transport.function_call, 'StandinState') for _ in range(4)])
+        assert len(set(results)) == 2
+        for member in self.transport._members:
+            if member is not self.transport._proc:
+                member.kill()
+
+
+
+
+
+class TestSupervisor(TestCase):
+    def tearDown(self) -> None:
+        self.transport.stop()
+
+    def make_transport(self, transport_class: Any = StandinDaemonTransport, **options: Any) -> None:
+        self.transport = transport_class(executable_path=sys.executable, **options)
+        self.transport.init()
+        self.transport.function_call('AHKSetCoordMode', ['Mouse', 'Client'])
+
+    def wait_for(self, condition: Callable[[], Any], timeout: float = 10) -> None:
+        deadline = time.monotonic() + timeout
+        while not condition():
+            assert time.monotonic() < deadline, 'timed out waiting for the supervisor'
+            self.transport._sleep(0.05)
+
+    def test_failover_to_standby(self):
+        self.make_transport(standby=True)
+        self.wait_for(lambda: self.transport._standby is not None)
+        standby = self.transport._standby
+        with pytest.raises(AHKFailoverError):
+            self.transport.function_call('StandinExit')
+        assert self.transport._proc is standby
+        assert (self.transport.function_call('StandinState')).endswith(':Client')
+        self.wait_for(lambda: self.transport._standby is not None)  # a new standby is started
+        assert self.transport._standby is not standby
+
+    def test_daemon_that_died_while_idle_is_replaced(self):
+        self.make_transport()
+        proc = self.transport._proc
+        proc.kill()
+        proc._proc.wait()
+        assert (self.transport.function_call('StandinState')).endswith(':Client')
+        assert self.transport._proc is not proc
+
+    def test_supervisor_replaces_dead_daemon(self):
+        self.make_transport(standby=True, ping_interval=0.1)
+        proc = self.transport._proc
+        proc.kill()
+        self.wait_for(lambda: self.transport._proc is not proc)
+        assert (self.transport.function_call('StandinState')).endswith(':Client')
+
+    def test_supervisor_replaces_unresponsive_daemon(self):
+        self.make_transport(ping_interval=0.1, ping_timeout=0.3)
+        proc = self.transport._proc
+        # the daemon gets stuck without any call waiting for it
+        proc.write(RequestMessage('StandinSleep', ['30']).format())
+        proc.drain_stdin()
+        self.wait_for(lambda: self.transport._proc is not proc)
+        assert self.transport.function_call('AHKEcho', ['hello']) == 'hello'
+
+    def test_pipelined_failover(self):
+        self.make_transport(standby=True, pipelined=True)
+        with pytest.raises(AHKFailoverError):
+            self.transport.function_call('StandinExit')
+        assert (self.transport.function_call('StandinState')).endswith(':Client')
+
+    def test_pool_supervisor_replaces_dead_member(self):
+        self.make_transport(StandinDaemonPoolTransport, pool_size=2, ping_interval=0.1)
+        proc = self.transport._members[1]
+        proc.kill()
+        self.wait_for(lambda: proc not in self.transport._members)
+        results = gather([partial(self.transport.function_call, 'StandinState') for _ in range(4)])
+        assert all(result.endswith(':Client') for result in results)
+
+
+class TestCoalescing(TestCase):
+    def setUp(self) -> None:
+        self.transport = StandinDaemonTransport(executable_path=sys.executable, coalesce_reads=True)
+        self.transport.init()
+        self.pool = ThreadPoolExecutor(max_workers=8)
+
+    def tearDown(self) -> None:
+        self.pool.shutdown()
+        self.transport.stop()
+
+    def start(self, call: Callable[[], Any]) -> Any:
+        return self.pool.submit(call)
+
+    def run_in_order(self, calls: List[Callable[[], Any]]) -> List[Any]:
+        # each call is started while the calls before it are still waiting for the daemon
+        started = []
+        for call in calls:
+            started.append(self.start(call))
+            self.transport._sleep(0.02)
+        return [call.result() for call in started]
+
+    def call_count(self, function_name: str) -> int:
+        return int(self.transport.function_call('StandinCallCount', [function_name]))
+
+    def slow_call(self) -> Callable[[], Any]:
+        return partial(self.transport.function_call, 'StandinSleep', ['0.3', 'slow'])
+
+    def test_identical_reads_share_one_round_trip(self):
+        reads = [partial(self.transport.function_call, 'AHKWinGetTitle', ['0x1']) for _ in range(5)]
+        assert self.run_in_order([self.slow_call(), *reads]) == ['slow'] + ['title of 0x1'] * 5
+        assert self.call_count('AHKWinGetTitle') == 1
+
+    def test_reads_with_different_args_are_not_coalesced(self):
+        reads = [partial(self.transport.function_call, 'AHKWinGetTitle', [hwnd]) for hwnd in ('0x1', '0x2', '0x1')]
+        results = self.run_in_order([self.slow_call(), *reads])
+        assert results == ['slow', 'title of 0x1', 'title of 0x2', 'title of 0x1']
+        assert self.call_count('AHKWinGetTitle') == 2
+
+    def test_read_after_a_write_is_not_coalesced(self):
+        read = partial(self.transport.function_call, 'AHKGetCoordMode', ['Mouse'])
+        write = partial(self.transport.function_call, 'AHKSetCoordMode', ['Mouse', 'Client'])
+        results = self.run_in_order([self.slow_call(), read, write, read])
+        assert results == ['slow', 'Screen', None, 'Client']
+        assert self.call_count('AHKGetCoordMode') == 2
+
+    def test_error_is_shared(self):
+        def failing_read() -> Any:
+            try:
+                return self.transport.function_call('AHKWinGetTitle')
+            except AHKExecutionException as e:
+                return e
+
+        results = self.run_in_order([self.slow_call(), failing_read, failing_read])
+        assert all(isinstance(result, AHKExecutionException) for result in results[1:])
+        assert self.call_count('AHKWinGetTitle') == 1
+
+    def test_reads_are_not_coalesced_by_default(self):
+        self.transport._coalesce_reads = False
+        reads = [partial(self.transport.function_call, 'AHKWinGetTitle', ['0x1']) for _ in range(3)]
+        self.run_in_order([self.slow_call(), *reads])
+        assert self.call_count('AHKWinGetTitle') == 3
+
+
+
+class TestReadCache(TestCase):
+    def setUp(self) -> None:
+        self.ahk = make_engine(read_cache=True)
+
+    def tearDown(self) -> None:
+        self.ahk._transport.stop()
+
+    def call_count(self, function_name: str) -> int:
+        return int(self.ahk.function_call('StandinCallCount', [function_name]))
+
+    def test_repeated_reads_are_cached(self):
+        for _ in range(3):
+            assert self.ahk.win_get_title(title='ahk_id 0x1') == 'title of ahk_id 0x1'
+        assert self.call_count('AHKWinGetTitle') == 1
+        stats = self.ahk.read_cache.stats
+        assert (stats.hits, stats.misses) == (2, 1)
+
+    def test_change_to_a_window_invalidates_its_reads_only(self):
+        self.ahk.win_get_title(title='ahk_id 0x1')
+        self.ahk.win_get_title(title='ahk_id 0x2')
+        self.ahk.win_set_title('new title', title='ahk_id 0x1')
+        assert self.ahk.win_get_title(title='ahk_id 0x1') == 'new title'
+        assert self.ahk.win_get_title(title='ahk_id 0x2') == 'title of ahk_id 0x2'
+        assert self.call_count('AHKWinGetTitle') == 3
+        assert self.ahk.read_cache.stats.invalidations == 1
+
+    def test_change_to_windows_found_by_title_invalidates_all_windows(self):
+        self.ahk.win_get_title(title='ahk_id 0x1')
+        self.ahk.win_set_title('new title', title='Untitled - Notepad')
+        self.ahk.win_get_title(title='ahk_id 0x1')
+        assert self.call_count('AHKWinGetTitle') == 2
+
+    def test_pid_is_kept_until_the_window_is_closed(self):
+        assert self.ahk.win_get_pid(title='ahk_id 0x1') == 4242
+        self.ahk.win_set_title('new title', title='ahk_id 0x1')
+        self.ahk.win_get_pid(title='ahk_id 0x1')
+        assert self.call_count('AHKWinGetPID') == 1
+        self.ahk.win_close(title='ahk_id 0x1')
+        self.ahk.win_get_pid(title='ahk_id 0x1')
+        assert self.call_count('AHKWinGetPID') == 2
+
+    def test_setting_invalidates_its_reads(self):
+        assert self.ahk.get_coord_mode('Mouse') == 'Screen'
+        assert self.ahk.get_coord_mode('Mouse') == 'Screen'
+        self.ahk.set_coord_mode('Mouse', 'Client')
+        assert self.ahk.get_coord_mode('Mouse') == 'Client'
+        assert self.call_count('AHKGetCoordMode') == 2
+
+    def test_entries_expire(self):
+        self.ahk.read_cache.ttls['AHKWinGetTitle'] = 0.1
+        self.ahk.win_get_title(title='ahk_id 0x1')
+        time.sleep(0.2)
+        self.ahk.win_get_title(title='ahk_id 0x1')
+        assert self.call_count('AHKWinGetTitle') == 2
+
+    def test_only_configured_functions_are_cached(self):
+        self.ahk.read_cache.ttls.pop('AHKWinGetTitle')
+        self.ahk.win_get_title(title='ahk_id 0x1')
+        self.ahk.win_get_title(title='ahk_id 0x1')
+        assert self.call_count('AHKWinGetTitle') == 2
+
+    def test_functions_with_side_effects_cannot_be_cached(self):
+        with pytest.raises(ValueError, match='AHKWinSetTitle'):
+            ReadCache({'AHKWinSetTitle': 1.0})
+
+
+class TestDeferredAcks(TestCase):
+    def setUp(self) -> None:
+        self.errors: List[AHKDeferredCallError] = []
+        self.transport = StandinDaemonTransport(executable_path=sys.executable, ack='deferred')
+        self.transport.init()
+
+    def tearDown(self) -> None:
+        self.transport.stop()
+
+    def send(self, keys: str) -> Any:
+        return self.transport.function_call('AHKSend', [keys])
+
+    def test_deferred_call_returns_before_it_is_done(self):
+        start = time.monotonic()
+        assert self.send('slow') is None
+        assert time.monotonic() - start < 0.4
+        self.send('a')
+        assert self.transport.function_call('StandinSent') == 'slow,a'
+
+    def test_error_surfaces_on_next_call(self):
+        self.send('fail')
+        self.send('a')
+        with pytest.raises(AHKDeferredCallError, match='AHKSend') as exc_info:
+            self.transport.function_call('AHKEcho', ['hello'])
+        assert isinstance(exc_info.value.__cause__, AHKExecutionException)
+        # the error is only raised once, and the call that raised it was not made
+        assert self.transport.function_call('StandinCallCount', ['AHKEcho']) == '0'
+        assert self.transport.function_call('AHKEcho', ['hello']) == 'hello'
+
+    def test_errors_are_passed_to_callback(self):
+        self.transport._on_deferred_error = self.errors.append
+        self.send('fail')
+        assert self.transport.function_call('StandinSent') == ''
+        assert len(self.errors) == 1
+        assert isinstance(self.errors[0].__cause__, AHKExecutionException)
+
+    def test_calls_with_results_are_not_deferred(self):
+        assert self.transport.function_call('AHKEcho', ['hello']) == 'hello'
+        with pytest.raises(AHKExecutionException):
+            self.transport.function_call('StandinFail')
+
+    def test_not_supported_by_pool(self):
+        with pytest.raises(ValueError, match='deferred'):
+            StandinDaemonPoolTransport(executable_path=sys.executable, ack='deferred')
+
+
+class TestAutoBatch(TestCase):
+    def setUp(self) -> None:
+        self.transport = StandinDaemonTransport(executable_path=sys.executable, auto_batch=True, auto_batch_delay=0.1)
+        self.transport.init()
+
+    def tearDown(self) -> None:
+        self.transport.stop()
+
+    def batch_count(self) -> int:
+        return int(self.transport.function_call('StandinCallCount', ['*']))
+
+    def test_concurrent_reads_are_sent_together(self):
+        calls = [partial(self.transport.function_call, 'AHKWinGetTitle', [str(i)]) for i in range(5)]
+        assert gather(calls) == [f'title of {i}' for i in range(5)]
+        assert self.batch_count() == 1
+
+    def test_each_caller_gets_its_own_error(self):
+        def get_title(*args: str) -> Any:
+            try:
+                return self.transport.function_call('AHKWinGetTitle', list(args))
+            except AHKExecutionException as e:
+                return e
+
+        results = gather([partial(get_title, '0x1'), get_title, partial(get_title, '0x2')])
+        assert results[0] == 'title of 0x1'
+        assert isinstance(results[1], AHKExecutionException)
+        assert results[2] == 'title of 0x2'
+
+    def test_batches_are_limited_in_size(self):
+        self.transport._auto_batch_max_size = 2
+        calls = [partial(self.transport.function_call, 'AHKWinGetTitle', [str(i)]) for i in range(5)]
+        assert gather(calls) == [f'title of {i}' for i in range(5)]
+        # the fifth call goes out on its own
+        assert self.batch_count() == 2
+
+    def test_other_calls_are_not_batched(self):
+        calls = [partial(self.transport.function_call, 'AHKEcho', [str(i)]) for i in range(3)]
+        assert gather(calls) == ['0', '1', '2']
+        assert self.batch_count() == 0
+
+    def test_not_supported_by_pool(self):
+        with pytest.raises(ValueError, match='auto_batch'):
+            StandinDaemonPoolTransport(executable_path=sys.executable, auto_batch=True)
+
+
+class SyncStandinDaemonTransport(DaemonProcessTransport):
+    def _create_process(self, template: Any = None, **template_kwargs: Any) -> SyncAHKProcess:
+        return SyncAHKProcess(runargs=[sys.executable, STANDIN_DAEMON])
+
+
+class TestIOThreadTransport(TestCase):
+    def setUp(self) -> None:
+        self.io_thread = DaemonIOThread(SyncStandinDaemonTransport, executable_path=sys.executable)
+        self.ahk = make_engine(TransportClass=IOThreadTransport, io_thread=self.io_thread)
+
+    def tearDown(self) -> None:
+        self.io_thread.stop()
+
+    def call_in_new_thread(self, pool: ThreadPoolExecutor, call: Callable[[], Any]) -> Any:
+        # in the async API, with an event loop of its own
+        return pool.submit(call)
+
+    def test_calls(self):
+        assert self.ahk.function_call('AHKEcho', ['hello']) == 'hello'
+        with pytest.raises(AHKExecutionException):
+            self.ahk.function_call('StandinFail')
+        windows = self.ahk.list_windows()
+        assert isinstance(windows[0], Window)
+        assert windows[0]._engine is self.ahk
+
+    def test_batch(self):
+        results = self.ahk.function_call_many([('AHKEcho', ['a']), ('AHKEcho', ['b'])])
+        assert results == ['a', 'b']
+
+    def test_deadline(self):
+        with pytest.raises(AHKCallTimeoutError):
+            with self.ahk.deadline(0.2):
+                self.ahk.function_call('StandinSleep', ['2'])
+        assert self.ahk.function_call('AHKEcho', ['hello']) == 'hello'
+
+    def test_shared_across_threads_and_event_loops(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            sync_engine = AHK(
+                executable_path=sys.executable,
+                TransportClass=IOThreadTransport,
+                transport_options={'io_thread': self.io_thread},
+            )
+        async_engine = make_engine(TransportClass=IOThreadTransport, io_thread=self.io_thread)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            calls = [pool.submit(sync_engine.function_call, 'StandinState') for _ in range(4)]
+            calls += [
+                self.call_in_new_thread(pool, partial(async_engine.function_call, 'StandinState')) for _ in range(4)
+            ]
+            states = {call.result() for call in calls}
+        states.add(self.ahk.function_call('StandinState'))
+        assert len(states) == 1
+
+
+class StandinSocketTransport(DaemonSocketTransport):
+    def _socket_daemon_runargs(self) -> List[str]:
+        host, port = self._address
+        return [sys.executable, STANDIN_DAEMON, '--listen', f'{host}:{port}']
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return int(sock.getsockname()[1])
+
+
+class TestSocketTransport(TestCase):
+    def setUp(self) -> None:
+        self.port = free_port()
+        self.daemon_pids: List[int] = []
+
+    def tearDown(self) -> None:
+        for pid in self.daemon_pids:
+            with contextlib.suppress(OSError):
+                os.kill(pid, 9)
+
+    def connect(self, **options: Any) -> AHK:
+        return make_engine(TransportClass=StandinSocketTransport, port=self.port, **options)
+
+    def daemon_state(self, ahk: AHK) -> List[str]:
+        state: str = ahk.function_call('StandinState')
+        pid, coord_mode = state.split(':')
+        if int(pid) not in self.daemon_pids:
+            self.daemon_pids.append(int(pid))
+        return [pid, coord_mode]
+
+
+    def test_connect_to_running_daemon(self):
+        process = subprocess.Popen([sys.executable, STANDIN_DAEMON, '--listen', f'127.0.0.1:{self.port}'])
+        self.daemon_pids.append(process.pid)
+        ahk = self.connect(launch=False)
+        assert ahk.function_call('AHKEcho', ['hello']) == 'hello'
+        results = ahk.function_call_many([('AHKEcho', ['a']), ('AHKEcho', ['b'])])
+        assert results == ['a', 'b']
+        with pytest.raises(AHKExecutionException):
+            ahk.function_call('StandinFail')
+        pid, _ = self.daemon_state(ahk)
+        assert int(pid) == process.pid
+        ahk._transport.stop()
+        assert process.poll() is None  # closing the connection leaves the daemon running
+        process.kill()
+        process.wait()
+
+    def test_launches_daemon_that_outlives_the_transport(self):
+        first = self.connect()
+        first.set_coord_mode('Mouse', 'Client')
+        pid, _ = self.daemon_state(first)
+        first._transport.stop()
+
+        second = self.connect(launch=False)
+        assert self.daemon_state(second) == [pid, 'Client']
+        second._transport.stop()
+
+    def test_pipelined(self):
+        ahk = self.connect(pipelined=True)
+        ahk._transport.init()
+        results = gather([partial(ahk.function_call, 'AHKEcho', [str(i)]) for i in range(8)])
+        assert results == [str(i) for i in range(8)]
+        self.daemon_state(ahk)
+        ahk._transport.stop()
+
+    def test_no_daemon(self):
+        ahk = self.connect(launch=False, connect_timeout=0.2)
+        with pytest.raises(OSError):
+            ahk.function_call('AHKEcho', ['hello'])
+
+    def test_standby_not_supported(self):
+        with pytest.raises(ValueError, match='standby'):
+            StandinSocketTransport(executable_path=sys.executable, standby=True)
+
+
+class TestBroker(TestCase):
+    pool_size = 1
+
+    def setUp(self) -> None:
+        port = free_port()
+        self.broker = subprocess.Popen([sys.executable, STANDIN_BROKER, str(port), str(self.pool_size)])
+        self.connect = partial(make_engine, TransportClass=BrokerTransport, port=port, launch=False)
+
+    def tearDown(self) -> None:
+        self.broker.terminate()
+        self.broker.wait()
+
+    def test_calls(self):
+        ahk = self.connect()
+        assert ahk.function_call('AHKEcho', ['hello']) == 'hello'
+        with pytest.raises(AHKExecutionException):
+            ahk.function_call('StandinFail')
+        calls = [('AHKEcho', ['a']), ('StandinFail', []), ('AHKEcho', ['b'])]
+        results = ahk.function_call_many(calls, return_exceptions=True)
+        assert results[0] == 'a' and isinstance(results[1], AHKExecutionException) and results[2] == 'b'
+        windows = ahk.list_windows()
+        assert isinstance(windows[0], Window)
+        assert windows[0]._engine is ahk
+        ahk._transport.stop()
+
+    def test_clients_share_the_daemon(self):
+        first = self.connect()
+        second = self.connect(pipelined=True)
+        first.set_coord_mode('Mouse', 'Client')
+        second._transport.init()
+        states = gather(
+            [partial(first.function_call, 'StandinState') for _ in range(2)]
+            + [partial(second.function_call, 'StandinState') for _ in range(4)]
+        )
+        assert len(set(states)) == 1
+        assert states[0].endswith(':Client')
+        first._transport.stop()
+        second._transport.stop()
+
+    def test_responses_go_to_the_client_that_asked(self):
+        clients = [self.connect(pipelined=True) for _ in range(3)]
+        for ahk in clients:
+            ahk._transport.init()
+        calls = [partial(ahk.function_call, 'AHKEcho', [f'{i}:{j}']) for i, ahk in enumerate(clients) for j in range(8)]
+        results = gather(calls)
+        assert results == [f'{i}:{j}' for i in range(len(clients)) for j in range(8)]
+        for ahk in clients:
+            ahk._transport.stop()
+
+    def test_client_going_away(self):
+        impatient = self.connect()
+        with pytest.raises(AHKCallTimeoutError):
+            with impatient.deadline(0.2):
+                impatient.function_call('StandinSleep', ['1'])
+        ahk = self.connect()
+        assert ahk.function_call('AHKEcho', ['hello']) == 'hello'
+        impatient._transport.stop()
+        ahk._transport.stop()
+
+    def test_client_going_away_leaves_calls_of_other_clients_alone(self):
+        impatient = self.connect()
+        patient = self.connect()
+        impatient._transport.init()
+        patient._transport.init()
+
+        def give_up() -> Any:
+            try:
+                with impatient.deadline(0.2):
+                    return impatient.function_call('StandinSleep', ['0.5'])
+            except AHKCallTimeoutError as e:
+                return e
+
+        def wait() -> Any:
+            time.sleep(0.1)  # in flight on the shared daemon when the other client goes away
+            return patient.function_call('AHKEcho', ['patient'])
+
+        timed_out, result = gather([give_up, wait])
+        assert isinstance(timed_out, AHKCallTimeoutError)
+        assert result == 'patient'
+        impatient._transport.stop()
+        patient._transport.stop()
+
+
+    def test_arguments_are_uploaded_through_the_broker(self):
+        ahk = self.connect(upload_chunk_size=1000)
+        text = 'hello \N{EARTH GLOBE AMERICAS}\n' * 1000
+        assert ahk.function_call('AHKEcho', [text]) == text
+        data = bytes(range(256)) * 100
+        with mock.patch('tempfile.NamedTemporaryFile', side_effect=AssertionError('the data should be uploaded')):
+            ahk.set_clipboard_all(data)
+        ahk._transport.stop()
+
+
+class TestBrokerPool(TestBroker):
+    pool_size = 2
+
+    def test_clients_share_the_daemon(self):
+        first = self.connect()
+        second = self.connect()
+        first.set_coord_mode('Mouse', 'Client')
+        second._transport.init()
+        states = gather([partial(ahk.function_call, 'StandinState') for ahk in (first, second) * 2])
+        assert len({state.split(':')[0] for state in states}) == 2  # calls are spread across the pool
+        assert all(state.endswith(':Client') for state in states)
+        first._transport.stop()
+        second._transport.stop()
+
+
+class StandinRingBufferTransport(RingBufferTransport):
+    def _ring_daemon_runargs(self) -> List[str]:
+        return [sys.executable, STANDIN_DAEMON, '--ring']
+
+
+class TestRingBufferTransport(TestCase):
+    def tearDown(self) -> None:
+        self.transport.stop()
+
+    def make_transport(self, **options: Any) -> None:
+        self.transport = StandinRingBufferTransport(executable_path=sys.executable, **options)
+        self.transport.init()
+
+    def test_calls(self):
+        self.make_transport()
+        assert self.transport.function_call('AHKEcho', ['hello']) == 'hello'
+        with pytest.raises(AHKExecutionException):
+            self.transport.function_call('StandinFail')
+        results = self.transport.function_call_many([('AHKEcho', ['a']), ('AHKEcho', ['b'])])
+        assert results == ['a', 'b']
+        ahk = make_engine(TransportClass=StandinRingBufferTransport)
+        windows = ahk.list_windows()
+        assert isinstance(windows[0], Window)
+        ahk._transport.stop()
+
+    def test_pipelined(self):
+        self.make_transport(pipelined=True)
+        results = gather([partial(self.transport.function_call, 'AHKEcho', [str(i)]) for i in range(32)])
+        assert results == [str(i) for i in range(32)]
+
+    def test_messages_larger_than_the_ring(self):
+        # passed through in parts, wrapping around the end of the ring
+        self.make_transport(ring_capacity=100)
+        text = 'x' * 5000
+        assert self.transport.function_call('AHKEcho', [text]) == text
+        lines = self.transport.function_call('StandinLines', ['500'])
+        assert lines == '\n'.join(f'line {i}' for i in range(500))
+        assert self.transport.function_call('AHKEcho', ['hello']) == 'hello'
+
+    def test_exited_daemon_is_restarted(self):
+        self.make_transport()
+        with pytest.raises(AHKFailoverError):
+            self.transport.function_call('StandinExit')
+        assert self.transport.function_call('AHKEcho', ['hello']) == 'hello'
+
+    def test_daemon_exits_with_the_python_process(self):
+        self.transport = StandinRingBufferTransport(executable_path=sys.executable)
+        script = f"""
+import os, sys
+from ahk._sync.transport import RingBufferTransport
+class Transport(RingBufferTransport):
+    def _ring_daemon_runargs(self):
+        return [sys.executable, {STANDIN_DAEMON!r}, '--ring']
+transport = Transport(executable_path=sys.executable)
+print(transport.function_call('StandinState').split(':')[0], flush=True)
+os._exit(0)  # without stopping the daemon
+"""
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, check=True, timeout=30)
+        stat = f'/proc/{int(output.stdout)}/stat'
+        deadline = time.monotonic() + 10
+        while os.path.exists(stat) and open(stat).read().rsplit(')', 1)[1].split()[0] != 'Z':
+            assert time.monotonic() < deadline, 'the ring daemon outlived the Python process'
+            time.sleep(0.05)
+
+
+class TestSharedDaemonTransport(TestCase):
+    def setUp(self) -> None:
+        self.engines: List[AHK] = []
+
+    def tearDown(self) -> None:
+        for ahk in self.engines:
+            ahk._transport.stop()
+
+    def make_engine(self, **options: Any) -> AHK:
+        ahk = make_engine(
+            TransportClass=SharedDaemonTransport, daemon_transport_class=StandinDaemonTransport, **options
+        )
+        self.engines.append(ahk)
+        return ahk
+
+    def daemon_pid(self, ahk: AHK) -> str:
+        state = ahk._transport.function_call('StandinState')
+        return state.split(':')[0]
+
+    def test_engines_with_the_same_configuration_share_a_daemon(self):
+        first, second = self.make_engine(), self.make_engine()
+        assert self.daemon_pid(first) == self.daemon_pid(second)
+        other = self.make_engine(pipelined=True)
+        assert self.daemon_pid(other) != self.daemon_pid(first)
+
+    def test_daemon_is_stopped_with_the_last_engine(self):
+        first, second = self.make_engine(), self.make_engine()
+        first._transport.init()
+        assert second._transport.function_call('AHKEcho', ['hello']) == 'hello'
+        daemon = first._transport._shared.transport
+        first._transport.stop()
+        assert second._transport.function_call('AHKEcho', ['still there']) == 'still there'
+        second._transport.stop()
+        assert daemon._proc is not None and daemon._proc.returncode is not None
+        # a new engine starts a new daemon
+        third = self.make_engine()
+        assert third._transport._shared.transport is not daemon
+        assert third._transport.function_call('AHKEcho', ['hello']) == 'hello'
+
+    def test_settings_sent_along_with_a_failed_call_are_recorded(self):
+        first, second = self.make_engine(), self.make_engine()
+        first._transport.init()
+        first.set_coord_mode('Mouse', 'Client')
+        with pytest.raises(AHKExecutionException):
+            second._transport.function_call('StandinFail')  # sent after the default coord mode of this engine
+        second._transport.stop()
+        assert first.get_coord_mode('Mouse') == 'Client'
+
+    def test_transport_is_made_for_new_configurations_only(self):
+        first = self.make_engine()
+        with mock.patch.object(StandinDaemonTransport, '__init__', side_effect=AssertionError):
+            second = self.make_engine()
+        assert second._transport._shared is first._transport._shared
+
+    def test_settings_are_kept_per_engine(self):
+        first, second = self.make_engine(), self.make_engine()
+        first._transport.init()
+        first.set_coord_mode('Mouse', 'Client')
+        assert second.get_coord_mode('Mouse') == 'Window'  # the default
+        assert first.get_coord_mode('Mouse') == 'Client'
+        calls = [partial(ahk.get_coord_mode, 'Mouse') for _ in range(10) for ahk in (first, second)]
+        assert gather(calls) == ['Client', 'Window'] * 10
+        results = second.function_call_many([('AHKGetCoordMode', ['Mouse']), ('AHKEcho', ['hello'])])
+        assert results == ['Window', 'hello']
+
+    def test_settings_are_sent_only_while_engines_differ(self):
+        first, second = self.make_engine(), self.make_engine()
+        first._transport.init()
+        first.set_coord_mode('Mouse', 'Client')
+        assert first._transport._settings_to_send([]) != []
+        second.set_coord_mode('Mouse', 'Client')
+        assert first._transport._settings_to_send([]) == []
+        assert second._transport._settings_to_send([]) == []
+
+    def test_settings_of_a_stopped_engine_are_undone(self):
+        first, second = self.make_engine(), self.make_engine()
+        first._transport.init()
+        first.set_coord_mode('Mouse', 'Client')
+        first._transport.stop()
+        assert second.get_coord_mode('Mouse') == 'Window'
+
+    def test_long_blocking_calls_take_the_settings_of_their_engine(self):
+        first = self.make_engine(long_blocking_functions=['StandinState'])
+        second = self.make_engine(long_blocking_functions=['StandinState'])
+        first._transport.init()
+        first.set_coord_mode('Mouse', 'Client')
+        assert (first._transport.function_call('StandinState')).endswith(':Client')
+        assert (second._transport.function_call('StandinState')).endswith(':Window')
+        assert first._transport._shared.transport._idle_lanes
+
+    def test_hotkeys_are_cleared_per_engine(self):
+        first, second = self.make_engine(), self.make_engine()
+        first.add_hotkey('#n', callback=lambda: None)
+        second.add_hotkey('#m', callback=lambda: None)
+        first.clear_hotkeys()
+        hotkeys = first._transport._hotkey_transport._hotkeys
+        assert [hotkey.keyname for hotkey in hotkeys.values()] == ['#m']
+
+
+class TestBlockingLanes(TestCase):
+    def tearDown(self) -> None:
+        self.transport.stop()
+
+    def make_transport(self, **options: Any) -> None:
+        options.setdefault('long_blocking_functions', ['StandinSleep', 'StandinState'])
+        self.transport = StandinDaemonTransport(executable_path=sys.executable, **options)
+        self.transport.init()
+
+    def main_pid(self) -> str:
+        assert self.transport._proc is not None
+        return str(self.transport._proc._proc.pid)
+
+    def test_long_blocking_calls_do_not_hold_up_others(self):
+        self.make_transport()
+        finished: List[str] = []
+
+        def call(*args: Any) -> None:
+            finished.append(self.transport.function_call(*args))
+
+        gather([partial(call, 'StandinSleep', ['0.5', 'slow']), partial(call, 'AHKEcho', ['fast'])])
+        assert finished == ['fast', 'slow']
+
+    def test_lanes_are_reused(self):
+        self.make_transport()
+        first = (self.transport.function_call('StandinState')).split(':')[0]
+        second = (self.transport.function_call('StandinState')).split(':')[0]
+        assert first == second != self.main_pid()
+        assert len(self.transport._idle_lanes) == 1
+
+    def test_calls_wait_for_a_free_lane(self):
+        self.make_transport(blocking_lanes=2)
+        calls = [partial(self.transport.function_call, 'StandinSleep', ['0.3', str(i)]) for i in range(4)]
+        start = time.perf_counter()
+        assert gather(calls) == ['0', '1', '2', '3']
+        assert time.perf_counter() - start >= 0.55  # two at a time
+        assert len(self.transport._idle_lanes) == 2
+        assert not self.transport._busy_lanes
+
+    def test_lanes_have_the_session_settings(self):
+        self.make_transport()
+        self.transport.function_call('AHKSetCoordMode', ['Mouse', 'Client'])
+        state = self.transport.function_call('StandinState')
+        assert state.endswith(':Client')
+        assert not state.startswith(f'{self.main_pid()}:')
+
+    def test_errors_leave_the_lane_usable(self):
+        self.make_transport(long_blocking_functions=['StandinFail', 'StandinState'])
+        with pytest.raises(AHKExecutionException):
+            self.transport.function_call('StandinFail', ['boom'])
+        assert len(self.transport._idle_lanes) == 1
+        self.transport.function_call('StandinState')
+        assert len(self.transport._idle_lanes) == 1
+
+    def test_no_lanes(self):
+        self.make_transport(blocking_lanes=0)
+        state = self.transport.function_call('StandinState')
+        assert state.startswith(f'{self.main_pid()}:')
+
+    def test_extension_functions(self):
+        extension = Extension(script_text='', long_blocking_functions=['StandinSleep'])
+        self.make_transport(long_blocking_functions=None, extensions=[extension])
+        assert 'StandinSleep' in self.transport._long_blocking_functions
+        assert 'AHKMsgBox' in self.transport._long_blocking_functions
+
+    def test_stop_kills_the_lanes(self):
+        self.make_transport()
+        self.transport.function_call('StandinState')
+        lane = self.transport._idle_lanes[0]
+        self.transport.stop()
+        lane.proc.wait()
+        assert lane.proc.returncode is not None
+
+
+class TestChunkedUploads(TestCase):
+    def tearDown(self) -> None:
+        self.ahk._transport.stop()
+
+    def longest_line(self) -> int:
+        return int(self.ahk.function_call('StandinLongestLine'))
+
+    def test_large_text_is_uploaded_in_chunks(self):
+        self.ahk = make_engine(upload_chunk_size=1000)
+        text = 'hello \N{EARTH GLOBE AMERICAS}\n' * 10_000
+        self.ahk.set_clipboard(text)
+        assert self.ahk.get_clipboard() == text
+        # at most 1000 characters of up to 4 bytes each per line, in base64
+        assert self.longest_line() < 6000
+
+    def test_large_binary_data_is_uploaded_in_chunks(self):
+        self.ahk = make_engine(upload_chunk_size=1000)
+        data = bytes(range(256)) * 1000
+        self.ahk.set_clipboard_all(data)
+        digest = self.ahk.function_call('StandinClipboardAllDigest')
+        assert digest == f'{len(data)}:{hashlib.sha256(data).hexdigest()}'
+        assert self.longest_line() < 1100
+
+    def test_small_data_is_sent_as_usual(self):
+        self.ahk = make_engine(upload_chunk_size=1000)
+        data = b'\x01\x00\x00\x00\x03\x00\x00\x00abc\x00\x00\x00\x00'
+        self.ahk.set_clipboard_all(data)
+        digest = self.ahk.function_call('StandinClipboardAllDigest')
+        assert digest == f'{len(data)}:{hashlib.sha256(data).hexdigest()}'
+
+    def test_clipboard_data_is_passed_in_a_file_without_chunked_args(self):
+        self.ahk = make_engine(TransportClass=BatchOnlyStandinDaemonTransport, upload_chunk_size=1000)
+        data = bytes(range(256)) * 100
+        self.ahk.set_clipboard_all(data)
+        digest = self.ahk.function_call('StandinClipboardAllDigest')
+        assert digest == f'{len(data)}:{hashlib.sha256(data).hexdigest()}'
+
+    def test_clipboard_data_is_uploaded_on_a_nonblocking_first_call(self):
+        self.ahk = make_engine(upload_chunk_size=1000, nonblocking_pool_min_size=1, nonblocking_pool_max_size=1)
+        data = bytes(range(256)) * 100
+        with mock.patch('tempfile.NamedTemporaryFile', side_effect=AssertionError('the data should be uploaded')):
+            fut = self.ahk.set_clipboard_all(data, blocking=False)
+            assert fut.result() is None
+
+    def test_concurrent_uploads_in_pipelined_mode(self):
+        self.ahk = make_engine(upload_chunk_size=100, pipelined=True)
+        self.ahk._transport.init()
+        texts = [str(i) * 5000 for i in range(5)]
+        echoed = gather([partial(self.ahk.function_call, 'AHKEcho', [text]) for text in texts])
+        assert echoed == texts
+        assert self.longest_line() < 500
+
+    def test_uploads_in_batches(self):
+        self.ahk = make_engine(upload_chunk_size=100)
+        calls = [('AHKEcho', ['a' * 1000]), ('AHKEcho', ['b']), ('AHKEcho', ['c' * 1000])]
+        assert self.ahk._transport.function_call_many(calls) == ['a' * 1000, 'b', 'c' * 1000]
+        assert self.longest_line() < 500
+
+    def test_uploads_can_be_turned_off(self):
+        self.ahk = make_engine(upload_chunk_size=None)
+        self.ahk.set_clipboard('x' * 10_000)
+        assert self.longest_line() > 10_000
+
+    def test_not_used_unless_announced(self):
+        self.ahk = make_engine(TransportClass=BatchOnlyStandinDaemonTransport, upload_chunk_size=100)
+        assert self.ahk.function_call('AHKEcho', ['x' * 10_000]) == 'x' * 10_000
+        assert self.longest_line() > 10_000
+
+
+class TestPriority(TestCase):
+    def setUp(self) -> None:
+        self.use_engine()
+        self.pool = ThreadPoolExecutor(max_workers=8)
+
+    def use_engine(self, **options: Any) -> None:
+        self.ahk = make_engine(**options)
+        self.ahk._transport.init()
+
+    def tearDown(self) -> None:
+        self.pool.shutdown()
+        self.ahk._transport.stop()
+
+    def start(self, call: Callable[[], Any]) -> Any:
+        return self.pool.submit(contextvars.copy_context().run, call)
+
+    def run_queued(self, priorities: List[Any], delay: float = 0.02) -> str:
+        """
+        Queue a call with each priority behind a slow call, in order, and return the order in which they ran
+        """
+        started = [self.start(partial(self.ahk.function_call, 'StandinSleep', ['0.5']))]
+        for i, priority in enumerate(priorities):
+            self.ahk._transport._sleep(delay)
+            with self.ahk.priority(priority) if priority else contextlib.nullcontext():
+                started.append(self.start(partial(self.ahk.function_call, 'AHKSend', [str(i)])))
+        for call in started:
+            call.result()
+        return self.ahk.function_call('StandinSent')  # type: ignore[no-any-return]
+
+    def test_higher_priority_calls_go_first(self):
+        assert self.run_queued(['background', 'normal', 'interactive', 'normal']) == '2,1,3,0'
+
+    def test_waiting_calls_move_up(self):
+        self.ahk._transport._scheduler._aging = 0.1
+        # the background call has waited long enough by the time the interactive one arrives
+        assert self.run_queued(['background', 'interactive'], delay=0.25) == '0,1'
+
+    def test_default_priority_is_a_transport_option(self):
+        self.ahk._transport.stop()
+        self.use_engine(priority='background')
+        assert self.run_queued([None, 'interactive']) == '1,0'
+
+    def test_pool(self):
+        self.ahk._transport.stop()
+        self.use_engine(TransportClass=StandinDaemonPoolTransport, pool_size=1)
+        assert self.run_queued(['background', 'interactive']) == '1,0'
+
+    def test_invalid_priority(self):
+        with pytest.raises(ValueError, match='priority'):
+            with self.ahk.priority('urgent'):  # type: ignore[arg-type]
+                pass
+
+
+class TestLazyLists(TestCase):
+    def setUp(self) -> None:
+        self.ahk = make_engine(lazy_lists=True)
+
+    def tearDown(self) -> None:
+        self.ahk._transport._proc.kill()
+        self.ahk._transport._proc._proc.wait()
+
+    def test_window_list_is_lazy(self):
+        windows = self.ahk.list_windows()
+        assert isinstance(windows, WindowIdArray)
+        assert len(windows) == 100
+        assert windows[0] == Window(engine=self.ahk, ahk_id='0x1')
+        assert windows[-1] == Window(engine=self.ahk, ahk_id='0x64')
+        assert sum(item is not None for item in windows._items) == 2  # only the accessed windows were created
+
+    def test_window_list_behaves_like_list(self):
+        windows = self.ahk.list_windows()
+        expected = [Window(engine=self.ahk, ahk_id=f'0x{i:x}') for i in range(1, 101)]
+        assert windows == expected
+        assert expected == windows
+        assert list(windows) == expected
+        assert windows[1:3] == expected[1:3]
+        assert windows.index(expected[5]) == 5
+        assert expected[5] in windows
+        assert Window(engine=self.ahk, ahk_id='0x65') not in windows
+        with pytest.raises(IndexError):
+            windows[100]
+
+    def test_control_list_is_lazy(self):
+        controls = self.ahk.win_get_control_list()
+        assert isinstance(controls, LazyList)
+        assert len(controls) == 10
+        assert [control.hwnd for control in controls] == [f'0x{i:x}' for i in range(1, 11)]
+        assert controls[0].window == Window(engine=self.ahk, ahk_id='0x1')
+        assert controls[0] is controls[0]
+
+    def test_lists_are_not_lazy_by_default(self):
+        self.ahk = make_engine()
+        assert isinstance(self.ahk.list_windows(), list)
+        assert isinstance(self.ahk.win_get_control_list(), list)
@@ -1,14 +1,36 @@
+import ast
+import base64
+import itertools
+import timeit
+from typing import Dict
+from typing import List
+
 import pytest
 
+from ahk.exceptions import AHKExecutionException
+from ahk.message import BatchRequestMessage
+from ahk.message import BatchResponseMessage
 from ahk.message import BooleanResponseMessage
 from ahk.message import CoordinateResponseMessage
+from ahk.message import DaemonProtocol
 from ahk.message import ExceptionResponseMessage
+from ahk.message import FloatResponseMessage
 from ahk.message import IntegerResponseMessage
 from ahk.message import NoValueResponseMessage
+from ahk.message import parse_length_line
+from ahk.message import parse_number
+from ahk.message import parse_request
+from ahk.message import parse_tuple
+from ahk.message import parse_upload
+from ahk.message import parse_window_control_list
+from ahk.message import PositionResponseMessage
 from ahk.message import RequestMessage
+from ahk.message import ResponseBuffer
 from ahk.message import ResponseMessage
 from ahk.message import StringResponseMessage
 from ahk.message import TupleResponseMessage
+from ahk.message import WindowControlListResponseMessage
+from ahk.message import WindowIdArray
 from ahk.message import WindowListResponseMessage
 
 
@@ -23,3 +45,302 @@ def test_novalue_response_sentinel() -> None:
     msg = NoValueResponseMessage(raw_content=b'\xee\x80\x80')
     assert msg.unpack() is None
     return None
+
+
+def test_batch_request_format() -> None:
+    request = BatchRequestMessage(
+        requests=[RequestMessage('AHKWinGetTitle', args=['ahk_id 0x1']), RequestMessage('AHKGetTitleMatchMode')]
+    )
+    assert request.format() == b'*AHKWinGetTitle|YWhrX2lkIDB4MQ==\tAHKGetTitleMatchMode|\n'
+
+
+@pytest.mark.parametrize(
+    'request_message',
+    [
+        RequestMessage('AHKWinGetTitle', args=['ahk_id 0x1']),
+        RequestMessage('AHKGetTitleMatchMode', request_id=7),
+        RequestMessage('AHKSetClipboard', args=['multi\nline | text \u00e9', '', 'x']),
+        BatchRequestMessage([RequestMessage('AHKEcho', args=['a']), RequestMessage('AHKGetCoordMode')], request_id=3),
+    ],
+)
+def test_parse_request_round_trips(request_message: RequestMessage) -> None:
+    line = request_message.format()
+    parsed = parse_request(line)
+    assert type(parsed) is type(request_message)
+    assert (parsed.function_name, parsed.args, parsed.request_id) == (
+        request_message.function_name,
+        request_message.args,
+        request_message.request_id,
+    )
+    assert parsed.format() == line
+
+
+def test_format_chunked_uploads_long_arguments() -> None:
+    request = RequestMessage('AHKEcho', args=['short', 'long argument'], request_id=5)
+    lines = list(request.format_chunked(chunk_size=5, upload_ids=itertools.count(8)))
+    assert lines == [
+        b'+8|bG9uZyA=\n',
+        b'+8|YXJndW0=\n',
+        b'+8|ZW50\n',
+        b'#5|AHKEcho|c2hvcnQ=|@8\n',
+    ]
+    assert list(request.format_chunked(chunk_size=20, upload_ids=itertools.count(8))) == [request.format()]
+
+
+def test_format_chunked_uploads_base64_arguments_as_binary() -> None:
+    encoded = str(base64.b64encode(bytes(range(20))), 'ascii')
+    request = BatchRequestMessage([RequestMessage('AHKSetClipboardAll', args=[encoded]), RequestMessage('AHKEcho')])
+    *uploads, line = request.format_chunked(chunk_size=10, upload_ids=itertools.count(1))
+    # slices of the base64 that decode on their own
+    assert b''.join(base64.b64decode(upload[len(b'+1|') :]) for upload in uploads) == bytes(range(20))
+    assert all(len(upload) <= len(b'+1|') + 8 + 1 for upload in uploads)
+    assert line == b'*AHKSetClipboardAll|&1\tAHKEcho|\n'
+
+
+def test_parse_request_assembles_uploaded_arguments() -> None:
+    encoded = str(base64.b64encode(bytes(range(20))), 'ascii')
+    request = BatchRequestMessage(
+        [RequestMessage('AHKSetClipboardAll', args=[encoded]), RequestMessage('AHKEcho', args=['long argument'])],
+        request_id=4,
+    )
+    *upload_lines, line = request.format_chunked(chunk_size=5, upload_ids=itertools.count(1))
+    uploads: Dict[bytes, List[bytes]] = {}
+    for upload_line in upload_lines:
+        upload_id, chunk = parse_upload(upload_line)
+        uploads.setdefault(upload_id, []).append(chunk)
+    assert parse_request(line, uploads).format() == request.format()
+    assert not uploads
+    with pytest.raises(ValueError):
+        parse_request(line, uploads)
+
+
+@pytest.mark.parametrize('line', [b'#x|AHKEcho|\n', b'AHKEcho|not base64!\n'])
+def test_parse_request_rejects_malformed_requests(line: bytes) -> None:
+    with pytest.raises(ValueError):
+        parse_request(line)
+
+
+def test_batch_response_splits_results_and_exceptions() -> None:
+    responses = [
+        StringResponseMessage(raw_content=b'multi\nline\n'),
+        ExceptionResponseMessage(raw_content=b'it failed'),
+        IntegerResponseMessage(raw_content=b'42'),
+        NoValueResponseMessage(raw_content=b'\xee\x80\x80'),
+    ]
+    batch = BatchResponseMessage(raw_content=b''.join(resp.to_bytes() + b'\n' for resp in responses))
+    response = ResponseMessage.from_bytes(batch.to_bytes())
+    assert isinstance(response, BatchResponseMessage)
+    title, error, number, novalue = response.unpack()
+    assert title == 'multi\nline\n'
+    assert isinstance(error, AHKExecutionException)
+    assert str(error) == 'it failed'
+    assert number == 42
+    assert novalue is None
+
+
+def test_length_prefixed_response_format() -> None:
+    message = StringResponseMessage(raw_content='héllo\n'.encode('utf-8'))
+    data = message.to_bytes(length_prefixed=True)
+    tom, size_line, payload = data.split(b'\n', 2)
+    assert parse_length_line(size_line) == 7
+    assert parse_length_line(b'1') is None
+    assert ResponseMessage.from_bytes(data).unpack() == 'héllo\n'
+
+
+def test_batch_response_with_mixed_framing() -> None:
+    responses = [
+        StringResponseMessage(raw_content=b'multi\nline\n').to_bytes(length_prefixed=True),
+        IntegerResponseMessage(raw_content=b'42').to_bytes(),
+        StringResponseMessage(raw_content=b'last').to_bytes(length_prefixed=True),
+    ]
+    batch = BatchResponseMessage(raw_content=b''.join(resp + b'\n' for resp in responses))
+    assert batch.unpack() == ['multi\nline\n', 42, 'last']
+
+
+def recorded_response_stream() -> bytes:
+    # responses as written by the daemon, including correlation headers and both framings
+    return b''.join(
+        [
+            StringResponseMessage(raw_content=b'first').to_bytes() + b'\n',
+            b'#7\n' + StringResponseMessage(raw_content='multi\nline\nwörld'.encode('utf-8')).to_bytes() + b'\n',
+            IntegerResponseMessage(raw_content=b'42').to_bytes(length_prefixed=True) + b'\n',
+            StringResponseMessage(raw_content=b'\n\n').to_bytes(length_prefixed=True) + b'\n',
+            NoValueResponseMessage(raw_content=b'\xee\x80\x80').to_bytes() + b'\n',
+        ]
+    )
+
+
+def test_response_buffer_discards_until_marker() -> None:
+    buffer = ResponseBuffer()
+    buffer.feed(b'unexpected output\n#4')
+    assert not buffer.discard_until(b'#42\n')
+    buffer.feed(b'2\n' + StringResponseMessage(raw_content=b'resync').to_bytes() + b'\n')
+    assert buffer.discard_until(b'#42\n')
+    frame = buffer.next_frame()
+    assert frame is not None
+    assert frame.request_id == 42
+    assert bytes(frame.payload) == b'resync'
+
+
+def test_daemon_protocol_from_hello_keeps_unknown_features() -> None:
+    protocol = DaemonProtocol.from_hello('2\nbatch\ncompression\n')
+    assert protocol == DaemonProtocol(version=2, features=frozenset(['batch', 'compression']))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 4096])
+def test_response_buffer_replays_stream_in_chunks(chunk_size: int) -> None:
+    stream = recorded_response_stream()
+    buffer = ResponseBuffer()
+    frames = []
+    for i in range(0, len(stream), chunk_size):
+        buffer.feed(stream[i : i + chunk_size])
+        while (frame := buffer.next_frame()) is not None:
+            frames.append(frame)
+    assert not buffer
+    assert [frame.request_id for frame in frames] == [None, 7, None, None, None]
+    assert [ResponseMessage.from_frame(frame).unpack() for frame in frames] == [
+        'first',
+        'multi\nline\nwörld',
+        42,
+        '\n\n',
+        None,
+    ]
+
+
+def test_response_buffer_payloads_survive_later_reads() -> None:
+    stream = recorded_response_stream()
+    buffer = ResponseBuffer()
+    buffer.feed(stream[:20])
+    first = buffer.next_frame()
+    assert first is not None
+    buffer.feed(stream[20:])  # must not move or overwrite the payload of the first frame
+    assert bytes(first.payload) == b'first'
+
+
+def test_response_buffer_rejects_unframed_data() -> None:
+    buffer = ResponseBuffer()
+    buffer.feed(b'Error: something went wrong\nat line 1\n')
+    with pytest.raises(ValueError):
+        buffer.next_frame()
+
+
+def test_response_buffer_rejects_wrong_declared_length() -> None:
+    buffer = ResponseBuffer()
+    buffer.feed(b'abc\n=3\nhello\n' + StringResponseMessage(raw_content=b'next').to_bytes() + b'\n')
+    with pytest.raises(ValueError):
+        buffer.next_frame()
+
+
+@pytest.mark.parametrize('payload', ['42', '-7', '0x1F', '50.000000', '-1.5e3'])
+def test_parse_number_matches_literal_eval(payload: str) -> None:
+    assert parse_number(payload) == ast.literal_eval(payload)
+    assert type(parse_number(payload)) is type(ast.literal_eval(payload))
+
+
+@pytest.mark.parametrize('payload', ['010', '\u0663', 'True', '1_000', 'inf', '0x', ''])
+def test_parse_number_falls_back_to_literal_eval(payload: str) -> None:
+    try:
+        expected = ast.literal_eval(payload)
+    except Exception as e:
+        with pytest.raises(type(e)):
+            parse_number(payload)
+    else:
+        assert parse_number(payload) == expected
+        assert type(parse_number(payload)) is type(expected)
+
+
+@pytest.mark.parametrize(
+    'payload', ['(10, 20)', '(-1, 0, 1920, 1080)', '(1,)', '()', "('a', 1)", '(1.5, 2)', "('a, b', 1)"]
+)
+def test_parse_tuple_matches_literal_eval(payload: str) -> None:
+    assert parse_tuple(payload) == ast.literal_eval(payload)
+
+
+@pytest.mark.parametrize(
+    'payload',
+    [
+        "('0x1', [])",
+        "('0x1', [('0x2', 'Button1'), ('0x3', 'Edit1'), ])",
+        "('0x1', [('0x2', 'It\\'s'), ])",
+    ],
+)
+def test_parse_window_control_list_matches_literal_eval(payload: str) -> None:
+    assert parse_window_control_list(payload) == ast.literal_eval(payload)
+
+
+def test_decoders_keep_validation_errors() -> None:
+    with pytest.raises(AssertionError):
+        IntegerResponseMessage(raw_content=b'1.5').unpack()
+    with pytest.raises(AssertionError):
+        FloatResponseMessage(raw_content=b'1').unpack()
+    with pytest.raises(ValueError):
+        IntegerResponseMessage(raw_content=b'inf').unpack()
+    with pytest.raises(AssertionError):
+        TupleResponseMessage(raw_content=b'(1)').unpack()
+    with pytest.raises(ValueError, match='Expected tuple of length 4'):
+        PositionResponseMessage(raw_content=b'(1, 2, 3)').unpack()
+    with pytest.raises(ValueError):
+        CoordinateResponseMessage(raw_content=b'(1, 2, 3)').unpack()
+    with pytest.raises(AssertionError):
+        parse_window_control_list("('0x1', [('0x2', 'Button1', 'extra')])")
+
+
+def literal_eval_unpack(message: ResponseMessage) -> object:
+    # how these messages were decoded before they had dedicated parsers
+    return ast.literal_eval(message._raw_content.decode('utf-8'))
+
+
+@pytest.mark.parametrize(
+    'message',
+    [
+        IntegerResponseMessage(raw_content=b'4242'),
+        FloatResponseMessage(raw_content=b'50.000000'),
+        CoordinateResponseMessage(raw_content=b'(1024, 768)'),
+        PositionResponseMessage(raw_content=b'(0, 0, 1920, 1080)'),
+        WindowControlListResponseMessage(
+            raw_content=("('0x1', [" + ''.join(f"('0x{i:x}', 'Button{i}'), " for i in range(1, 21)) + '])').encode(
+                'utf-8'
+            )
+        ),
+    ],
+    ids=lambda message: type(message).__name__,
+)
+def test_decoder_speedup(message: ResponseMessage) -> None:
+    # a microbenchmark: the timings are reported (shown with -s, as in tox), not asserted on, as they vary between runs
+    if isinstance(message, WindowControlListResponseMessage):
+        decode = lambda: parse_window_control_list(message._decode())  # noqa: E731
+    else:
+        decode = message.unpack
+    assert decode() == literal_eval_unpack(message)
+    number = 2000
+    new = min(timeit.repeat(decode, number=number, repeat=5))
+    old = min(timeit.repeat(lambda: literal_eval_unpack(message), number=number, repeat=5))
+    print(f'{type(message).__name__}: {old / number * 1e6:.2f}us -> {new / number * 1e6:.2f}us ({old / new:.1f}x)')
+
+
+def test_window_id_array_stores_integer_ids() -> None:
+    windows = WindowIdArray.from_window_list(b'0x10,0x2a,0xff,', make_window=lambda ahk_id: f'window {ahk_id}')
+    assert windows.ids.typecode == 'Q'
+    assert list(windows.ids) == [0x10, 0x2A, 0xFF]
+    assert windows[1] == 'window 0x2a'
+    assert windows == ['window 0x10', 'window 0x2a', 'window 0xff']
+
+
+def test_window_id_array_keeps_decimal_ids() -> None:
+    # AutoHotkey v2 writes window IDs in decimal
+    windows = WindowIdArray.from_window_list(b'16,42,', make_window=str)
+    assert list(windows) == ['16', '42']
+
+
+def test_window_id_array_set_operations() -> None:
+    previous = WindowIdArray.from_window_list(b'0x1,0x2,0x3,', make_window=str)
+    current = WindowIdArray.from_window_list(b'0x4,0x3,0x2,0x5,', make_window=str)
+    assert list(current - previous) == ['0x4', '0x5']  # opened since the previous snapshot
+    assert list(previous.difference(current)) == ['0x1']  # closed since the previous snapshot
+    assert list(current & previous) == ['0x3', '0x2']
+    assert list(current.intersection([0x5])) == ['0x5']
+    assert 0x4 in current
+    assert '0x4' in current
+    assert '0x1' not in current
+    assert 'not an id' not in current
+    assert (current - previous) == WindowIdArray.from_window_list(b'0x4,0x5,', make_window=str)
@@ -0,0 +1,62 @@
+import os
+import pathlib
+from typing import Iterator
+
+import pytest
+
+from ahk._ring import SharedRings
+
+
+@pytest.fixture
+def rings() -> Iterator[SharedRings]:
+    rings = SharedRings.create(capacity=16)
+    yield rings
+    rings.close()
+    os.remove(rings.path)
+
+
+def test_read_what_was_written(rings: SharedRings) -> None:
+    assert rings.requests.read(16) == b''
+    assert rings.requests.write(b'hello') == 5
+    assert rings.requests.readable() == 5
+    assert rings.responses.readable() == 0
+    assert rings.requests.read(3) == b'hel'
+    assert rings.requests.read(16) == b'lo'
+    assert rings.requests.read(16) == b''
+
+
+def test_full_ring_takes_no_more(rings: SharedRings) -> None:
+    assert rings.requests.write(b'x' * 20) == 16
+    assert rings.requests.write(b'y') == 0
+    assert rings.requests.read(4) == b'xxxx'
+    assert rings.requests.write(b'y' * 8) == 4
+
+
+def test_wraparound(rings: SharedRings) -> None:
+    data = bytes(range(200))
+    received = b''
+    sent = 0
+    while len(received) < len(data):
+        sent += rings.responses.write(data[sent : sent + 7])
+        received += rings.responses.read(5)
+    assert received == data
+
+
+def test_second_mapping_sees_the_same_rings(rings: SharedRings) -> None:
+    peer = SharedRings(rings.path)
+    try:
+        assert peer.capacity == 16
+        rings.requests.write(b'ping\n')
+        assert peer.requests.read(16) == b'ping\n'
+        peer.responses.write(b'pong\n')
+        assert rings.responses.read(16) == b'pong\n'
+        assert rings.requests.readable() == 0
+    finally:
+        peer.close()
+
+
+def test_not_a_ring_file(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / 'not-a-ring'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        SharedRings(str(path))
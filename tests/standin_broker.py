@@ -0,0 +1,45 @@
+"""
+The broker, in front of the Python stand-in daemon instead of AutoHotkey.
+
+Usage: standin_broker.py <port> [<pool size>]
+"""
+
+import asyncio
+import os
+import sys
+from typing import Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ahk._async.transport import AsyncAHKProcess  # noqa: E402
+from ahk.broker import Broker  # noqa: E402
+from ahk.broker import BrokerDaemonPoolTransport  # noqa: E402
+from ahk.broker import BrokerDaemonTransport  # noqa: E402
+
+STANDIN_DAEMON = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'standin_daemon.py')
+
+
+class StandinBrokerDaemonTransport(BrokerDaemonTransport):
+    def _create_process(self, template: Any = None, **template_kwargs: Any) -> AsyncAHKProcess:
+        return AsyncAHKProcess(runargs=[sys.executable, STANDIN_DAEMON])
+
+
+class StandinBrokerDaemonPoolTransport(BrokerDaemonPoolTransport):
+    def _create_process(self, template: Any = None, **template_kwargs: Any) -> AsyncAHKProcess:
+        return AsyncAHKProcess(runargs=[sys.executable, STANDIN_DAEMON])
+
+
+class StandinBroker(Broker):
+    TransportClass = StandinBrokerDaemonTransport
+    PoolTransportClass = StandinBrokerDaemonPoolTransport
+
+
+def main() -> None:
+    port = int(sys.argv[1])
+    pool_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    broker = StandinBroker(port=port, pool_size=pool_size, executable_path=sys.executable)
+    asyncio.run(broker.serve_forever())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,353 @@
+"""
+A stand-in for the AutoHotkey daemon script that speaks the same line protocol over stdin/stdout.
+
+This allows exercising the transport machinery on platforms where AutoHotkey is not available.
+Requests are read one per line and each is answered with a framed response message.
+"""
+
+import base64
+import collections
+import hashlib
+import os
+import re
+import socket
+import sys
+import time
+from typing import Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ahk._ring import RingBuffer  # noqa: E402
+from ahk._ring import RingPoller  # noqa: E402
+from ahk._ring import SharedRings  # noqa: E402
+from ahk.message import BatchResponseMessage  # noqa: E402
+from ahk.message import ExceptionResponseMessage  # noqa: E402
+from ahk.message import IntegerResponseMessage  # noqa: E402
+from ahk.message import NoValueResponseMessage  # noqa: E402
+from ahk.message import ResponseMessage  # noqa: E402
+from ahk.message import StringResponseMessage  # noqa: E402
+from ahk.message import WindowControlListResponseMessage  # noqa: E402
+from ahk.message import WindowListResponseMessage  # noqa: E402
+
+NOVALUE_SENTINEL = '\ue000'
+
+RESPONSE_FRAMING = {'framing': 'lines'}
+
+
+def frame(message: ResponseMessage) -> bytes:
+    return message.to_bytes(length_prefixed=RESPONSE_FRAMING['framing'] == 'length')
+
+
+def novalue() -> bytes:
+    return frame(NoValueResponseMessage(raw_content=NOVALUE_SENTINEL.encode('utf-8')))
+
+
+def string(s: str) -> bytes:
+    return frame(StringResponseMessage(raw_content=s.encode('utf-8')))
+
+
+def integer(i: int) -> bytes:
+    return frame(IntegerResponseMessage(raw_content=str(i).encode('utf-8')))
+
+
+def error(s: str) -> bytes:
+    return frame(ExceptionResponseMessage(raw_content=s.encode('utf-8')))
+
+
+SETTINGS = {}
+
+
+def AHKSetCoordMode(*args: str) -> bytes:
+    SETTINGS[f'CoordMode{args[0]}'] = args[1]
+    return novalue()
+
+
+def AHKGetCoordMode(*args: str) -> bytes:
+    return string(SETTINGS.get(f'CoordMode{args[0]}', 'Screen'))
+
+
+def AHKTrayTip(*args: str) -> bytes:
+    return novalue()
+
+
+def StandinState(*args: str) -> bytes:
+    # slow enough that concurrent callers are spread across the daemons of a pool
+    time.sleep(0.1)
+    return string(f'{os.getpid()}:{SETTINGS.get("CoordModeMouse", "Screen")}')
+
+
+def AHKSetResponseFraming(*args: str) -> bytes:
+    response = novalue()  # acknowledged with the old framing
+    RESPONSE_FRAMING['framing'] = args[0]
+    return response
+
+
+# protocol features announced in the handshake; ``--features=a,b`` announces only those
+PROTOCOL_FEATURES = ['batch', 'length-framing', 'request-ids', 'chunked-args']
+for arg in sys.argv:
+    if arg.startswith('--features='):
+        PROTOCOL_FEATURES = [feature for feature in arg[len('--features=') :].split(',') if feature]
+
+
+def AHKProtocolHello(*args: str) -> bytes:
+    return string('\n'.join(['1'] + PROTOCOL_FEATURES))
+
+
+def StandinLines(*args: str) -> bytes:
+    return string('\n'.join(f'line {i}' for i in range(int(args[0]))))
+
+
+def AHKEcho(*args: str) -> bytes:
+    return string(args[0])
+
+
+TITLES = {}
+
+
+def AHKWinGetTitle(*args: str) -> bytes:
+    return string(TITLES.get(args[0], f'title of {args[0]}'))
+
+
+def AHKWinSetTitle(*args: str) -> bytes:
+    new_title, title = args[:2]
+    TITLES[title] = new_title
+    return novalue()
+
+
+def AHKWinGetPID(*args: str) -> bytes:
+    return integer(4242)
+
+
+def AHKWinClose(*args: str) -> bytes:
+    return novalue()
+
+
+def AHKWindowList(*args: str) -> bytes:
+    # a fixed set of windows, as a comma-separated list of IDs with a trailing comma
+    return frame(WindowListResponseMessage(raw_content=b''.join(b'0x%x,' % i for i in range(1, 101))))
+
+
+def AHKWinGetControlList(*args: str) -> bytes:
+    controls = ''.join(f"('0x{i:x}', 'Button{i}'), " for i in range(1, 11))
+    return frame(WindowControlListResponseMessage(raw_content=f"('0x1', [{controls}])".encode('utf-8')))
+
+
+def StandinSleep(*args: str) -> bytes:
+    time.sleep(float(args[0]))
+    return string(args[1] if len(args) > 1 else '')
+
+
+def StandinFail(*args: str) -> bytes:
+    return error(args[0] if args else 'failure')
+
+
+SENT = []
+
+
+def AHKSend(*args: str) -> bytes:
+    if args[0] == 'fail':
+        return error(f'could not send {args[0]!r}')
+    if args[0] == 'slow':
+        time.sleep(0.5)
+    SENT.append(args[0])
+    return novalue()
+
+
+def StandinSent(*args: str) -> bytes:
+    return string(','.join(SENT))
+
+
+def StandinGarbage(*args: str) -> bytes:
+    # unframed output, as written by an unhandled error, followed by the response after a delay
+    sys.stdout.buffer.write(b'Error: something went wrong\nSpecifically: this\n')
+    sys.stdout.buffer.flush()
+    time.sleep(float(args[0]) if args else 0)
+    return string('garbage')
+
+
+def StandinExit(*args: str) -> bytes:
+    os._exit(1)
+
+
+CLIPBOARD = {'text': '', 'all': b''}
+
+
+def AHKSetClipboard(*args: str) -> bytes:
+    CLIPBOARD['text'] = args[0] if args else ''
+    return novalue()
+
+
+def AHKGetClipboard(*args: str) -> bytes:
+    return string(CLIPBOARD['text'])
+
+
+def AHKSetClipboardAll(*args: Any) -> bytes:
+    data = args[0]
+    if isinstance(data, str) and re.search('[^A-Za-z0-9+/=]', data):
+        # not base64, but a file to read the data from (``*c <path>`` in v1)
+        with open(data[3:] if data.startswith('*c ') else data, 'rb') as f:
+            data = f.read()
+    CLIPBOARD['all'] = data if isinstance(data, bytes) else base64.b64decode(data)
+    return novalue()
+
+
+def StandinClipboardAllDigest(*args: str) -> bytes:
+    return string(f'{len(CLIPBOARD["all"])}:{hashlib.sha256(CLIPBOARD["all"]).hexdigest()}')
+
+
+LONGEST_LINE = {'length': 0}
+
+
+def StandinLongestLine(*args: str) -> bytes:
+    # the longest request or upload line received so far
+    return string(str(LONGEST_LINE['length']))
+
+
+CALL_COUNTS: 'collections.Counter[str]' = collections.Counter()
+
+
+def StandinCallCount(*args: str) -> bytes:
+    # how many times the given function was called
+    return string(str(CALL_COUNTS[args[0]]))
+
+
+FUNCTIONS = {name: f for name, f in globals().items() if name.startswith(('AHK', 'Standin'))}
+
+# functions implementing protocol extensions, which an older daemon would not have
+EXTENSION_FUNCTIONS = ['AHKSetResponseFraming', 'AHKProtocolHello']
+
+# a legacy daemon does not understand request IDs or batches either; such requests fail as unknown functions
+LEGACY = '--legacy' in sys.argv
+
+if LEGACY:
+    for name in EXTENSION_FUNCTIONS:
+        del FUNCTIONS[name]
+
+
+# arguments uploaded ahead of their requests, by upload ID
+UPLOADS: 'dict[str, bytearray]' = {}
+
+
+def upload_chunk(line: str) -> None:
+    upload_id, _, chunk = line.partition('|')
+    UPLOADS.setdefault(upload_id, bytearray()).extend(base64.b64decode(chunk))
+
+
+def decode_arg(arg: str) -> Any:
+    if arg[:1] in ('@', '&'):
+        # uploaded ahead of the request, as text (@) or binary data (&)
+        data = bytes(UPLOADS.pop(arg[1:]))
+        return data.decode('utf-8') if arg[0] == '@' else data
+    return base64.b64decode(arg).decode('utf-8')
+
+
+def dispatch(query: str) -> bytes:
+    function_name, *encoded_args = query.split('|')
+    try:
+        args = [decode_arg(arg) for arg in encoded_args if arg]
+    except KeyError as e:
+        return error(f'Upload failed: Unknown upload {e}')
+    func = FUNCTIONS.get(function_name)
+    CALL_COUNTS[function_name] += 1
+    if func is None:
+        return error(f'Unknown Error when calling {function_name}')
+    try:
+        return func(*args)
+    except Exception as e:
+        return error(f'Error occurred in {function_name}. The error message was: {e}')
+
+
+class RingReader:
+    """
+    Reads requests from a ring, for ``serve``
+    """
+
+    def __init__(self, ring: RingBuffer, parent_pid: int):
+        self.ring = ring
+        self.parent_pid = parent_pid
+        self.pending = b''
+
+    def readline(self) -> bytes:
+        poller = RingPoller()
+        while b'\n' not in self.pending:
+            chunk = self.ring.read(65536)
+            if chunk:
+                self.pending += chunk
+                poller = RingPoller()
+            elif not poller.spinning and os.getppid() != self.parent_pid:
+                return b''  # the Python process is gone, like the ring daemon
+            else:
+                time.sleep(poller.next_interval())
+        line, _, self.pending = self.pending.partition(b'\n')
+        return line + b'\n'
+
+
+class RingWriter:
+    """
+    Writes responses to a ring, for ``serve``, waiting for room as needed
+    """
+
+    def __init__(self, ring: RingBuffer):
+        self.ring = ring
+
+    def write(self, data: bytes) -> None:
+        view = memoryview(data)
+        poller = RingPoller()
+        while view:
+            written = self.ring.write(view)
+            if written:
+                view = view[written:]
+                poller = RingPoller()
+            else:
+                time.sleep(poller.next_interval())
+
+    def flush(self) -> None:
+        pass
+
+
+def main() -> None:
+    if '--ring' in sys.argv:
+        # requests and responses pass through shared memory, like the ring variant of the daemon
+        ring_path, parent_pid = sys.argv[sys.argv.index('--ring') + 1 :][:2]
+        rings = SharedRings(ring_path)
+        return serve(RingReader(rings.requests, int(parent_pid)), RingWriter(rings.responses))
+    if '--listen' in sys.argv:
+        # serve connections one at a time, like the socket variant of the daemon
+        host, port = sys.argv[sys.argv.index('--listen') + 1].rsplit(':', 1)
+        listener = socket.create_server((host, int(port)))
+        while True:
+            conn, _ = listener.accept()
+            with conn, conn.makefile('rb') as stdin, conn.makefile('wb') as stdout:
+                try:
+                    serve(stdin, stdout)
+                except OSError:
+                    pass  # the client went away
+    serve(sys.stdin.buffer, sys.stdout.buffer)
+
+
+def serve(stdin: Any, stdout: Any) -> None:
+    while True:
+        line = stdin.readline()
+        if not line:
+            return
+        LONGEST_LINE['length'] = max(LONGEST_LINE['length'], len(line))
+        query = line.decode('utf-8').rstrip('\n')
+        if query.startswith('+') and not LEGACY:
+            upload_chunk(query[1:])
+            continue
+        header = b''
+        if query.startswith('#') and not LEGACY:
+            request_header, _, query = query.partition('|')
+            header = request_header.encode('ascii') + b'\n'
+        if query.startswith('*') and not LEGACY:
+            CALL_COUNTS['*'] += 1
+            responses = b''.join(dispatch(q) + b'\n' for q in query[1:].split('\t'))
+            response = frame(BatchResponseMessage(raw_content=responses))
+        else:
+            response = dispatch(query)
+        stdout.write(header + response + b'\n')
+        stdout.flush()
+
+
+if __name__ == '__main__':
+    main()